@@ -0,0 +1,75 @@
+# Galois fields of characteristic 2: the bit mask backend of Galoisfield against the generic arithmetic on packed
+# polynomials over F_2 (reduce, inverse_mod, powmod), and the thresholds
+#   comb_threshold: shift-and-xor vs 4-bit comb for carry-less products,
+#   table_limit: log/antilog tables (make_tables) vs bit masks, and the time to build the tables.
+# Times are per operation on random elements. Run from the repository root: python benchmarks/bench_binary_fields.py
+import os
+import sys
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(here, '..', 'modules', m) for m in ['rings_and_fields', 'abelian_groups', 'elliptic_curves']]
+import rings_and_fields as rf
+
+
+def timed(f, total=0.2): # seconds per call of f, the best of five rounds of about total/5 seconds each
+    n = 1
+    while True:
+        t = time.perf_counter()
+        for i in range(n):
+            f()
+        t = time.perf_counter() - t
+        if t > total / 5:
+            break
+        n *= 2
+    best = t
+    for r in range(4):
+        t = time.perf_counter()
+        for i in range(n):
+            f()
+        best = min(best, time.perf_counter() - t)
+    return best / n
+
+
+def main():
+    print('bit masks vs packed polynomials:')
+    for n in [11, 64, 163, 571]:
+        G = rf.Galoisfield(rf.find_irreducible(2, n))
+        P = G.p_ring
+        f = G.modulus.value
+        a, b = G.random_element(), G.random_element()
+        pa, pb = a.polynomial().value, b.polynomial().value
+        e = G.cardinality - 2
+        print('  GF(2^%d)' % n)
+        print('    mult  %.2e  generic %.2e' % (timed(lambda: G.mult(a.value, b.value)), timed(lambda: G.reduce(P.mult(pa, pb)))))
+        print('    inv   %.2e  generic %.2e' % (timed(lambda: G.inv(a.value)), timed(lambda: P.inverse_mod(pa, f))))
+        print('    x^(q-2) %.2e  generic %.2e' % (timed(lambda: G.power(a.value, e)), timed(lambda: P.powmod(pa, e, f))))
+
+    G = rf.Galoisfield(rf.find_irreducible(2, 571))
+    print('comb_threshold = %d (carry-less product of bit masks of the given length):' % G.comb_threshold)
+    for bits in [8, 16, 24, 32, 48, 64, 163, 571]:
+        a, b = G.random_element().value >> (571 - bits) | 1 << (bits - 1), G.random_element().value >> (571 - bits) | 1 << (bits - 1)
+        G.comb_threshold = 10**9
+        s = timed(lambda: G.mult_bits(a, b))
+        G.comb_threshold = 0
+        c = timed(lambda: G.mult_bits(a, b))
+        print('  %-4d bits  shift-and-xor %.2e  comb %.2e' % (bits, s, c))
+    del G.comb_threshold
+
+    if rf.np is None:
+        print('table_limit: tables need numpy')
+        return
+    print('table_limit = 2^%d:' % (rf.Galoisfield.table_limit.bit_length() - 1))
+    for n in [8, 12, 16, 18, 20]:
+        G = rf.Galoisfield(rf.find_irreducible(2, n))
+        a, b = G.random_element().value, G.random_element().value
+        m, i = timed(lambda: G.mult(a, b)), timed(lambda: G.inv(a))
+        t = time.perf_counter()
+        G.make_tables()
+        t = time.perf_counter() - t
+        print('  GF(2^%-2d) make_tables %.2fs  mult %.2e -> %.2e  inv %.2e -> %.2e'
+              % (n, t, m, timed(lambda: G.mult(a, b)), i, timed(lambda: G.inv(a))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# Equality and hashing of elements, structural (comparing parents and values, hash cached on the element) against
+# the reference implementation it replaced, which compared and hashed repr strings. Timed with both:
+#   points() of an elliptic curve over GF(19^2) (a set of hashed points, built from scratch),
+#   set membership of curve points and dict lookups of Galois field elements (fresh copies as queries, so that
+#     nothing is cached on them),
+#   is_generator over all of GF(17^3) (comparisons with one).
+# Run from the repository root: python benchmarks/bench_equality.py
+import contextlib
+import os
+import sys
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(here, '..', 'modules', m) for m in ['rings_and_fields', 'abelian_groups', 'elliptic_curves']]
+import rings_and_fields as rf
+import abelian_groups as ab
+import elliptic_curves as ec
+
+
+def timed(f, repeat=3): # the best of repeat runs, in seconds
+    best = float('inf')
+    for i in range(repeat):
+        t = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def repr_eq(self, b):
+    return self.__repr__() == b.__repr__()
+
+
+def repr_ne(self, b):
+    return self.__repr__() != b.__repr__()
+
+
+def repr_hash(self):
+    return hash(self.__repr__())
+
+
+class repr_equality: # within the block, elements compare and hash by repr, as before structural equality
+    classes = [rf.ring_element, ab.abstract_abelian_group_element]
+
+    def __enter__(self):
+        self.saved = [(c, c.__eq__, c.__ne__, c.__hash__) for c in self.classes]
+        for c in self.classes:
+            c.__eq__, c.__ne__, c.__hash__ = repr_eq, repr_ne, repr_hash
+
+    def __exit__(self, *args):
+        for (c, eq, ne, h) in self.saved:
+            c.__eq__, c.__ne__, c.__hash__ = eq, ne, h
+
+
+def galois_field(p, n):
+    return rf.Galoisfield(rf.find_irreducible(p, n))
+
+
+def copies(v): # fresh copies of the elements in v, with nothing cached
+    return [a.__class__(a.value, a.group if hasattr(a, 'group') else a.ring) for a in v]
+
+
+def points(C):
+    C.points_cache = set()
+    return C.points()
+
+
+def membership(S, pts):
+    return sum(P in S for P in copies(pts))
+
+
+def lookups(D, els):
+    return sum(D[a] for a in copies(els))
+
+
+def generators(G):
+    return [a.is_generator() for a in G]
+
+
+def main():
+    G = galois_field(19, 2)
+    R = rf.polynomialring_over_field(G)
+    C = ec.elliptic_curve(R([G(7), G(4), 0, 1]))
+    pts = list(points(C))
+    els = list(G)
+    K = galois_field(17, 3)
+    names = ['points() of y^2 = x^3 + 4x + 7 over GF(19^2)', 'membership of its %d points in a set' % len(pts),
+             'dict lookups of all %d elements of GF(19^2)' % len(els), 'is_generator() over all of GF(17^3)']
+    repeats = [3, 3, 3, 1]
+    times = []
+    for mode in [contextlib.nullcontext(), repr_equality()]: # structural, then repr
+        with mode:
+            S = set(copies(pts)) # built with the hash of this mode
+            D = {a: i for (i, a) in enumerate(copies(els))}
+            fs = [lambda: points(C), lambda: membership(S, pts), lambda: lookups(D, els), lambda: generators(K)]
+            times.append([timed(f, r) for (f, r) in zip(fs, repeats)])
+    print('%-48s %10s %10s %7s' % ('', 'structural', 'repr', 'ratio'))
+    for (name, s, r) in zip(names, times[0], times[1]):
+        print('%-48s %9.4fs %9.4fs %6.1fx' % (name, s, r, r / s))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# Polynomial multiplication: the crossover points behind the thresholds of polynomialring. Each path of
+# polynomialring.mult is timed through mult itself, forced by setting the thresholds on the ring:
+#   kronecker_threshold: schoolbook vs Kronecker substitution for packed coefficients (with words if numpy is
+#     available and the product coefficients fit, otherwise wide), with and without numpy,
+#   ntt_threshold: Kronecker substitution vs number-theoretic transform modulo an NTT prime (needs numpy), for
+#     products whose coefficients do not fit into a word (the only ones mult may send to the NTT),
+#   karatsuba_threshold (coefficients in Q): schoolbook vs Karatsuba.
+# Sizes are numbers of coefficients n of both factors; the thresholds are on the degree n-1. Each section ends
+# with the threshold the measurements suggest: the least degree from which the faster path wins at every larger
+# size measured. Times are per product, the best of several runs.
+# Run from the repository root: python benchmarks/bench_multiplication.py
+import os
+import random
+import sys
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(here, '..', 'modules', m) for m in ['rings_and_fields', 'abelian_groups', 'elliptic_curves']]
+import rings_and_fields as rf
+from gmpy2 import mpq
+
+never = 2**62 # a threshold that is never reached
+
+
+def timed(f, total=0.2): # seconds per call of f, the best of five rounds of about total/5 seconds each
+    n = 1
+    while True:
+        t = time.perf_counter()
+        for i in range(n):
+            f()
+        t = time.perf_counter() - t
+        if t > total / 5:
+            break
+        n *= 2
+    best = t
+    for r in range(4):
+        t = time.perf_counter()
+        for i in range(n):
+            f()
+        best = min(best, time.perf_counter() - t)
+    return best / n
+
+
+def timed_mult(P, a, b, **thresholds): # seconds per P.mult(a, b) with the given thresholds set on P
+    for (k, v) in thresholds.items():
+        setattr(P, k, v)
+    try:
+        return timed(lambda: P.mult(a, b))
+    finally:
+        for k in thresholds:
+            delattr(P, k)
+
+
+def crossover(rows): # the least n from which the second time is below the first at every larger size
+    n = None
+    for (m, slow, fast) in rows:
+        if fast >= slow:
+            n = None
+        elif n is None:
+            n = m
+    return n
+
+
+def suggest(name, P, n): # None stands for a path that should not be taken (as for ntt_threshold)
+    if n is None:
+        print('  %s: None suggested, the faster path does not win from any size measured (currently %s)' % (name, getattr(P, name)))
+    else:
+        print('  %s: %d suggested (currently %s)' % (name, n - 1, getattr(P, name)))
+
+
+def kronecker(primes, sizes):
+    rows = {}
+    for p in primes:
+        P = rf.polynomialring_over_field(rf.primefield(p))
+        for n in sizes:
+            a, b = [random.randrange(p) for i in range(n)], [random.randrange(p) for i in range(n)]
+            s = timed_mult(P, a, b, kronecker_threshold=never, ntt_threshold=never)
+            k = timed_mult(P, a, b, kronecker_threshold=0, ntt_threshold=never)
+            print('  p=%-40d n=%-3d schoolbook %.2e  Kronecker %.2e' % (p, n, s, k))
+            rows.setdefault(p, []).append((n, s, k))
+    return [crossover(r) for r in rows.values()]
+
+
+def main():
+    random.seed(1)
+    P = rf.polynomialring_over_field(rf.primefield(10007))
+    primes = [10007, 998244353, 2**61 - 1, 2**127 - 1]
+    sizes = [2, 3, 4, 6, 8, 9, 10, 12, 16, 24, 32]
+    print('kronecker_threshold = %d:' % P.kronecker_threshold)
+    cs = kronecker(primes, sizes)
+    if rf.np is not None:
+        print('kronecker_threshold = %d, without numpy:' % P.kronecker_threshold)
+        np, rf.np = rf.np, None
+        try:
+            cs += kronecker(primes, sizes)
+        finally:
+            rf.np = np
+    suggest('kronecker_threshold', P, None if None in cs else max(cs))
+
+    if rf.np is None:
+        print('ntt_threshold: needs numpy')
+    else:
+        print('ntt_threshold = %s:' % P.ntt_threshold)
+        cs = []
+        for q in [998244353, 469762049]: # 119 * 2^23 + 1, 7 * 2^26 + 1
+            R = rf.polynomialring_over_field(rf.primefield(q))
+            rows = []
+            for n in [64, 128, 256, 512, 1024, 4096, 16384, 65536, 2**18, 2**20]:
+                a, b = [random.randrange(q) for i in range(n)], [random.randrange(q) for i in range(n)]
+                k = timed_mult(R, a, b, kronecker_threshold=0, ntt_threshold=never)
+                t = timed_mult(R, a, b, kronecker_threshold=never, ntt_threshold=0)
+                print('  q=%-10d n=%-7d Kronecker %.2e  NTT %.2e' % (q, n, k, t))
+                rows.append((n, k, t))
+            cs.append(crossover(rows))
+        suggest('ntt_threshold', P, None if None in cs else max(cs))
+
+    Q = rf.Q()
+    PQ = rf.polynomialring(Q)
+    print('karatsuba_threshold = %d, over Q:' % PQ.karatsuba_threshold)
+    rows = []
+    for n in [8, 12, 16, 20, 24, 32, 64]:
+        a = [Q(mpq(random.randrange(-999, 1000), random.randrange(1, 1000))) for i in range(n)]
+        b = [Q(mpq(random.randrange(-999, 1000), random.randrange(1, 1000))) for i in range(n)]
+        s = timed_mult(PQ, a, b, karatsuba_threshold=never)
+        k = timed_mult(PQ, a, b, karatsuba_threshold=n // 2)
+        print('  n=%-4d schoolbook %.2e  Karatsuba %.2e' % (n, s, k))
+        rows.append((n, s, k))
+    suggest('karatsuba_threshold', PQ, crossover(rows))
+
+
+if __name__ == '__main__':
+    main()
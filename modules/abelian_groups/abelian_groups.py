@@ -1,12 +1,66 @@
 # [[file:../README.org::*Class: abstract_abelian_group][Class: abstract_abelian_group:1]]
-from gmpy2 import mpz
+from gmpy2 import mpz, isqrt, invert
+from secrets import randbelow
+import itertools
+import rings_and_fields as rf
+from rings_and_fields import factorisation
 
-class abstract_abelian_group:
-    """This is the base class for abelian groups. This class contains no data, but defines a setup method that should be called by subclasses during initialisation."""
+
+def rho_task(job): # the first distinguished points of rho walks, computed in a worker process; see abstract_abelian_group.rho
+    (G, t, g, p, A, B, count) = job
+    return list(itertools.islice(G.rho_points(t, g, p, A, B), count))
+
+
+def wnaf(e, w):
+    """The width-w non-adjacent form of the integer e >= 0: the list of digits d[i], least significant first, with
+    e = sum d[i] 2^i, every nonzero digit odd and less than 2^(w-1) in absolute value, and at most one nonzero digit
+    in any w consecutive ones. The last digit is positive."""
+    d = []
+    e = int(e)
+    while e:
+        if e & 1:
+            z = e & ((1 << w) - 1)
+            if z >= 1 << (w - 1):
+                z -= 1 << w
+            e -= z
+        else:
+            z = 0
+        d.append(z)
+        e >>= 1
+    return d
+
+def wnaf_width(bits): # a good window for scalars with this many bits: the table costs 2^(w-2) additions
+    if bits <= 12:
+        return 2
+    if bits <= 48:
+        return 3
+    if bits <= 160:
+        return 4
+    return 5
+
+
+class abstract_abelian_group(metaclass=rf.unique_parent):
+    """This is the base class for abelian groups. This class contains no data, but defines a setup method that should be called by subclasses during initialisation.
+    Groups are unique: see rings_and_fields.unique_parent."""
+
+    wnaf_window = None  # window of scalar_mult; None chooses one from the size of the scalar (wnaf_width)
+    fixed_bases = None  # tables of fixed_base_mult by value, see abstract_abelian_group_element.precompute
+    # discrete_log: baby step giant step stores at most bsgs_memory baby steps, and is used in subgroups of prime
+    # order below rho_threshold; larger ones use Pollard rho with rho_walks walks in lockstep. With a process pool,
+    # rho runs rho_tasks tasks at a time, each returning rho_batch distinguished points.
+    bsgs_memory = 2**20
+    order_factors = None # see cardinality_factorisation
+    rho_threshold = 2**32
+    rho_walks = 32
+    rho_tasks = 8
+    rho_batch = 64
     
     def __init__(self):
         self.element = globals()[self.__class__.__name__ + '_element']
 
+    def __reduce__(self): # pickle by the constructor arguments, see rings_and_fields.unique_parent
+        return (rf.make_parent, (self.__class__,) + self.init_args)
+
     def el(self, v):
         return self.element(v, self)
         
@@ -19,22 +73,307 @@ class abstract_abelian_group:
     def equals(self, a, b):
         return self.is_zero(self.sub(a,b))
 
+    def hash_value(self, v):  # hash of a (normalised) value, used by abstract_abelian_group_element.__hash__
+        return hash(v)
+
+    def neg(self, v):
+        return self.sub(self.zero().value, v)
+
+    # Scalar multiplication runs on a working representation of group elements ("work values"), which subclasses
+    # may replace, e.g. by projective coordinates: from_work(to_work(v)) == v, work_add adds a value to a work value,
+    # work_add_work adds two work values and work_double doubles one.
+
+    def to_work(self, v):
+        return v
+
+    def from_work(self, W):
+        return W
+
+    def from_work_many(self, Ws):
+        return [self.from_work(W) for W in Ws]
+
+    def work_add(self, W, v):
+        return self.add(W, v)
+
+    def work_add_work(self, W, V):
+        return self.add(W, V)
+
+    def work_double(self, W):
+        return self.add(W, W)
+
+    def odd_multiples_work(self, v, n): # the work values 3v, 5v, ..., (2n-1)v
+        t = []
+        if n > 1:
+            W = self.to_work(v)
+            W2 = self.work_double(W)
+            for i in range(1, n):
+                W = self.work_add_work(W, W2)
+                t.append(W)
+        return t
+
+    def odd_multiples(self, v, n): # the values v, 3v, 5v, ..., (2n-1)v
+        return [v] + self.from_work_many(self.odd_multiples_work(v, n))
+
+    def doubles(self, v, n): # the values v, 2v, 4v, ..., 2^(n-1)v
+        t = []
+        W = self.to_work(v)
+        for i in range(1, n):
+            W = self.work_double(W)
+            t.append(W)
+        return [v] + self.from_work_many(t)
+
+    def scalar_mult(self, v, k): # k times the value v; left to right, with the w-NAF of k
+        e = int(k)
+        if e == 0 or self.is_zero(v):
+            return self.zero().value
+        if e < 0:
+            v = self.neg(v)
+            e = -e
+        w = self.wnaf_window or wnaf_width(e.bit_length())
+        d = wnaf(e, w)
+        t = self.odd_multiples(v, 1 << (w - 2))
+        W = self.to_work(t[d[-1] >> 1])
+        for z in reversed(d[:-1]):
+            W = self.work_double(W)
+            if z > 0:
+                W = self.work_add(W, t[z >> 1])
+            elif z < 0:
+                W = self.work_add(W, self.neg(t[-z >> 1]))
+        return self.from_work(W)
+
+    def fixed_base_mult(self, table, k): # k times table[0], where table = doubles(table[0], ...); additions only
+        e = int(k)
+        d = wnaf(abs(e), 2)
+        if len(d) > len(table):
+            table[:] = self.doubles(table[0], len(d))
+        W = self.to_work(self.zero().value)
+        for z, t in zip(d, table):
+            if z > 0:
+                W = self.work_add(W, t)
+            elif z < 0:
+                W = self.work_add(W, self.neg(t))
+        v = self.from_work(W)
+        return self.neg(v) if e < 0 else v
+
+    def multiples_work(self, W, v, n): # the work values W, W + v, W + 2v, ..., W + (n-1)v
+        t = [W]
+        for i in range(1, n):
+            W = self.work_add(W, v)
+            t.append(W)
+        return t
+
+    def add_values_many(self, us, vs): # the values u + v for u in us and v in vs
+        return [self.add(u, v) for u, v in zip(us, vs)]
+
+    def bsgs(self, T, S, count):
+        """Return the least j with 0 <= j <= count and j S = T (for values S, T), or None if there is none. Baby step
+        giant step with m = min(sqrt(count), bsgs_memory) baby steps and about count/m giant steps."""
+        m = int(min(isqrt(count) + 1, self.bsgs_memory))
+        baby = {}
+        for j, B in enumerate(self.from_work_many(self.multiples_work(self.to_work(self.zero().value), S, m))):
+            baby.setdefault(B, j)
+        # the giant steps are G_i = T - i m S; G_i = j S means (i m + j) S = T
+        mS = self.neg(self.scalar_mult(S, m))
+        G = T
+        i = 0
+        while i * m <= count:
+            n = min(m, count // m + 1 - i)
+            Gs = self.from_work_many(self.multiples_work(self.to_work(G), mS, n + 1))
+            for k in range(n):
+                if Gs[k] in baby:
+                    return (i + k) * m + baby[Gs[k]]
+            G = Gs[n]
+            i += n
+        return None
+
+    def multiple_in_progression(self, v, start, step, count):
+        """Return some m = start + j*step with 0 <= j <= count and m v = 0 (for a value v), or None if there
+        is none; see bsgs."""
+        j = self.bsgs(self.neg(self.scalar_mult(v, start)), self.scalar_mult(v, step), count)
+        return None if j is None else start + j * step
+
+    def order_from_multiple(self, v, m): # the order of the value v, given m > 0 with m v = 0
+        return self.order_of(v, factorisation(m))
+
+    def order_of(self, v, factors): # the order of the value v, given the factorisation of a multiple of it
+        return rf.order_of(v, factors, self.scalar_mult, self.is_zero)
+
+    def cardinality_factorisation(self):
+        """Return the factorisation of cardinality() as a list of pairs (p, e), computed once per group."""
+        if self.order_factors is None:
+            self.order_factors = factorisation(self.cardinality())
+        return self.order_factors
+
+    def cardinality(self):
+        print(f"cardinality: not implemented for {self.__class__.__name__}; pass the order of the base")
+        raise NotImplementedError
+
+    def discrete_log(self, target, base, order=None, pool=None):
+        """Return k with 0 <= k < n and k*base = target, where n is the order of base, or None if there is no
+        such k. order is the order of base or a multiple of it (the default is the cardinality of the group).
+        Pohlig-Hellman reduces to subgroups of prime order, which are solved by baby step giant step (small
+        ones) or Pollard rho with distinguished points (large ones). The walks of Pollard rho run in pool, if it
+        is given: an object with a map method, such as a multiprocessing.Pool."""
+        if base.group is not self or target.group is not self:
+            print("discrete_log: elements must lie in this group")
+            raise
+        g, t = base.value, target.value
+        if order is None:
+            n = self.order_of(g, self.cardinality_factorisation())
+        else:
+            n = self.order_from_multiple(g, order)
+        k, M = mpz(0), mpz(1)
+        for (p, e) in factorisation(n):
+            x = self.log_prime_power(self.scalar_mult(t, n // p**e), self.scalar_mult(g, n // p**e), p, e, pool)
+            if x is None:
+                return None
+            k, M = k + M * ((x - k) * invert(M, p**e) % p**e), M * p**e
+        if not(self.is_zero(self.sub(self.scalar_mult(g, k), t))): # target is not in the subgroup generated by base
+            return None
+        return k
+
+    def log_prime_power(self, t, g, p, e, pool=None): # x mod p^e with x g = t, where g has order p^e; one digit at a time
+        gp = self.scalar_mult(g, p**(e-1)) # of order p
+        x = mpz(0)
+        for i in range(e):
+            h = self.scalar_mult(self.sub(t, self.scalar_mult(g, x)), p**(e-1-i))
+            d = self.log_prime_order(h, gp, p, pool)
+            if d is None:
+                return None
+            x += d * p**i
+        return x
+
+    def log_prime_order(self, t, g, p, pool=None): # x with x g = t, where g has prime order p, or None
+        if self.is_zero(t):
+            return mpz(0)
+        if p < self.rho_threshold:
+            return self.bsgs(t, g, p - 1)
+        return self.rho(t, g, p, pool)
+
+    def rho(self, t, g, p, pool=None):
+        """Pollard rho for x with x g = t, where g has prime order p and t is in the subgroup generated by g. An
+        r-adding walk X -> X + M[i], i = hash(X) mod r, where M[i] = a_i g + b_i t, is run from random starting
+        points (see rho_points). Walks stop at distinguished points; two walks meeting give a collision
+        a g + b t = a' g + b' t. With a pool (see discrete_log), the walks run in the worker processes, in rounds
+        of rho_tasks tasks that each return rho_batch distinguished points."""
+        r = 20
+        A = [randbelow(int(p)) for i in range(r)]
+        B = [randbelow(int(p)) for i in range(r)]
+        if pool is None:
+            points = self.rho_points(t, g, p, A, B)
+        else:
+            job = (self, t, g, p, A, B, self.rho_batch)
+            points = (P for i in itertools.count() for batch in pool.map(rho_task, [job] * self.rho_tasks) for P in batch)
+        seen = {}
+        for (X, a, b) in points:
+            if X in seen:
+                a1, b1 = seen[X]
+                if (b1 - b) % p != 0: # a1 g + b1 t = a g + b t
+                    return mpz(a - a1) * invert(b1 - b, p) % p
+            seen[X] = (a, b)
+
+    def rho_points(self, t, g, p, A, B):
+        # Generate the distinguished points (X, a, b), X = a g + b t, of rho_walks lockstep walks (so that
+        # add_values_many can share work across them) with steps M[i] = A[i] g + B[i] t. A point is distinguished
+        # if its hash is divisible by 2^d; then the walk restarts from a random point.
+        r = len(A)
+        M = [self.add(self.scalar_mult(g, a), self.scalar_mult(t, b)) for a, b in zip(A, B)]
+        d = max(0, int(p).bit_length() // 4 - 2)
+        mask = ((1 << d) - 1) << 5 # bits of the hash that must vanish; the low bits choose the step
+        limit = 20 << d            # walks longer than this are assumed to be stuck in a cycle
+
+        def start():
+            a, b = randbelow(int(p)), randbelow(int(p))
+            return [self.add(self.scalar_mult(g, a), self.scalar_mult(t, b)), a, b, 0]
+
+        walks = [start() for i in range(self.rho_walks)]
+        while True:
+            idx = [self.hash_value(w[0]) % r for w in walks]
+            Xs = self.add_values_many([w[0] for w in walks], [M[i] for i in idx])
+            for w, i, X in zip(walks, idx, Xs):
+                w[0], w[1], w[2], w[3] = X, (w[1] + A[i]) % p, (w[2] + B[i]) % p, w[3] + 1
+                if self.hash_value(X) & mask == 0:
+                    yield (X, w[1], w[2])
+                    w[:] = start()
+                elif w[3] > limit:
+                    w[:] = start()
+
+    def multi_scalar_mul(self, scalars, elements):
+        """Return the sum of k*P for k in scalars and P in elements, by Straus' method (interleaved w-NAF) for few
+        terms and Pippenger's bucket method for many; see multi_scalar_cost."""
+        terms = []
+        for k, P in zip(scalars, elements):
+            if P.group is not self:
+                print("multi_scalar_mul: elements must lie in this group")
+                raise
+            e = int(k)
+            if e == 0 or P.is_zero():
+                continue
+            terms.append((P.value, e) if e > 0 else (self.neg(P.value), -e))
+        if terms == []:
+            return self.zero()
+        bits = max(e for (v, e) in terms).bit_length()
+        (cs, w), (cp, c) = self.multi_scalar_cost(len(terms), bits)
+        if cs <= cp:
+            return self.element(self.straus(terms, w), self)
+        return self.element(self.pippenger(terms, c), self)
+
+    def multi_scalar_cost(self, n, bits): # estimated additions for n terms of bits bits: (Straus, window), (Pippenger, window)
+        straus = min((n * ((1 << (w - 2)) + bits // (w + 1)) + bits, w) for w in range(2, 8))
+        pippenger = min((-(-bits // c) * (n + (1 << (c + 1))) + bits, c) for c in range(1, 21))
+        return straus, pippenger
+
+    def straus(self, terms, w): # sum of e v over the pairs (v, e) in terms, with e > 0
+        ds = [wnaf(e, w) for (v, e) in terms]
+        ts = []
+        for (v, e) in terms: # compute all tables before converting them, so that from_work_many sees them together
+            ts.append(self.odd_multiples_work(v, 1 << (w - 2)))
+        flat = self.from_work_many([W for t in ts for W in t])
+        for i, (v, e) in enumerate(terms):
+            n = len(ts[i])
+            ts[i], flat = [v] + flat[:n], flat[n:]
+        W = self.to_work(self.zero().value)
+        for j in reversed(range(max(len(d) for d in ds))):
+            W = self.work_double(W)
+            for d, t in zip(ds, ts):
+                if j < len(d) and d[j] != 0:
+                    z = d[j]
+                    W = self.work_add(W, t[z >> 1] if z > 0 else self.neg(t[-z >> 1]))
+        return self.from_work(W)
+
+    def pippenger(self, terms, c): # sum of e v over the pairs (v, e) in terms, with e > 0, by c-bit windows
+        mask = (1 << c) - 1
+        bits = max(e for (v, e) in terms).bit_length()
+        W = self.to_work(self.zero().value)
+        for j in reversed(range(-(-bits // c))):
+            for i in range(c):
+                W = self.work_double(W)
+            buckets = [None] * (1 << c) # buckets[d] is the sum of the v with digit d
+            for (v, e) in terms:
+                d = (e >> (j * c)) & mask
+                if d:
+                    buckets[d] = self.to_work(v) if buckets[d] is None else self.work_add(buckets[d], v)
+            running = self.to_work(self.zero().value) # sum of buckets[d:]; total is the sum of d * buckets[d]
+            total = running
+            for d in reversed(range(1, 1 << c)):
+                if buckets[d] is not None:
+                    running = self.work_add_work(running, buckets[d])
+                total = self.work_add_work(total, running)
+            W = self.work_add_work(W, total)
+        return self.from_work(W)
+
     def __repr__(self):
         return self.__class__.__name__ + '()'
 
     def __str__(self):
         return 'abstract abelian group'
 
-    def __eq__(self, b):
-        return self.__repr__() == b.__repr__()  # overload "=="
-
-    def __ne__(self, b):       # overload "!="
-        return self.__repr__() != b.__repr__()
-    
 
 class abstract_abelian_group_element:
     """This is the base class for elements of an abelian group. This class defines generic methods for the algebraic structure."""
 
+    _hash = None  # computed on first call of __hash__; elements are never modified after construction
+
     def __init__(self, v, G):
         self.group  = G
         self.value = G.normalise(v)
@@ -46,14 +385,14 @@ class abstract_abelian_group_element:
         return self.__class__.__name__ + '(' + self.value.__repr__() + ', ' + self.group.__repr__() + ')'
         
     def add(self, b):
-        if (self.group != b.group):
+        if (self.group is not b.group):
             print("Addition in abelian groups: Summands must lie in same group")
             raise
         return self.__class__(self.group.add(self.value, b.value), self.group)
 
     def sub(self, b):
         # need to implement type checking for b
-        if (self.group != b.group):
+        if (self.group is not b.group):
             print("Subtraction in abelian groups: Arguments must lie in same group")
             raise
         return self.__class__(self.group.sub(self.value, b.value), self.group)
@@ -70,14 +409,21 @@ class abstract_abelian_group_element:
     def __sub__(self, b):      # overload "-"
         return self.sub(b)
     
-    def __eq__(self, b):
-        return self.__repr__() == b.__repr__()  # overload "=="
+    def __eq__(self, b):       # overload "=="
+        # elements are equal if they have the same type, lie in the same group and have the same normalised value
+        if self is b:
+            return True
+        if self.__class__ is not b.__class__:
+            return False
+        if self.group is not b.group:
+            return False
+        return self.value == b.value
 
     def __ne__(self, b):       # overload "!="
-        return self.__repr__() != b.__repr__()
+        return not self.__eq__(b)
 
     def __neg__(self):         # overload unary "-"
-        return self.group.zero().sub(self)
+        return self.__class__(self.group.neg(self.value), self.group)
 
     def __iadd__(self, b):
         return self.add(b)
@@ -86,36 +432,132 @@ class abstract_abelian_group_element:
         return self.sub(b)
 
     def __hash__(self):
-        return hash(self.__repr__())
+        if self._hash is None:
+            self._hash = self.group.hash_value(self.value)
+        return self._hash
 
-    def __eq__(self, b):
-        return self.__repr__() == b.__repr__()
-    
-    def __ne__(self, b):
-        return self.repr() != b.__repr__()
-
-    def power(self, k):  # reasonably fast exponentiation
-        # self is a group element
+    def power(self, k):  # k times self, see abstract_abelian_group.scalar_mult
         # k is an integer (possibly mpz)
-        r = self.group.zero()
-        e = mpz(k)
-        if e == 0:
-            return r
-        b = self
-        if b.is_zero():
-            return r
-        if e < 0:
-            b = -b
-            e = -e
-        for i in reversed(e.digits(2)):
-            if i == '1':
-                r = r + b
-            b = b+b
-        return r
+        G = self.group
+        if G.fixed_bases and self.value in G.fixed_bases:
+            return self.__class__(G.fixed_base_mult(G.fixed_bases[self.value], k), G)
+        return self.__class__(G.scalar_mult(self.value, k), G)
+
+    def order(self):
+        """Return the order of self (see abstract_abelian_group.cardinality_factorisation)."""
+        return self.group.order_of(self.value, self.group.cardinality_factorisation())
+
+    def precompute(self, bits=0):
+        """Store the multiples 2^i self for i < bits (more are added when needed) in the group, so that later
+        multiples of self need no doublings. For bases that are used many times, like the generator of a curve."""
+        G = self.group
+        if G.fixed_bases is None:
+            G.fixed_bases = {}
+        G.fixed_bases[self.value] = G.doubles(self.value, max(bits, 1))
 
     def __mul__(self, k):
         return self.power(k)
 
     def __rmul__(self, k):
         return self.power(k)
+
+
+class additive_group(abstract_abelian_group):
+    """The additive group of a finite ring R (for example zmod, primefield or Galoisfield from rings_and_fields).
+    Values are values of R."""
+
+    def __init__(self, R):
+        self.ring = R
+        super().__init__()
+
+    def zero(self):
+        return self.element(self.ring.zero().value, self)
+
+    def normalise(self, v):
+        if getattr(v, 'ring', None) is self.ring:
+            return v.value
+        return self.ring.normalise(v)
+
+    def add(self, a, b):
+        return self.ring.add(a, b)
+
+    def sub(self, a, b):
+        return self.ring.sub(a, b)
+
+    def is_zero(self, v):
+        return self.ring.is_zero(v)
+
+    def hash_value(self, v):
+        return self.ring.hash_value(v)
+
+    def to_string(self, v):
+        return str(self.ring.element(v, self.ring))
+
+    def cardinality(self):
+        return self.ring.cardinality
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(' + self.ring.__repr__() + ')'
+
+    def __str__(self):
+        return 'additive group of ' + str(self.ring)
+
+
+class additive_group_element(abstract_abelian_group_element):
+    pass
+
+
+class multiplicative_group(abstract_abelian_group):
+    """The multiplicative group of a finite field F (primefield or Galoisfield from rings_and_fields), written
+    additively like all abelian groups here: + is multiplication in F, 0 is 1 and k*x is the power x^k.
+    Values are non-zero values of F."""
+
+    def __init__(self, F):
+        self.field = F
+        super().__init__()
+
+    def zero(self):
+        return self.element(self.field.one().value, self)
+
+    def normalise(self, v):
+        if getattr(v, 'ring', None) is self.field:
+            return v.value
+        return self.field.normalise(v)
+
+    def add(self, a, b):
+        return self.field.mult(a, b)
+
+    def sub(self, a, b):
+        return self.field.div(a, b)
+
+    def neg(self, v):
+        return self.field.inv(v)
+
+    def is_zero(self, v):
+        return self.field.is_one(v)
+
+    def scalar_mult(self, v, k):
+        return self.field.normalise(self.field.power(v, k))
+
+    def hash_value(self, v):
+        return self.field.hash_value(v)
+
+    def to_string(self, v):
+        return str(self.field.element(v, self.field))
+
+    def cardinality(self):
+        return self.field.cardinality - 1
+
+    def cardinality_factorisation(self):
+        return self.field.multiplicative_order_factorisation()
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(' + self.field.__repr__() + ')'
+
+    def __str__(self):
+        return 'multiplicative group of ' + str(self.field)
+
+
+class multiplicative_group_element(abstract_abelian_group_element):
+    pass
 # Class: abstract_abelian_group:1 ends here
@@ -8,5 +8,5 @@ setup(
     author_email='t.huettemann@qub.ac.uk',
     python_requires='>=3.7',
     py_modules = ["abelian_groups"],
-    install_requires=['gmpy2']
+    install_requires=['gmpy2>=2.2', 'rings_and_fields']
 )
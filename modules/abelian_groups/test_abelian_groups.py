@@ -0,0 +1,203 @@
+# Tests for abelian_groups. Scalar multiplication (w-NAF, fixed bases), multi-scalar multiplication, orders and
+# discrete logarithms are compared with repeated additions and exhaustive search in small groups. Run with pytest.
+import random
+
+import gmpy2
+import pytest
+import abelian_groups as ab
+import rings_and_fields as rf
+
+
+@pytest.fixture(autouse=True)
+def seed():
+    random.seed(2024)
+
+
+def naive_mult(G, v, k): # k times the value v by repeated addition (k may be negative)
+    r = G.zero().value
+    for i in range(abs(k)):
+        r = G.add(r, v)
+    return G.neg(r) if k < 0 else r
+
+
+# w-NAF and scalar multiplication
+
+@pytest.mark.parametrize('w', [2, 3, 4, 5, 6])
+def test_wnaf(w):
+    for e in list(range(200)) + [random.getrandbits(200) for i in range(50)]:
+        d = ab.wnaf(e, w)
+        assert sum(z << i for (i, z) in enumerate(d)) == e
+        assert all(z == 0 or (z % 2 == 1 and abs(z) < 1 << (w - 1)) for z in d)
+        nz = [i for (i, z) in enumerate(d) if z != 0]
+        assert all(j - i >= w for (i, j) in zip(nz, nz[1:]))
+        assert d == [] or d[-1] > 0
+
+
+@pytest.mark.parametrize('window', [None, 2, 3, 5])
+def test_scalar_mult_matches_repeated_addition(window, monkeypatch):
+    G = ab.additive_group(rf.zmod(1000003))
+    monkeypatch.setattr(G, 'wnaf_window', window)
+    for i in range(20):
+        v = random.randrange(1000003)
+        for k in [0, 1, 2, 3, -1, -5, random.randrange(-300, 300)]:
+            assert G.scalar_mult(v, k) == naive_mult(G, v, k)
+        k = random.getrandbits(100)
+        assert G.scalar_mult(v, k) == v * k % 1000003
+
+
+def test_generic_scalar_mult_in_multiplicative_group():
+    F = rf.primefield(10007)
+    G = ab.multiplicative_group(F)
+    for i in range(20):
+        v = random.randrange(1, 10007)
+        for k in [0, 1, 7, -3, random.randrange(-500, 500), random.getrandbits(64)]:
+            assert ab.abstract_abelian_group.scalar_mult(G, v, k) == pow(v, k, 10007)
+            assert G.el(v) * k == G.el(pow(v, k, 10007))
+
+
+def test_precomputed_fixed_base(monkeypatch):
+    G = ab.additive_group(rf.zmod(2**61 - 1))
+    monkeypatch.setattr(G, 'fixed_bases', None)
+    P = G.el(123456789)
+    P.precompute(8) # the table grows when a longer scalar comes
+    assert len(G.fixed_bases[P.value]) == 8
+    for k in [0, 1, -1, 255, 256, -1000, random.getrandbits(64), -random.getrandbits(100)]:
+        assert (P * k).value == 123456789 * k % (2**61 - 1)
+    assert len(G.fixed_bases[P.value]) > 64
+    assert G.doubles(P.value, 5) == [123456789 << i for i in range(5)]
+    assert G.odd_multiples(P.value, 4) == [123456789 * i for i in [1, 3, 5, 7]]
+
+
+# Multi-scalar multiplication
+
+@pytest.mark.parametrize('n', [1, 2, 5, 40, 200])
+def test_multi_scalar_mul(n):
+    m = 2**61 - 1
+    G = ab.additive_group(rf.zmod(m))
+    for bits in [4, 30, 128]:
+        ks = [random.getrandbits(bits) * random.choice([1, -1]) for i in range(n)]
+        vs = [random.randrange(m) for i in range(n)]
+        ks[0], vs[-1] = 0, 0
+        expected = sum(k * v for (k, v) in zip(ks, vs)) % m
+        assert G.multi_scalar_mul(ks, [G.el(v) for v in vs]).value == expected
+        terms = [(v, k) if k > 0 else (G.neg(v), -k) for (k, v) in zip(ks, vs) if k != 0]
+        if terms == []:
+            continue
+        for w in [2, 3, 5]:
+            assert G.straus(terms, w) == expected
+        for c in [1, 4, 7]:
+            assert G.pippenger(terms, c) == expected
+    assert G.multi_scalar_mul([], []) == G.zero()
+
+
+def test_multi_scalar_cost_switches_to_pippenger():
+    G = ab.additive_group(rf.zmod(101))
+    (cs, w), (cp, c) = G.multi_scalar_cost(2, 256)
+    assert cs < cp
+    (cs, w), (cp, c) = G.multi_scalar_cost(1000, 256)
+    assert cp < cs and c > 4
+
+
+# Discrete logarithms
+
+def naive_log(G, t, g): # the least k with k g = t, by exhaustive search
+    r, k = G.zero().value, 0
+    while True:
+        if r == t:
+            return k
+        r, k = G.add(r, g), k + 1
+        if r == G.zero().value:
+            return None
+
+
+@pytest.mark.parametrize('p', [101, 1009, 65537])
+def test_discrete_log_small(p):
+    F = rf.primefield(p)
+    G = ab.multiplicative_group(F)
+    for i in range(20):
+        g = G.el(random.randrange(2, p))
+        t = G.el(random.randrange(1, p))
+        k = G.discrete_log(t, g)
+        assert k == naive_log(G, t.value, g.value)
+        if k is not None:
+            assert g * k == t and 0 <= k < g.order()
+        k = random.randrange(p - 1)
+        assert G.discrete_log(g * k, g, p - 1) == k % g.order()
+
+
+class serial_pool: # runs the tasks of rho in this process, counting the calls
+    def __init__(self):
+        self.calls = 0
+
+    def map(self, f, jobs):
+        self.calls += 1
+        return list(map(f, jobs))
+
+
+@pytest.mark.parametrize('pool', [None, 'serial', 'spawn'])
+def test_discrete_log_rho(pool, monkeypatch):
+    # p - 1 = 2 * 1000151: the subgroup of prime order 1000151 is solved by Pollard rho above rho_threshold
+    p, q = 2000303, 1000151
+    F = rf.primefield(p)
+    G = ab.multiplicative_group(F)
+    monkeypatch.setattr(G, 'rho_threshold', 2**10)
+    g = G.el(F.primitive_element().value)
+    if pool == 'serial':
+        pool = serial_pool()
+    elif pool == 'spawn':
+        import multiprocessing
+        pool = multiprocessing.get_context('spawn').Pool(2)
+    try:
+        for k in [random.randrange(p - 1) for i in range(3)] + [0, 1, q, p - 2]:
+            assert G.discrete_log(g * k, g, pool=pool) == k
+        h = g * 2 # of order q
+        assert G.discrete_log(h * 12345, h, pool=pool) == 12345
+        assert G.discrete_log(g, h, pool=pool) is None # g is not in the subgroup generated by h
+        if isinstance(pool, serial_pool):
+            assert pool.calls > 0
+    finally:
+        if hasattr(pool, 'terminate'):
+            pool.terminate()
+
+
+# Orders
+
+def naive_order(G, v):
+    r, n = v, 1
+    while not(G.is_zero(r)):
+        r, n = G.add(r, v), n + 1
+    return n
+
+
+def test_factorisation():
+    for n in list(range(1, 300)) + [2**32 - 1, 2**64 + 1, 10007 * 10009 * 2**5]:
+        f = ab.factorisation(n)
+        assert [p for (p, e) in f] == sorted(p for (p, e) in f) and all(gmpy2.is_prime(p) for (p, e) in f)
+        r = 1
+        for (p, e) in f:
+            r *= p**e
+        assert r == n
+
+
+@pytest.mark.parametrize('n', [1, 2, 97, 360, 1024, 4097, 30030])
+def test_order(n):
+    G = ab.additive_group(rf.zmod(n))
+    vs = range(n) if n < 2000 else [random.randrange(n) for i in range(30)]
+    for v in vs:
+        m = naive_order(G, v)
+        assert G.el(v).order() == m
+        assert G.order_from_multiple(v, n * 12) == m
+        assert G.order_of(v, ab.factorisation(m)) == m
+
+
+# Unique groups
+
+def test_groups_are_interned_and_pickled():
+    import pickle
+    F = rf.primefield(101)
+    for G in [ab.additive_group(rf.zmod(12)), ab.multiplicative_group(F), ab.additive_group(F)]:
+        assert G is G.__class__(*G.init_args[0], **G.init_args[1])
+        assert pickle.loads(pickle.dumps(G)) is G
+        v = G.el(5)
+        assert pickle.loads(pickle.dumps(v)) == v
+    assert ab.additive_group(F) is not ab.multiplicative_group(F)
@@ -0,0 +1,7 @@
+# The modules import each other by name (import abelian_groups as ab, ...), so put all three source directories on
+# the path when the tests are run from the source tree instead of against installed packages.
+import os
+import sys
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(here, m) for m in ['rings_and_fields', 'abelian_groups', 'elliptic_curves']]
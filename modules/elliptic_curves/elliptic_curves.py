@@ -1,9 +1,29 @@
 # [[file:../README.org::*Class elliptic_curve][Class elliptic_curve:1]]
 import abelian_groups as ab
+import rings_and_fields as rf
+from gmpy2 import mpz, isqrt, next_prime, invert, lcm, gcd
+from secrets import randbelow
+try:
+    import numpy as np
+except ImportError: # numpy is optional; without it, add_many and double_many work on field values
+    np = None
+
+class zero_divisor(Exception):
+    """Raised during Schoof's algorithm when a polynomial to be inverted shares the factor g with the modulus."""
+    def __init__(self, g):
+        self.g = g
+
 
 class elliptic_curve(ab.abstract_abelian_group):
     """An elliptic curve."""
 
+    # cardinality() counts points one x at a time in fields with fewer elements than this, uses Schoof's algorithm
+    # for prime fields with more elements than schoof_threshold, and baby step giant step (Mestre) otherwise.
+    small_field_limit = 1000
+    schoof_threshold = 2**84
+    # iter_points evaluates x^3 + ax + b at this many x at a time.
+    points_block = 1024
+
     def __init__(self, p):
         # the elliptic curve define by polynomial p, which must be an object
         # of type polynomialring_over_field_element
@@ -11,9 +31,18 @@ class elliptic_curve(ab.abstract_abelian_group):
         # NO CHECKING currently done!
         self.curve = p
         self.a = p.coeff(1)
+        self.b = p.coeff(0)
         self.field = p.ring.basering
         self.element = globals()[self.__class__.__name__ + '_element']
         self.points_cache = set()
+        self.cardinality_cache = None
+        self.division_polynomials = {} # see division_polynomial
+        # Over prime fields with p < 2^32, products of coordinates fit into 64 bits and batches of points can be
+        # handled as numpy arrays, see add_arrays.
+        F = self.field
+        self.word_modulus = None
+        if np is not None and isinstance(F, rf.primefield) and F.char < 2**32:
+            self.word_modulus = int(F.char)
 
     def zero(self):
         return self.element((), self)
@@ -29,8 +58,9 @@ class elliptic_curve(ab.abstract_abelian_group):
         elif x[0] == y[0] and x[1] == -y[1]:
             return ()
         elif x[0] != y[0]:
-            xdp = ((y[1]-x[1])/(y[0]-x[0])) * ((y[1]-x[1])/(y[0]-x[0])) - x[0] - y[0];
-            return ( xdp, ((y[1]-x[1])/(y[0]-x[0]))*(x[0]-xdp) - x[1] )
+            h   = (y[1]-x[1])/(y[0]-x[0])
+            xdp = h*h - x[0] - y[0]
+            return (xdp, h * (x[0] - xdp) - x[1])
         else:
             hh = x[0]*x[0]
             h   = (hh + hh + hh + self.a) / (x[1] + x[1])
@@ -38,13 +68,220 @@ class elliptic_curve(ab.abstract_abelian_group):
             return (xdp, h * (x[0] - xdp) - x[1])
 
     def sub(self, x, y):
-        if y == ():
-            return x
-        return self.add(x, (y[0], -y[1]))
+        return self.add(x, self.neg(y))
+
+    def neg(self, v):
+        if v == ():
+            return v
+        return (v[0], -v[1])
 
     def normalise(self, v):
         return v
 
+    # Jacobian coordinates: (X, Y, Z) with Z != 0 stands for the point (X/Z^2, Y/Z^3), and Z = 0 for the neutral
+    # element. X, Y, Z are values of self.field, not elements, to save the wrapping. Additions and doublings need
+    # no field inversions, so a scalar multiplication or a long sum costs a single inversion, in from_jacobian.
+
+    def to_jacobian(self, v):
+        F = self.field
+        if v == ():
+            return (F.one().value, F.one().value, F.zero().value)
+        return (v[0].value, v[1].value, F.one().value)
+
+    def from_jacobian(self, P):
+        F = self.field
+        X, Y, Z = P
+        if F.is_zero(Z):
+            return ()
+        zi = F.inv(Z)
+        zi2 = F.mult(zi, zi)
+        return (F.element(F.mult(X, zi2), F), F.element(F.mult(Y, F.mult(zi2, zi)), F))
+
+    def from_jacobian_many(self, Ps): # from_jacobian for a list of points, with one inversion (see field.batch_inv)
+        F = self.field
+        zi = iter(F.inv_many([Z for (X, Y, Z) in Ps if not F.is_zero(Z)]))
+        r = []
+        for (X, Y, Z) in Ps:
+            if F.is_zero(Z):
+                r.append(())
+            else:
+                z = next(zi)
+                z2 = F.mult(z, z)
+                r.append((F.element(F.mult(X, z2), F), F.element(F.mult(Y, F.mult(z2, z)), F)))
+        return r
+
+    def double_jacobian(self, P):
+        F = self.field
+        add, sub, mult = F.add, F.sub, F.mult
+        X, Y, Z = P
+        if F.is_zero(Z) or F.is_zero(Y):
+            return self.to_jacobian(())
+        XX = mult(X, X)
+        YY = mult(Y, Y)
+        ZZ = mult(Z, Z)
+        S = mult(X, YY)
+        S = add(S, S)
+        S = add(S, S)                                                   # 4 X Y^2
+        M = add(add(add(XX, XX), XX), mult(self.a.value, mult(ZZ, ZZ)))  # 3 X^2 + a Z^4
+        X3 = sub(sub(mult(M, M), S), S)
+        T = mult(YY, YY)
+        T = add(T, T)
+        T = add(T, T)
+        T = add(T, T)                                                   # 8 Y^4
+        Z3 = mult(Y, Z)
+        return (X3, sub(mult(M, sub(S, X3)), T), add(Z3, Z3))
+
+    def add_mixed(self, P, v): # P in Jacobian coordinates, v an affine value
+        if v == ():
+            return P
+        F = self.field
+        sub, mult = F.sub, F.mult
+        X1, Y1, Z1 = P
+        if F.is_zero(Z1):
+            return self.to_jacobian(v)
+        Z1Z1 = mult(Z1, Z1)
+        H = sub(mult(v[0].value, Z1Z1), X1)
+        r = sub(mult(v[1].value, mult(Z1, Z1Z1)), Y1)
+        if F.is_zero(H):
+            if F.is_zero(r):
+                return self.double_jacobian(P)
+            return self.to_jacobian(())
+        HH  = mult(H, H)
+        HHH = mult(H, HH)
+        V   = mult(X1, HH)
+        X3  = sub(sub(sub(mult(r, r), HHH), V), V)
+        return (X3, sub(mult(r, sub(V, X3)), mult(Y1, HHH)), mult(Z1, H))
+
+    def add_jacobian(self, P, Q): # both in Jacobian coordinates
+        F = self.field
+        sub, mult = F.sub, F.mult
+        X1, Y1, Z1 = P
+        X2, Y2, Z2 = Q
+        if F.is_zero(Z1):
+            return Q
+        if F.is_zero(Z2):
+            return P
+        Z1Z1 = mult(Z1, Z1)
+        Z2Z2 = mult(Z2, Z2)
+        U1 = mult(X1, Z2Z2)
+        S1 = mult(Y1, mult(Z2, Z2Z2))
+        H = sub(mult(X2, Z1Z1), U1)
+        r = sub(mult(Y2, mult(Z1, Z1Z1)), S1)
+        if F.is_zero(H):
+            if F.is_zero(r):
+                return self.double_jacobian(P)
+            return self.to_jacobian(())
+        HH  = mult(H, H)
+        HHH = mult(H, HH)
+        V   = mult(U1, HH)
+        X3  = sub(sub(sub(mult(r, r), HHH), V), V)
+        return (X3, sub(mult(r, sub(V, X3)), mult(S1, HHH)), mult(mult(Z1, Z2), H))
+
+    # Scalar multiplication (see abstract_abelian_group) in Jacobian coordinates; the tables it builds are converted
+    # to affine coordinates together, so that the loops use mixed additions.
+    to_work        = to_jacobian
+    from_work      = from_jacobian
+    from_work_many = from_jacobian_many
+    work_add       = add_mixed
+    work_add_work  = add_jacobian
+    work_double    = double_jacobian
+
+    def add_many(self, P, Q):
+        """Return the list of sums P[i] + Q[i] of two lists of points. The additions share one field inversion
+        (over prime fields with p < 2^32, they run on numpy arrays instead; see add_arrays)."""
+        if self.word_modulus is not None:
+            x1, y1 = self.to_arrays(P)
+            x2, y2 = self.to_arrays(Q)
+            return self.from_arrays(*self.add_arrays(x1, y1, x2, y2))
+        return [self.element(v, self) for v in self.add_values_many([a.value for a in P], [b.value for b in Q])]
+
+    def double_many(self, P):
+        """Return the list of the points 2 P[i], see add_many."""
+        return self.add_many(P, P)
+
+    def add_values_many(self, us, vs): # affine sums u + v for u in us and v in vs, with one inversion
+        F = self.field
+        add, sub, mult = F.add, F.sub, F.mult
+        r = [None] * len(us)
+        todo = [] # (i, x1, y1, x2, numerator, denominator) of the slope
+        for i, (u, v) in enumerate(zip(us, vs)):
+            if u == ():
+                r[i] = v
+            elif v == ():
+                r[i] = u
+            elif u[0] != v[0]:
+                todo.append((i, u[0].value, u[1].value, v[0].value, sub(v[1].value, u[1].value), sub(v[0].value, u[0].value)))
+            elif u[1] == -v[1]:
+                r[i] = ()
+            else:
+                x, y = u[0].value, u[1].value
+                xx = mult(x, x)
+                todo.append((i, x, y, x, add(add(add(xx, xx), xx), self.a.value), add(y, y)))
+        h = F.inv_many([t[5] for t in todo])
+        for (i, x1, y1, x2, n, d), hi in zip(todo, h):
+            l = mult(n, hi)
+            x3 = sub(sub(mult(l, l), x1), x2)
+            r[i] = (F.element(x3, F), F.element(sub(mult(l, sub(x1, x3)), y1), F))
+        return r
+
+    # Batches of points over word-size prime fields (see word_modulus) as numpy arrays x, y of dtype uint64 holding
+    # the coordinates, with x = y = p for the neutral element.
+
+    def to_arrays(self, P):
+        p = self.word_modulus
+        if p is None:
+            print("Class elliptic_curve: coordinate arrays need numpy and a prime field with p < 2^32")
+            raise
+        x = np.array([p if a.is_zero() else int(a.value[0].value) for a in P], dtype=np.uint64)
+        y = np.array([p if a.is_zero() else int(a.value[1].value) for a in P], dtype=np.uint64)
+        return x, y
+
+    def from_arrays(self, x, y):
+        F = self.field
+        p = self.word_modulus
+        return [self.element(() if a == p else (F.element(a, F), F.element(b, F)), self) for (a, b) in zip(x.tolist(), y.tolist())]
+
+    def inv_arrays(self, d): # inverses modulo p of the nonzero entries of d, as d^(p-2)
+        p = np.uint64(self.word_modulus)
+        r = np.ones_like(d)
+        e = self.word_modulus - 2
+        while e:
+            if e & 1:
+                r = r * d % p
+            e >>= 1
+            if e:
+                d = d * d % p
+        return r
+
+    def add_arrays(self, x1, y1, x2, y2):
+        """Elementwise sums of two batches of points given as coordinate arrays (see to_arrays); returns x, y."""
+        p = np.uint64(self.word_modulus)
+        a = np.uint64(int(self.a.value))
+        inf1 = x1 == p
+        inf2 = x2 == p
+        same = (x1 == x2) & ~inf1 & ~inf2
+        dbl = same & (y1 == y2) & (y1 != 0)
+        opp = same & ~dbl # P = -Q
+        num = np.where(dbl, (x1 * x1 % p * np.uint64(3) + a) % p, (y2 + p - y1) % p)
+        den = np.where(dbl, (y1 + y1) % p, (x2 + p - x1) % p)
+        den = np.where(inf1 | inf2 | opp, np.uint64(1), den)
+        l = num * self.inv_arrays(den) % p
+        x3 = (l * l % p + p - x1 + p - x2) % p
+        y3 = (l * ((x1 + p - x3) % p) % p + p - y1) % p
+        x3 = np.where(opp, p, np.where(inf1, x2, np.where(inf2, x1, x3)))
+        y3 = np.where(opp, p, np.where(inf1, y2, np.where(inf2, y1, y3)))
+        return x3, y3
+
+    def double_arrays(self, x, y):
+        """Elementwise doubles of a batch of points given as coordinate arrays; returns x, y."""
+        return self.add_arrays(x, y, x, y)
+
+    def sum(self, points): # the sum of an iterable of elements, with one field inversion
+        P = self.to_jacobian(())
+        for a in points:
+            P = self.add_mixed(P, a.value)
+        return self.element(self.from_jacobian(P), self)
+
     def __repr__(self):
         return self.__class__.__name__ + '(' + self.curve.__repr__() + ')'
 
@@ -53,15 +290,251 @@ class elliptic_curve(ab.abstract_abelian_group):
 
     def points(self):
         if self.points_cache == set():
-            squares = {y*y: y for y in self.curve.ring.basering}
-            for x in self.curve.ring.basering:
-                yq = self.curve.eval(x)
-                if yq in squares:
-                    self.points_cache.add(self.el((x,  squares[yq])))
-                    self.points_cache.add(self.el((x, -squares[yq])))
-            self.points_cache.add(self.el('∞'))
+            self.points_cache = set(self.iter_points())
         return self.points_cache
 
+    def iter_points(self, start=0, stop=None):
+        """Generate the points whose x-coordinate has index start <= n < stop in the order of iteration of the
+        field (see element_at; stop=None means all), and the neutral element first if start is 0. Square roots
+        are computed one x at a time, so the memory used does not depend on the size of the field: disjoint
+        ranges can be enumerated separately."""
+        F = self.field
+        P = self.curve.ring
+        f = self.rhs_value()
+        if stop is None:
+            stop = F.cardinality
+        if start == 0:
+            yield self.zero()
+        for n0 in range(start, stop, self.points_block): # x^3 + ax + b for a block of x at a time, see eval_many
+            xs = [F.element_at(n) for n in range(n0, min(n0 + self.points_block, stop))]
+            for (x, c) in zip(xs, P.eval_many(f, [x.value for x in xs])):
+                v = F.sqrt(c)
+                if v is not None:
+                    y = F.element(v, F)
+                    yield self.el((x, y))
+                    if y != -y:
+                        yield self.el((x, -y))
+
+    def rhs_value(self): # x^3 + ax + b as a value of the polynomial ring of the curve
+        return self.curve.ring.normalise([self.b, self.a, 0, 1])
+
+    def rhs(self, x): # x^3 + ax + b
+        return x*x*x + self.a*x + self.b
+
+    def random_point(self):
+        """Return a random point other than the neutral element (with a random x-coordinate)."""
+        F = self.field
+        while True:
+            x = F.random_element()
+            v = F.sqrt(self.rhs(x).value)
+            if v is not None:
+                y = F.element(v, F)
+                return self.el((x, -y if randbelow(2) else y))
+
+    def cardinality(self):
+        """Return the number of points, including the neutral element. The result is cached."""
+        if self.cardinality_cache is None:
+            F = self.field
+            q = F.cardinality
+            if F.char == 2: # y -> y^2 is bijective: one point for each x
+                N = q + 1
+            elif q < self.small_field_limit:
+                N = self.count_points()
+            elif F.char == q and q > self.schoof_threshold and q > 3:
+                N = self.schoof()
+            else:
+                N = self.mestre()
+            self.cardinality_cache = mpz(N)
+        return self.cardinality_cache
+
+    def count_points(self): # 1 + sum over x of the number of y with y^2 = x^3 + ax + b, using the quadratic character
+        F = self.field
+        N = 1
+        for c in self.curve.ring.eval_all(self.rhs_value()):
+            if F.is_zero(c):
+                N += 1
+            elif F.is_square(c):
+                N += 2
+        return N
+
+    def twist(self): # the quadratic twist y^2 = x^3 + a d^2 x + b d^3 for a non-square d; has 2q + 2 - N points
+        F = self.field
+        d = F.element(F.non_square(), F)
+        return elliptic_curve(self.curve.ring([self.b*d*d*d, self.a*d*d, 0, 1]))
+
+    def mestre(self):
+        """Return the number of points N by baby step giant step in the Hasse interval q + 1 - w <= N <= q + 1 + w,
+        w = floor(2 sqrt(q)). Random points on the curve and on its quadratic twist restrict N to a residue class
+        modulo the lcm of their orders (Mestre), until a single candidate is left."""
+        q = mpz(self.field.cardinality)
+        w = isqrt(4*q)
+        lo, hi = q + 1 - w, q + 1 + w
+        T = self.twist()
+        L, Lt = mpz(1), mpz(1) # N is a multiple of L, and 2q + 2 - N is a multiple of Lt
+        k = 0
+        while True:
+            # solve N = 0 mod L, N = 2q + 2 mod Lt; the candidates are start + j M, 0 <= j <= count
+            g = gcd(L, Lt)
+            M = lcm(L, Lt)
+            u = (2*q + 2) // g * invert(L // g, Lt // g) % (Lt // g)
+            start = L * u + (lo - L * u + M - 1) // M * M
+            count = (hi - start) // M
+            if count == 0:
+                return start
+            if k % 2 == 0:
+                P = self.random_point()
+                m = self.multiple_in_progression(P.value, start, M, count)
+                L = lcm(L, self.order_from_multiple(P.value, m))
+            else:
+                P = T.random_point()
+                m = T.multiple_in_progression(P.value, 2*q + 2 - start - count * M, M, count)
+                Lt = lcm(Lt, T.order_from_multiple(P.value, m))
+            k += 1
+
+    def division_polynomial(self, n):
+        """Return the n-th division polynomial psi_n for odd n, and psi_n / y for even n, as polynomials in x."""
+        psi = self.division_polynomials
+        if n in psi:
+            return psi[n]
+        P = self.curve.ring
+        a, b, f = self.a, self.b, self.curve
+        if n < 5:
+            x = P.x()
+            psi[0] = P.zero()
+            psi[1] = P.one()
+            psi[2] = P([2])
+            psi[3] = P([-a*a, 12*b, 6*a, 0, 3])
+            psi[4] = P([-4*(8*b*b + a*a*a), -16*a*b, -20*a*a, 80*b, 20*a, 0, 4])
+            return psi[n]
+        m = n // 2
+        g = self.division_polynomial
+        if n % 2 == 1:
+            if m % 2 == 0:
+                r = f*f*g(m+2)*g(m)**3 - g(m-1)*g(m+1)**3
+            else:
+                r = g(m+2)*g(m)**3 - f*f*g(m-1)*g(m+1)**3
+        else:
+            r = g(m) * (g(m+2)*g(m-1)**2 - g(m-2)*g(m+1)**2) * P([self.field(2).inv()])
+        psi[n] = r
+        return r
+
+    def schoof(self):
+        """Return the number of points N = q + 1 - t of a curve over a prime field, by Schoof's algorithm: t modulo
+        small primes l from the action of Frobenius on the l-torsion, combined by the Chinese remainder theorem."""
+        q = mpz(self.field.cardinality)
+        P = self.curve.ring
+        w = isqrt(4*q)
+        # t mod 2: t is even iff x^3 + ax + b has a root, that is, iff gcd(x^q - x, x^3 + ax + b) != 1
+        f = self.curve.value
+        xq = self.powmod([0, 1], q, f)
+        t, M = (0 if len(P.Bezout(P.sub(xq, [0, 1]), f)[0]) > 1 else 1), mpz(2)
+        l = mpz(3)
+        while M <= 2*w:
+            if l != q:
+                r = self.schoof_trace_mod(int(l))
+                t = t + M * ((r - t) * invert(M, l) % l)
+                M *= l
+            l = next_prime(l)
+        if t > M // 2:
+            t -= M
+        return q + 1 - t
+
+    def powmod(self, a, e, h): # a^e modulo h, on values of the polynomial ring
+        return self.curve.ring.powmod(a, e, h)
+
+    def schoof_trace_mod(self, l):
+        # Points of the l-torsion are pairs (X, Y) of values standing for (X(x), Y(x) y), modulo the division
+        # polynomial h; None is the neutral element. Whenever a polynomial to be inverted has a proper common factor
+        # with h, the computation starts again modulo that factor.
+        P = self.curve.ring
+        q = mpz(self.field.cardinality)
+        h = self.division_polynomial(l).value
+        while True:
+            try:
+                return self.schoof_frobenius_trace(l, q, h)
+            except zero_divisor as z:
+                h = z.g
+
+    def schoof_frobenius_trace(self, l, q, h):
+        P = self.curve.ring
+        f = P.mod(self.curve.value, h)
+        mod = lambda a: P.mod(a, h)
+        mult = lambda a, b: P.mod(P.mult(a, b), h)
+        c = P.packed_coeff
+
+        def compare(a, b): # True if a = b modulo h, False if a - b is prime to h
+            d = P.Bezout(P.sub(a, b), h)[0]
+            if len(d) == len(h):
+                return True
+            if len(d) == 1:
+                return False
+            raise zero_divisor(d)
+
+        def inv(a):
+            [d, s, t] = P.Bezout(a, h)
+            if len(d) > 1:
+                raise zero_divisor(d)
+            return s
+
+        def add(A, B):
+            if A is None:
+                return B
+            if B is None:
+                return A
+            if compare(A[0], B[0]):
+                if compare(A[1], B[1]):
+                    if compare(A[1], []):
+                        return None
+                    X, Y = A
+                    XX = mult(X, X)
+                    l = mult(P.add(P.add(P.add(XX, XX), XX), [c(self.a)]), inv(mult(P.add(Y, Y), f)))
+                    X3 = P.sub(P.sub(mult(mult(l, l), f), X), X)
+                elif compare(A[1], P.sub([], B[1])):
+                    return None
+                else:
+                    raise zero_divisor(P.Bezout(P.sub(A[1], B[1]), h)[0])
+            else:
+                l = mult(P.sub(B[1], A[1]), inv(P.sub(B[0], A[0])))
+                X3 = P.sub(P.sub(mult(mult(l, l), f), A[0]), B[0])
+            return (mod(X3), mod(P.sub(mult(l, P.sub(A[0], X3)), A[1])))
+
+        def times(k, A):
+            R = None
+            for i in mpz(k).digits(2):
+                R = add(R, R)
+                if i == '1':
+                    R = add(R, A)
+            return R
+
+        x = mod([0, 1])
+        Xq = self.powmod(x, q, h)
+        Yq = self.powmod(f, (q - 1) // 2, h)
+        pi = (Xq, Yq)
+        pi2 = (self.powmod(Xq, q, h), mult(self.powmod(Yq, q, h), Yq)) # g(x)^q = g(x^q) over the prime field
+        ql = int(q % l)
+        Q = times(ql, (x, P.one().value))
+        if Q is not None and compare(pi2[0], Q[0]):
+            if not(compare(pi2[1], Q[1])): # pi^2 = -q on the l-torsion
+                return 0
+            # pi^2 = q: t = 0 unless q is a square w^2 mod l and pi = w or pi = -w on some point, then t = 2w or -2w
+            if pow(ql, (l - 1) // 2, l) != 1:
+                return 0
+            w = next(i for i in range(1, l) if i * i % l == ql)
+            W = times(w, (x, P.one().value))
+            d = P.Bezout(P.sub(Xq, W[0]), h)[0]
+            if len(d) == 1:
+                return 0
+            if len(P.Bezout(P.sub(Yq, W[1]), d)[0]) > 1:
+                return 2 * w % l
+            return -2 * w % l
+        S = add(pi2, Q)
+        T = pi
+        for tau in range(1, (l + 1) // 2):
+            if S is not None and compare(S[0], T[0]):
+                return tau if compare(S[1], T[1]) else l - tau
+            T = add(T, pi)
+        return 0
+
 
 class elliptic_curve_element(ab.abstract_abelian_group_element):
     """The base class for elements of an elliptic curve."""
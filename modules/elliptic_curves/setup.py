@@ -8,5 +8,5 @@ setup(
     author_email='t.huettemann@qub.ac.uk',
     python_requires='>=3.7',
     py_modules = ["elliptic_curves"],
-    install_requires=['abelian_groups']
+    install_requires=['abelian_groups', 'rings_and_fields']
 )
@@ -0,0 +1,243 @@
+# Tests for elliptic_curves. Jacobian and batched point arithmetic, point counting and enumeration are compared with
+# affine additions and brute force on small curves. Run with pytest.
+import random
+
+import pytest
+import rings_and_fields as rf
+import elliptic_curves as ec
+
+
+@pytest.fixture(autouse=True)
+def seed():
+    random.seed(2024)
+
+
+def curve(F, a, b): # y^2 = x^3 + ax + b over F
+    R = rf.polynomialring_over_field(F)
+    return ec.elliptic_curve(R([F(b), F(a), 0, 1]))
+
+
+def curves():
+    F = rf.primefield(1009)
+    K = rf.Galoisfield(rf.polynomialring_over_field(rf.primefield(19), 't')([1, 0, 1]), print_modulus=False)
+    return [curve(F, 4, 7), curve(K, 4, 7)]
+
+
+def naive_mult(C, v, k): # k times the value v by repeated affine addition
+    r = ()
+    for i in range(k):
+        r = C.add(r, v)
+    return r
+
+
+# Jacobian coordinates
+
+@pytest.mark.parametrize('C', curves(), ids=['primefield', 'Galoisfield'])
+def test_jacobian_round_trip(C):
+    pts = random.sample(sorted(C.points(), key=str), 20) + [C.zero()]
+    for P in pts:
+        assert C.from_jacobian(C.to_jacobian(P.value)) == P.value
+    assert C.from_jacobian_many([C.to_jacobian(P.value) for P in pts]) == [P.value for P in pts]
+
+
+@pytest.mark.parametrize('C', curves(), ids=['primefield', 'Galoisfield'])
+def test_jacobian_add_and_double(C):
+    pts = sorted(C.points(), key=str)
+    F = C.field
+    for i in range(50):
+        u, v = random.choice(pts).value, random.choice(pts).value
+        # a representative of u with Z != 1
+        z = F.random_element()
+        while z.is_zero():
+            z = F.random_element()
+        U = C.to_jacobian(u)
+        U = (F.mult(U[0], F.mult(z.value, z.value)), F.mult(U[1], F.mult(z.value, F.mult(z.value, z.value))), F.mult(U[2], z.value))
+        assert C.from_jacobian(C.double_jacobian(U)) == C.add(u, u)
+        assert C.from_jacobian(C.add_mixed(U, v)) == C.add(u, v)
+        assert C.from_jacobian(C.add_jacobian(U, C.to_jacobian(v))) == C.add(u, v)
+        assert C.from_jacobian(C.add_mixed(U, C.neg(u))) == ()
+        assert C.from_jacobian(C.add_mixed(U, u)) == C.add(u, u)
+
+
+@pytest.mark.parametrize('C', curves(), ids=['primefield', 'Galoisfield'])
+def test_scalar_mult_matches_repeated_addition(C):
+    pts = sorted(C.points(), key=str)
+    for i in range(10):
+        P = random.choice(pts)
+        for k in [0, 1, 2, 3, 7, 16, 31, 100, random.randrange(200)]:
+            assert (P * k).value == naive_mult(C, P.value, k)
+            assert (P * -k).value == C.neg(naive_mult(C, P.value, k))
+    P = random.choice(pts)
+    assert P * len(pts) == C.zero()
+
+
+@pytest.mark.parametrize('C', curves(), ids=['primefield', 'Galoisfield'])
+def test_sum_matches_affine_additions(C):
+    pts = random.sample(sorted(C.points(), key=str), 30)
+    pts += pts[:5] + [-P for P in pts[5:10]] + [C.zero()]
+    r = ()
+    for P in pts:
+        r = C.add(r, P.value)
+    assert C.sum(pts).value == r
+
+
+@pytest.mark.parametrize('C', curves(), ids=['primefield', 'Galoisfield'])
+def test_multi_scalar_mul_on_curves(C):
+    pts = sorted(C.points(), key=str)
+    for n in [3, 60]:
+        Ps = random.sample(pts, n)
+        ks = [random.randrange(-2000, 2000) for i in range(n)]
+        expected = C.sum([P * k for (P, k) in zip(Ps, ks)])
+        assert C.multi_scalar_mul(ks, Ps) == expected
+        terms = [(P.value, k) if k > 0 else (C.neg(P.value), -k) for (P, k) in zip(Ps, ks) if k != 0]
+        assert C.straus(terms, 3) == expected.value
+        assert C.pippenger(terms, 4) == expected.value
+
+
+# Batched additions
+
+def check_add_many(C):
+    pts = sorted(C.points(), key=str)
+    two_torsion = [P for P in pts if not(P.is_zero()) and P.value[1].is_zero()]
+    Ps = random.sample(pts, 100) + two_torsion + [C.zero(), C.zero()] + pts[:10] + pts[10:20]
+    Qs = random.sample(pts, 100) + two_torsion + [C.zero(), pts[5]] + pts[:10] + [-P for P in pts[10:20]]
+    assert C.add_many(Ps, Qs) == [C.el(C.add(P.value, Q.value)) for (P, Q) in zip(Ps, Qs)]
+    assert C.double_many(Ps) == [C.el(C.add(P.value, P.value)) for P in Ps]
+    assert C.add_many([], []) == []
+
+
+@pytest.mark.parametrize('C', curves(), ids=['primefield', 'Galoisfield'])
+def test_add_many(C):
+    check_add_many(C)
+
+
+def test_add_many_without_numpy(monkeypatch):
+    C = curves()[0]
+    if C.word_modulus is None:
+        pytest.skip('needs numpy')
+    check_add_many(C)
+    monkeypatch.setattr(C, 'word_modulus', None)
+    check_add_many(C)
+
+
+def test_word_arrays_only_over_prime_fields():
+    F = rf.primefield(1009)
+    G = rf.Galoisfield(rf.polynomialring_over_field(F, 't')([3, 1]), print_modulus=False) # degree 1, isomorphic to F
+    C = curve(G, 4, 7)
+    assert C.word_modulus is None
+    assert len(C.points()) == len(curves()[0].points())
+    check_add_many(C)
+    assert curve(rf.primefield(2**32 + 15), 1, 1).word_modulus is None
+
+
+# Point counting
+
+def brute_force_count(C):
+    F = C.field
+    squares = {}
+    for y in F:
+        squares[y * y] = squares.get(y * y, 0) + 1
+    return 1 + sum(squares.get(C.rhs(x), 0) for x in F)
+
+
+def small_curves():
+    F2 = rf.primefield(2)
+    B = rf.Galoisfield(rf.polynomialring_over_field(F2, 't')([1, 1, 0, 0, 1]), print_modulus=False)
+    K = rf.Galoisfield(rf.polynomialring_over_field(rf.primefield(7), 't')([1, 0, 1]), print_modulus=False)
+    L = rf.Galoisfield(rf.polynomialring_over_field(rf.primefield(23), 't')([1, 0, 1]), print_modulus=False)
+    return [curve(rf.primefield(p), a, b) for p in [101, 1009] for (a, b) in [(1, 1), (0, 5), (7, 0), (3, 10)]] + \
+           [curve(K, 2, 3), curve(K, 0, 1), curve(L, 2, 3), curve(L, 5, 0), curve(B, 1, 1)]
+
+
+@pytest.mark.parametrize('C', small_curves(), ids=str)
+def test_cardinality_matches_brute_force(C, monkeypatch):
+    N = brute_force_count(C)
+    q = C.field.cardinality
+    methods = [(1000, 2**84)] # count_points
+    if C.field.char != 2:
+        assert C.count_points() == N
+        assert C.twist().count_points() == 2*q + 2 - N
+        if q > 229: # below, the orders of points need not determine N (Mestre)
+            assert C.mestre() == N
+            methods.append((0, 2**84))
+        if C.field.char == q:
+            assert C.schoof() == N
+            methods.append((0, 0))
+    for limit, threshold in methods:
+        monkeypatch.setattr(C, 'small_field_limit', limit)
+        monkeypatch.setattr(C, 'schoof_threshold', threshold)
+        monkeypatch.setattr(C, 'cardinality_cache', None)
+        assert C.cardinality() == N
+    assert len(C.points()) == N
+
+
+def test_schoof_and_mestre_agree():
+    for p in [10007, 65537, 1000003]:
+        for i in range(3):
+            C = curve(rf.primefield(p), random.randrange(p), random.randrange(p))
+            N = C.schoof()
+            assert N == C.mestre()
+            assert abs(N - p - 1) <= 2 * p**0.5
+            assert C.random_point() * N == C.zero()
+    C = curve(rf.primefield(10007), 5, 9)
+    assert C.schoof() == C.count_points()
+
+
+# Enumerating points
+
+def brute_force_points(C, start, stop):
+    F = C.field
+    roots = {}
+    for y in F:
+        roots.setdefault(y * y, []).append(y)
+    r = {C.zero()} if start == 0 else set()
+    for n in range(start, stop):
+        x = F.element_at(n)
+        r |= {C.el((x, y)) for y in roots.get(C.rhs(x), [])}
+    return r
+
+
+@pytest.mark.parametrize('block', [1, 7, 1024])
+def test_iter_points(block, monkeypatch):
+    K = rf.Galoisfield(rf.polynomialring_over_field(rf.primefield(23), 't')([1, 0, 1]), print_modulus=False)
+    for C in [curve(rf.primefield(1009), 3, 10), curve(K, 2, 3)]:
+        monkeypatch.setattr(C, 'points_block', block)
+        q = C.field.cardinality
+        ranges = [(0, q), (0, 1), (0, 7), (6, 8), (7, 14), (13, 15), (100, 300), (q - 5, q), (50, 50)]
+        for (start, stop) in ranges:
+            pts = list(C.iter_points(start, stop))
+            assert len(pts) == len(set(pts))
+            assert set(pts) == brute_force_points(C, start, stop)
+        assert list(C.iter_points()) == list(C.iter_points(0, q))
+        # disjoint ranges cover the curve
+        cut = [0, 5, 7, 100, 333, q]
+        pts = [P for (a, b) in zip(cut, cut[1:]) for P in C.iter_points(a, b)]
+        assert len(pts) == len(set(pts)) == C.cardinality()
+
+
+# Discrete logarithms
+
+def test_discrete_log_on_curve(monkeypatch):
+    C = curve(rf.primefield(1009), 3, 10)
+    pts = sorted(C.points(), key=str)
+    for threshold in [2**32, 2]: # baby step giant step, Pollard rho
+        monkeypatch.setattr(C, 'rho_threshold', threshold)
+        for i in range(10):
+            P = random.choice(pts)
+            k = random.randrange(P.order())
+            assert C.discrete_log(P * k, P) == k
+            Q = random.choice(pts)
+            k = C.discrete_log(Q, P)
+            assert (k is None) == all(P * j != Q for j in range(P.order()))
+
+
+# Orders
+
+@pytest.mark.parametrize('C', curves(), ids=['primefield', 'Galoisfield'])
+def test_point_orders(C):
+    pts = random.sample(sorted(C.points(), key=str), 40) + [C.zero()]
+    for P in pts:
+        n, Q = 1, P
+        while not(Q.is_zero()):
+            n, Q = n + 1, Q + P
+        assert P.order() == n
@@ -1,16 +1,94 @@
 # [[file:../README.org::*Rings and fields][Rings and fields:1]]
 import gmpy2
 from secrets import randbelow
-from gmpy2 import mpz, is_zero, gcdext, gcd, divm, is_prime, f_mod
+from gmpy2 import mpz, is_zero, gcdext, gcd, divm, is_prime, f_mod, legendre, powmod
 import itertools
+import inspect
+import weakref
+import os
+import json
 import primefac as pf
+try:
+    import numpy as np
+except ImportError: # numpy is optional; without it, polynomials are multiplied with Karatsuba only
+    np = None
+
+def factorisation(n): # the prime factorisation of the integer n > 0, as a sorted list of pairs (p, e)
+    f = {}
+    for p in pf.primefac(int(n)):
+        f[p] = f.get(p, 0) + 1
+    return sorted((mpz(p), e) for (p, e) in f.items())
+
+def order_of(v, factors, mult, is_zero):
+    # The order of v under the scalar multiplication mult(v, k) (a power, or a multiple in an additive group), given
+    # the factorisation of a multiple of it; is_zero tests for the neutral element. The factors are split in two
+    # halves L and R: the order is that of R v (which divides L) times that of L v, so that each multiplication is
+    # shared by all the primes of one half. Used by field.multiplicative_order and by abelian_groups.
+    if len(factors) == 0:
+        return mpz(1)
+    if len(factors) == 1:
+        p, e = factors[0]
+        n = mpz(1)
+        while not(is_zero(v)):
+            v = mult(v, p)
+            n *= p
+        return n
+    h = len(factors) // 2
+    nL, nR = mpz(1), mpz(1)
+    for (p, e) in factors[:h]:
+        nL *= p**e
+    for (p, e) in factors[h:]:
+        nR *= p**e
+    return order_of(mult(v, nR), factors[:h], mult, is_zero) * order_of(mult(v, nL), factors[h:], mult, is_zero)
+
+
+class unique_parent(type):
+    """Metaclass for rings and fields (and the groups of abelian_groups). Constructing a ring twice with the same
+    arguments returns the same object, so rings are compared by identity and the work done in __init__ (primality
+    checks and so on) happens only once. Arguments that only affect printing are left out of the key (see
+    cache_key). The arguments are kept in init_args, and rings are pickled by them (see ring.__reduce__), so that
+    unpickling, for instance in a worker process, also returns the unique ring."""
+
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        cls._instances = weakref.WeakValueDictionary()
+
+    def __call__(cls, *args, **kwargs):
+        try:
+            key = cls.cache_key(*args, **kwargs)
+            r = cls._instances.get(key)
+        except (TypeError, ValueError):  # bad or unhashable arguments: let __init__ deal with them
+            r = super().__call__(*args, **kwargs)
+            r.init_args = (args, kwargs)
+            return r
+        if r is None:
+            r = super().__call__(*args, **kwargs)
+            r.init_args = (args, kwargs)
+            cls._instances[key] = r
+        return r
+
+    def cache_key(cls, *args, **kwargs):
+        # the arguments of __init__, with defaults filled in and lists turned into tuples;
+        # classes may override this with a classmethod of the same name
+        b = inspect.signature(cls.__init__).bind(None, *args, **kwargs)
+        b.apply_defaults()
+        return tuple(tuple(a) if isinstance(a, list) else a for a in list(b.arguments.values())[1:])
+
 
-class ring:
-    """This is the base class for a (commutative) ring. This class contains no data, but defines a setup method that should be called by subclasses during initialisation."""
+def make_parent(cls, args, kwargs): # construct cls(*args, **kwargs); used to unpickle rings, see unique_parent
+    return cls(*args, **kwargs)
+
+
+class ring(metaclass=unique_parent):
+    """This is the base class for a (commutative) ring. This class contains no data, but defines a setup method that should be called by subclasses during initialisation.
+    Rings are unique: see class unique_parent."""
 
     def __init__(self):
         self.element = globals()[self.__class__.__name__ + '_element']
 
+    def __reduce__(self): # pickle by the constructor arguments, see unique_parent
+        return (make_parent, (self.__class__,) + self.init_args)
+
     def latex_details(self):
         return self.latex()
 
@@ -26,6 +104,9 @@ class ring:
     def equals(self, a, b):
         return self.is_zero(self.sub(a,b))
 
+    def hash_value(self, v):  # hash of a (normalised) value, used by ring_element.__hash__
+        return hash(v)
+
     def power(self, x, k):  # reasonably fast exponentiation
                             # x a ring element
                             # k is an integer (possibly mpz)
@@ -52,12 +133,6 @@ class ring:
     def __str__(self):
         return 'ring'
 
-    def __eq__(self, b):
-        return self.__repr__() == b.__repr__()  # overload "=="
-
-    def __ne__(self, b):       # overload "!="
-        return self.__repr__() != b.__repr__()
-
     def __call__(self, *args):
         if isinstance(args[0], self.element):
             return args[0]
@@ -70,6 +145,8 @@ class ring:
 class ring_element:
     """This is the base class for elements of a ring. This class defines generic methods for the algebraic structure."""
 
+    _hash = None  # computed on first call of __hash__; elements are never modified after construction
+
     def __init__(self, v, r):
         self.ring  = r
         self.value = r.normalise(v)
@@ -81,20 +158,20 @@ class ring_element:
         return self.__class__.__name__ + '(' + self.value.__repr__() + ', ' + self.ring.__repr__() + ')'
 
     def add(self, b):
-        if (self.ring != b.ring):
+        if (self.ring is not b.ring):
             print("Addition: Summands must lie in same ring")
             raise
         return self.__class__(self.ring.add(self.value, b.value), self.ring)
 
     def sub(self, b):
-        if (self.ring != b.ring):
+        if (self.ring is not b.ring):
             print("Subtraction: Summands must lie in same ring")
             raise
         return self.__class__(self.ring.sub(self.value, b.value), self.ring)
 
     def mult(self, b):
         # need to implement type checking for b
-        if (self.ring != b.ring):
+        if (self.ring is not b.ring):
             print("Multiplication: Factors must lie in same ring")
             raise
         return self.__class__(self.ring.mult(self.value, b.value), self.ring)
@@ -106,7 +183,7 @@ class ring_element:
         return not self.ring.is_zero(self.value)
 
     def is_one(self):
-        return self.__repr__() == self.ring.one().__repr__()
+        return self == self.ring.one()
 
     def equals(self, b):
         return self.ring.equals(self.value, b.value)
@@ -116,7 +193,7 @@ class ring_element:
 
     def __add__(self, b):      # overload "+"
         if (isinstance(b, ring_element)):
-            if (self.ring != b.ring):
+            if (self.ring is not b.ring):
                 try:
                     c = self.ring(b)
                 except:
@@ -135,7 +212,7 @@ class ring_element:
 
     def __radd__(self, b):      # overload "+"
         if (isinstance(b, ring_element)):
-            if (self.ring != b.ring):
+            if (self.ring is not b.ring):
                 try:
                     c = self.ring(b)
                 except:
@@ -154,7 +231,7 @@ class ring_element:
 
     def __sub__(self, b):      # overload "-"
         if (isinstance(b, ring_element)):
-            if (self.ring != b.ring):
+            if (self.ring is not b.ring):
                 try:
                     c = self.ring(b)
                 except:
@@ -174,7 +251,7 @@ class ring_element:
 
     def __rsub__(self, b):      # overload "-"
         if (isinstance(b, ring_element)):
-            if (self.ring != b.ring):
+            if (self.ring is not b.ring):
                 try:
                     c = self.ring(b)
                 except:
@@ -197,11 +274,18 @@ class ring_element:
     def __rmul__(self, b):      # overload "*"
         return self.ring(b).mult(self)
 
-    def __eq__(self, b):
-        return self.__repr__() == b.__repr__()  # overload "=="
+    def __eq__(self, b):       # overload "=="
+        # elements are equal if they have the same type, lie in the same ring and have the same normalised value
+        if self is b:
+            return True
+        if self.__class__ is not b.__class__:
+            return False
+        if self.ring is not b.ring:
+            return False
+        return self.value == b.value
 
     def __ne__(self, b):       # overload "!="
-        return self.__repr__() != b.__repr__()
+        return not self.__eq__(b)
 
     def __neg__(self):         # overload unary "-"
         return self.ring.zero().sub(self)
@@ -210,7 +294,9 @@ class ring_element:
         return self.ring(self.ring.power(self.value, k))
 
     def __hash__(self):
-        return hash(self.__repr__())
+        if self._hash is None:
+            self._hash = self.ring.hash_value(self.value)
+        return self._hash
 
     def _print_sign(self):
         return '+'
@@ -285,6 +371,10 @@ class Z_element(ring_element):
         return self.ring(self.ring.div(self.value, n.value))
 
 class zmod(ring):
+    @classmethod
+    def cache_key(cls, m):
+        return abs(mpz(m))
+
     def __init__(self, m):
         self.modulus = abs(mpz(m))
         self.iterator = globals()['zmod_iterator']
@@ -315,12 +405,52 @@ class zmod(ring):
     def mult(self, a, b):
         return f_mod(a * b, self.modulus)
 
+    # Powers, inverses and quotients are computed by gmpy2 instead of the generic loops of ring and field.
+
+    def power(self, x, k): # x^k, for negative k only if x is a unit
+        try:
+            return powmod(x, k, self.modulus)
+        except ValueError: # gmpy2 reports a non-invertible base as ValueError, where inv and div raise ZeroDivisionError
+            print(f"Class {self.__class__.__name__}: Cannot invert {x} modulo {self.modulus}")
+            raise ZeroDivisionError from None
+
+    def power_many(self, v, k): # [x^k for x in v] on values, with a single call of gmpy2
+        if k < 0:
+            v = [self.inv(x) for x in v]
+            k = -k
+        return gmpy2.powmod_base_list(v, k, self.modulus)
+
+    def inv(self, x): # 1/x for a unit x
+        try:
+            return gmpy2.invert(x, self.modulus)
+        except ZeroDivisionError:
+            print(f"Class {self.__class__.__name__}: Cannot invert {x} modulo {self.modulus}")
+            raise
+
+    def div(self, a, b): # a/b for a unit b
+        try:
+            return divm(a, b, self.modulus)
+        except ZeroDivisionError:
+            print(f"Class {self.__class__.__name__}: Cannot divide by {b} modulo {self.modulus}")
+            raise
+
+    def batch_power(self, elements, k):
+        """Return the list of k-th powers of the given elements (units if k is negative), see power_many."""
+        for a in elements:
+            if a.ring is not self:
+                print("batch_power: Elements must lie in this ring")
+                raise
+        return [self.element(c, self) for c in self.power_many([a.value for a in elements], k)]
+
     def is_zero(self, v):
         return (f_mod(mpz(v), self.modulus) == 0)
 
     def __iter__(self):
         return self.iterator(self)
 
+    def element_at(self, n): # the element with index n (0 <= n < cardinality) in the order of iteration
+        return self(n)
+
     def random_element(self):
         """Return a random element."""
         return self(randbelow(self.modulus))
@@ -354,9 +484,121 @@ class zmod_iterator:
 
 class field(ring):
     """Base class for fields. Does nothing, and contains no data."""
+
+    sqrt_data = None # (s, Q, z) with q - 1 = 2^s Q, Q odd, and z = d^Q for a non-square d; see sqrt
+    order_factors = None # see multiplicative_order_factorisation
+    generator = None # see primitive_element
+
     def inv(self, x): # compute 1/x
         return self.div(self.one().value, x)
 
+    def is_one(self, v):
+        return self.is_zero(self.sub(v, self.one().value))
+
+    def is_square(self, v): # quadratic character of a finite field, by Euler's criterion
+        if self.is_zero(v) or self.char == 2:
+            return True
+        return self.is_one(self.power(v, (self.cardinality - 1) // 2))
+
+    def multiplicative_order_factorisation(self):
+        """Return the factorisation of q - 1, the order of the multiplicative group, as a list of pairs (p, e).
+        It is computed once per field."""
+        if self.order_factors is None:
+            self.order_factors = factorisation(self.cardinality - 1)
+        return self.order_factors
+
+    def multiplicative_order(self, v, factors=None):
+        # The order of the non-zero value v, given the factorisation of a multiple of it (default: q - 1); see order_of.
+        if factors is None:
+            factors = self.multiplicative_order_factorisation()
+        return order_of(v, factors, self.power, self.is_one)
+
+    def primitive_element(self):
+        """Return a generator of the multiplicative group (the first one in the order of iteration, or x for
+        a Galois field whose modulus is primitive). The result is cached."""
+        if self.generator is None:
+            g = self.first_primitive_candidate() # x is 0 if the modulus is x
+            n = 1
+            while not(self.is_primitive(g.value)):
+                g = self.element_at(n)
+                n += 1
+            self.generator = g
+        return self.generator
+
+    def is_primitive(self, v): # whether the value v generates the multiplicative group
+        if self.is_zero(v):
+            return False
+        q1 = self.cardinality - 1
+        return all(not(self.is_one(self.power(v, q1 // p))) for (p, e) in self.multiplicative_order_factorisation())
+
+    def first_primitive_candidate(self):
+        return self.one()
+
+    def non_square(self): # a (random) non-square value, for odd q
+        d = self.random_element().value
+        while self.is_square(d):
+            d = self.random_element().value
+        return d
+
+    def sqrt(self, v):
+        """Return a square root of the value v in a finite field, or None if there is none (Tonelli-Shanks)."""
+        if self.cardinality == float('inf'):
+            print(f"Method 'sqrt': only implemented for finite fields (Class {self.__class__})")
+            raise
+        if self.is_zero(v):
+            return v
+        q = self.cardinality
+        if self.char == 2: # squaring is bijective
+            return self.power(v, q // 2)
+        if self.sqrt_data is None:
+            s, Q = 0, q - 1
+            while Q % 2 == 0:
+                s, Q = s + 1, Q // 2
+            self.sqrt_data = (s, Q, self.power(self.non_square(), Q))
+        M, Q, z = self.sqrt_data
+        w = self.power(v, (Q - 1) // 2)
+        r = self.mult(v, w)   # v^((Q+1)/2)
+        t = self.mult(r, w)   # v^Q; invariant r^2 = t v, and t has order dividing 2^(M-1)
+        while not(self.is_one(t)):
+            i, u = 0, t
+            while not(self.is_one(u)):
+                u = self.mult(u, u)
+                i += 1
+                if i == M: # t has order 2^M: v is not a square
+                    return None
+            b = z
+            for j in range(M - i - 1):
+                b = self.mult(b, b)
+            M, z = i, self.mult(b, b)
+            t = self.mult(t, z)
+            r = self.mult(r, b)
+        return r
+
+    def batch_inv(self, elements):
+        """Return the list of inverses of the given (nonzero) elements, computed with a single inversion."""
+        for a in elements:
+            if a.ring is not self:
+                print("batch_inv: Elements must lie in this field")
+                raise
+        return [self.element(c, self) for c in self.inv_many([a.value for a in elements])]
+
+    def inv_many(self, v): # inverses of the values v; Montgomery's trick: one inversion and 3(n-1) multiplications
+        if v == []:
+            return []
+        c = [v[0]] # c[i] = v[0] ... v[i]
+        for x in v[1:]:
+            c.append(self.mult(c[-1], x))
+        if self.is_zero(c[-1]):
+            print("batch_inv: Cannot invert 0")
+            raise
+        u = self.inv(c[-1])
+        r = [None] * len(v)
+        for i in range(len(v) - 1, 0, -1):
+            r[i] = self.mult(u, c[i-1])
+            u = self.mult(u, v[i])
+        r[0] = u
+        return r
+
     def power(self, x, k):  # reasonably fast exponentiation
         # x a ring element
         # k is an integer (possibly mpz)
@@ -372,7 +614,7 @@ class field(ring):
             return x
         for i in reversed(e.digits(2)):
             if i == '1':
-                r = self.normalise(self.mult(r, b))
+                r = self.mult(r, b)
             b = self.mult(b, b)
         return r
 
@@ -381,7 +623,7 @@ class field_element(ring_element):
     """Base class for elements of a field. Provides method "div" which must be provided by actual implementation of field."""
 
     def div(self, b):
-        if (self.ring != b.ring):
+        if (self.ring is not b.ring):
             print("Division: Arguments must lie in same field")
             raise
         if b.is_zero():
@@ -392,13 +634,36 @@ class field_element(ring_element):
         if self.is_zero():
             print(f"Method 'inv': Cannot invert 0 (Class {self.__class__})")
             raise
-        return self.ring.one().div(self)
+        return self.__class__(self.ring.inv(self.value), self.ring)
 
     def __truediv__(self, b):      # overload "/"
         return self.div(b)
 
     def __rtruediv__(self, b):
         return self.ring(b).div(self)
+
+    def is_square(self):
+        return self.ring.is_square(self.value)
+
+    def order(self):
+        """Return the multiplicative order (see the field's multiplicative_order)."""
+        if self.is_zero():
+            print("Method 'order': 0 has no multiplicative order")
+            raise
+        return self.ring.multiplicative_order(self.value)
+
+    def is_generator(self):
+        if self.is_zero():
+            return False
+        return self.ring.is_primitive(self.value)
+
+    def sqrt(self):
+        """Return a square root (see the field's sqrt)."""
+        r = self.ring.sqrt(self.value)
+        if r is None:
+            print(f"Method 'sqrt': {self} is not a square")
+            raise
+        return self.__class__(r, self.ring)
     
     def __idiv__(self, b):         # overload "/="
         return self.div(b)
@@ -420,8 +685,64 @@ class primefield(zmod, field):
     def latex(self):
         return '\mathbb{F}_{' + str(self.modulus) + '}'
 
-    def div(self, a, b):
-        return divm(a, b, self.modulus)
+    def is_square(self, v):
+        return self.modulus == 2 or legendre(v, self.modulus) != -1
+
+    def non_square(self):
+        n = mpz(2)
+        while legendre(n, self.modulus) != -1:
+            n += 1
+        return n
+
+    def sqrt(self, v): # see field.sqrt; on mpz, with shortcuts for p = 3 mod 4 and p = 5 mod 8 (Atkin)
+        p = self.modulus
+        v = f_mod(mpz(v), p)
+        if v == 0 or p == 2:
+            return v
+        if legendre(v, p) != 1:
+            return None
+        if p % 4 == 3:
+            return powmod(v, (p + 1) // 4, p)
+        if p % 8 == 5:
+            b = powmod(2*v, (p - 5) // 8, p)
+            i = f_mod(2*v*b*b, p) # a square root of -1
+            return f_mod(v*b*(i - 1), p)
+        if self.sqrt_data is None:
+            s, Q = 0, p - 1
+            while Q % 2 == 0:
+                s, Q = s + 1, Q // 2
+            self.sqrt_data = (s, Q, powmod(self.non_square(), Q, p))
+        M, Q, z = self.sqrt_data
+        r = powmod(v, (Q + 1) // 2, p)
+        t = powmod(v, Q, p)
+        while t != 1:
+            i, u = 0, t
+            while u != 1:
+                u = f_mod(u*u, p)
+                i += 1
+            b = powmod(z, 1 << (M - i - 1), p)
+            M, z = i, f_mod(b*b, p)
+            t = f_mod(t*z, p)
+            r = f_mod(r*b, p)
+        return r
+
+    def inv_many(self, v): # see field.inv_many; on mpz values directly
+        if v == []:
+            return []
+        p = self.modulus
+        c = [f_mod(mpz(v[0]), p)]
+        for x in v[1:]:
+            c.append(f_mod(c[-1] * x, p))
+        if c[-1] == 0:
+            print("batch_inv: Cannot invert 0")
+            raise
+        u = gmpy2.invert(c[-1], p)
+        r = [None] * len(v)
+        for i in range(len(v) - 1, 0, -1):
+            r[i] = f_mod(u * c[i-1], p)
+            u = f_mod(u * v[i], p)
+        r[0] = u
+        return r
 
 
 class primefield_element(zmod_element, field_element):
@@ -467,11 +788,30 @@ class Q_element(field_element):
 
 class polynomialring(ring):
 
+    # The thresholds are on the smaller degree of the two factors and come from benchmarks/bench_multiplication.py.
+    # Polynomials with coefficients that are ring elements (in Q, Z or a Galois field, say) are multiplied by
+    # Karatsuba above karatsuba_threshold, and by the schoolbook method up to it.
+    karatsuba_threshold = 15
+    # Packed polynomials are multiplied by the schoolbook method below kronecker_threshold, and by Kronecker
+    # substitution from there on (gmpy2 multiplies the integers subquadratically): with numpy if the product
+    # coefficients fit into a word, and with gmpy2 alone otherwise. Products whose coefficients do not fit into
+    # a word may be computed by number-theoretic transform (needs numpy) from ntt_threshold on, if the modulus is
+    # itself a suitable prime (see mult_ntt); None turns this off, the default, since the transform was slower
+    # than Kronecker substitution at every size measured (up to 2^20 coefficients).
+    kronecker_threshold = 11
+    ntt_threshold = None
+
     def __init__(self, r, i='x', parentheses=['', '']):
         if isinstance(r, ring):
             self.basering = r
             self.indeterminate = i
             self.parentheses = parentheses
+            # Polynomials over Z/m are "packed": their values are lists of plain integers in the range 0..m-1
+            # (Python ints if m fits in 63 bits, mpz otherwise) instead of lists of ring elements.
+            self.packed = isinstance(r, zmod)
+            if self.packed:
+                self.c_type = int if r.modulus.bit_length() <= 63 else mpz
+                self.c_mod  = self.c_type(r.modulus)
             super().__init__()
         else:
             print("Coefficients must lie in a ring")
@@ -488,6 +828,8 @@ class polynomialring(ring):
 
     def normalise(self, v):
         # v is a list with coefficients, starting with degree 0; if it's a single element, turn into a list first
+        if self.packed:
+            return self.normalise_packed(v)
         if isinstance(v, list):
             w = list(map(lambda x: x if isinstance(x, ring_element) else self.basering.element(x, self.basering), v))
         else:
@@ -499,13 +841,49 @@ class polynomialring(ring):
             w.pop()
         return w
 
+    def normalise_packed(self, v):
+        m = self.c_mod
+        t = self.c_type
+        if not(isinstance(v, list)):
+            v = v.value if isinstance(v, binary_polynomial) else [v] # bit masks are polynomials, see Galoisfield
+        w = [x if (type(x) is t and 0 <= x < m) else self.packed_coeff(x) for x in v]
+        while w and not w[-1]:
+            w.pop()
+        return w
+
+    def packed_coeff(self, x): # turn x (a ring element, integer or string) into a coefficient of a packed polynomial
+        if isinstance(x, ring_element):
+            x = x.value
+        return self.c_type(f_mod(mpz(x), self.c_mod))
+
+    def strip(self, v): # remove leading zero coefficients of a packed polynomial, in place
+        while v and not v[-1]:
+            v.pop()
+        return v
+
     def add(self, a, b):
+        if self.packed:
+            m = self.c_mod
+            if len(a) < len(b):
+                a, b = b, a
+            r = list(a)
+            for i, c in enumerate(b):
+                r[i] = (r[i] + c) % m
+            return self.strip(r)
         v = []
         for (s,t) in itertools.zip_longest(a, b, fillvalue=self.basering.zero()):
             v.append(s.add(t))
         return self.normalise(v)
 
     def sub(self, a, b):
+        if self.packed:
+            m = self.c_mod
+            r = list(a)
+            if len(r) < len(b):
+                r.extend([0] * (len(b) - len(r)))
+            for i, c in enumerate(b):
+                r[i] = (r[i] - c) % m
+            return self.strip(r)
         v = []
         for (s,t) in itertools.zip_longest(a, b, fillvalue=self.basering.zero()):
             v.append(s.sub(t))
@@ -518,17 +896,148 @@ class polynomialring(ring):
             return []
         if db<0:
             return []
-        r = []
-        for d in range(0, da+db+1, 1):
-            h = self.basering.zero()
-            for i in range(0, min(d, da)+1, 1):
-                if d-i > db:
-                    pass
-                else:
-                    h = h.add(a[i].mult(b[d-i]))
-            r.append(h)
+        if self.packed: # accumulate integer products, reduce only once at the end
+            m = self.c_mod
+            if np is not None and self.c_type is int and min(da, db) >= self.kronecker_threshold:
+                bound = (min(da, db) + 1) * (m-1)**2 # bound for the coefficients of the product
+                if bound < 2**64:
+                    return self.strip(self.mult_kronecker(a, b, np.uint32 if bound < 2**32 else np.uint64))
+            if np is not None and self.ntt_threshold is not None and min(da, db) >= self.ntt_threshold and self.ntt_direct(da + db):
+                return self.strip(self.mult_ntt(a, b))
+            if min(da, db) >= self.kronecker_threshold:
+                return self.strip(self.mult_kronecker_wide(a, b))
+            r = self.sqr_schoolbook(a, 0) if a is b else self.mult_schoolbook(a, b, 0)
+            return self.strip([c % m for c in r])
+        zero = self.basering.zero()
+        if a is b:
+            r = self.sqr_karatsuba(a, zero, self.karatsuba_threshold)
+        else:
+            r = self.mult_karatsuba(a, b, zero, self.karatsuba_threshold)
         return self.normalise(r)
 
+    def mult_kronecker(self, a, b, t):
+        # Multiply packed polynomials by Kronecker substitution: evaluate both at x = 2^32 or 2^64 (one coefficient
+        # per machine word of numpy type t), multiply the two integers with gmpy2, and read off the coefficients
+        # of the product, which are known to fit into a word.
+        n = len(a) + len(b) - 1
+        A = mpz(int.from_bytes(np.array(a, dtype=t).tobytes(), 'little'))
+        B = A if b is a else mpz(int.from_bytes(np.array(b, dtype=t).tobytes(), 'little'))
+        c = int(A*B).to_bytes(n * np.dtype(t).itemsize, 'little')
+        return (np.frombuffer(c, dtype=t) % t(self.c_mod)).tolist()
+
+    def mult_kronecker_wide(self, a, b):
+        # Kronecker substitution as in mult_kronecker, with slots of as many bytes as the product coefficients need
+        # (for moduli of any size); packing and unpacking is done with Python integers.
+        w = self.slot_width(min(len(a), len(b)) * (self.c_mod-1)**2)
+        A = self.pack(a, w)
+        B = A if b is a else self.pack(b, w)
+        return self.unpack(A*B, w, len(a) + len(b) - 1)
+
+    def slot_width(self, bound): # bytes per slot for integers up to bound; a multiple of 4 if numpy can (un)pack them
+        w = (int(bound).bit_length() + 7) // 8
+        if np is not None and self.c_mod < 2**32:
+            w = (w + 3) // 4 * 4
+        return w
+
+    def pack(self, v, w): # the packed polynomial v as an integer, with one coefficient per slot of w bytes
+        if np is not None and self.c_mod < 2**32 and w % 4 == 0:
+            a = np.zeros((len(v), w // 4), dtype='<u4')
+            a[:, 0] = v
+            return mpz(int.from_bytes(a.tobytes(), 'little'))
+        return mpz(int.from_bytes(b''.join([int(c).to_bytes(w, 'little') for c in v]), 'little'))
+
+    def unpack(self, s, w, n): # the first n slots of w bytes of the integer s >= 0, reduced modulo m
+        b = int(s).to_bytes(n * w, 'little')
+        m = self.c_mod
+        if np is not None and m < 2**32 and w % 4 == 0: # Horner on the 32-bit limbs of all slots at once
+            L = np.frombuffer(b, dtype='<u4').reshape(n, w // 4).astype(np.uint64)
+            m = np.uint64(m)
+            r = L[:, -1] % m
+            for i in range(w // 4 - 2, -1, -1):
+                r = ((r << np.uint64(32)) | L[:, i]) % m
+            return r.tolist()
+        t = self.c_type
+        return [t(int.from_bytes(b[j*w:(j+1)*w], 'little') % m) for j in range(n)]
+
+    def ntt_direct(self, d): # whether products of degree d can be transformed modulo m itself (see mult_ntt)
+        m = self.c_mod
+        return m < 2**31 and is_prime(m) and gmpy2.bit_scan1(m-1) >= max(1, d.bit_length())
+
+    def mult_ntt(self, a, b):
+        # Multiply packed polynomials using a number-theoretic transform modulo m itself, which must be a suitable
+        # prime (see ntt_direct). Other moduli are handled by Kronecker substitution (mult_kronecker_wide), which
+        # is faster here than transforms modulo several primes combined by the Chinese remainder theorem.
+        n = len(a) + len(b) - 1
+        logn = max(1, (n-1).bit_length())
+        return ntt_prime(int(self.c_mod)).convolution(np.array(a, dtype=np.int64), np.array(b, dtype=np.int64) if b is not a else None, logn)[:n].tolist()
+
+    # The following methods work on plain coefficient lists (integers or ring elements, of length at least 1)
+    # using only +, - and *. They return the list of all len(a)+len(b)-1 product coefficients, not normalised.
+
+    def mult_schoolbook(self, a, b, zero):
+        r = [zero] * (len(a)+len(b)-1)
+        for i, c in enumerate(a):
+            for j, d in enumerate(b):
+                r[i+j] = r[i+j] + c*d
+        return r
+
+    def sqr_schoolbook(self, a, zero):
+        n = len(a)
+        r = [zero] * (2*n-1)
+        for i, c in enumerate(a):
+            r[i+i] = r[i+i] + c*c
+            c = c+c
+            for j in range(i+1, n):
+                r[i+j] = r[i+j] + c*a[j]
+        return r
+
+    def mult_karatsuba(self, a, b, zero, t): # t is the threshold below which the schoolbook method is used
+        if len(a) < len(b):
+            a, b = b, a
+        na = len(a)
+        nb = len(b)
+        if nb <= t:
+            return self.mult_schoolbook(a, b, zero)
+        h = (na+1) // 2
+        r = [zero] * (na+nb-1)
+        if nb <= h: # unbalanced: multiply b by blocks of a of length nb
+            for k in range(0, na, nb):
+                for i, c in enumerate(self.mult_karatsuba(a[k:k+nb], b, zero, t)):
+                    r[k+i] = r[k+i] + c
+            return r
+        a0, a1 = a[:h], a[h:]
+        b0, b1 = b[:h], b[h:]
+        z0 = self.mult_karatsuba(a0, b0, zero, t)
+        z2 = self.mult_karatsuba(a1, b1, zero, t)
+        z1 = self.mult_karatsuba(self.add_lists(a0, a1), self.add_lists(b0, b1), zero, t)
+        return self.karatsuba_combine(r, z0, z1, z2, h)
+
+    def sqr_karatsuba(self, a, zero, t):
+        n = len(a)
+        if n <= t:
+            return self.sqr_schoolbook(a, zero)
+        h = (n+1) // 2
+        a0, a1 = a[:h], a[h:]
+        z0 = self.sqr_karatsuba(a0, zero, t)
+        z2 = self.sqr_karatsuba(a1, zero, t)
+        z1 = self.sqr_karatsuba(self.add_lists(a0, a1), zero, t)
+        return self.karatsuba_combine([zero] * (2*n-1), z0, z1, z2, h)
+
+    def add_lists(self, a, b): # a is at least as long as b
+        return [c + d for c, d in zip(a, b)] + a[len(b):]
+
+    def karatsuba_combine(self, r, z0, z1, z2, h): # r = z0 + (z1 - z0 - z2) x^h + z2 x^(2h)
+        for i, c in enumerate(z0):
+            r[i] = r[i] + c
+            z1[i] = z1[i] - c
+        for i, c in enumerate(z2):
+            r[i+h+h] = r[i+h+h] + c
+            z1[i] = z1[i] - c
+        for i, c in enumerate(z1):
+            if i+h < len(r):
+                r[i+h] = r[i+h] + c
+        return r
+
     def zero(self):
         return self.element([], self)
 
@@ -536,6 +1045,8 @@ class polynomialring(ring):
         return self.element([self.basering.one()], self)
 
     def to_string(self, v):
+        if self.packed:
+            v = [self.basering.element(c, self.basering) for c in v]
         po = self.parentheses[0]
         pc = self.parentheses[1]
         r = []
@@ -577,6 +1088,8 @@ class polynomialring(ring):
         return len(q)-1
 
     def lc(self, p):
+        if self.packed:
+            return self.basering.element(self.normalise(p)[-1], self.basering)
         return self.normalise(p)[-1]
 
     def coeff(self, p, n=0):
@@ -585,12 +1098,17 @@ class polynomialring(ring):
         q = self.normalise(p)
         if n >= len(q):
              return self.basering.zero()
+        elif self.packed:
+            return self.basering.element(q[n], self.basering)
         else:
             return q[n]
 
     def is_zero(self, p):
         return(self.normalise(p) == [])
 
+    def hash_value(self, v):
+        return hash(tuple(v))
+
     def is_monic(self, p):
         return self.lc(p).is_one()
 
@@ -598,19 +1116,33 @@ class polynomialring(ring):
         if not(self.is_monic(g)):
             print("Class polynomialring: Divisor must me monic for division with remainder")
             raise
-        d = self.deg(g)
-        r = self.normalise(f)
-        q = []
-        while self.deg(r) >= d:
-            e = self.deg(r) - d
-            m = []
-            for i in range(0, e, 1):
-                m.append(self.basering.zero())
-            m.append(self.lc(r))
-            q = self.add(q, m)
-            r = self.sub(r, self.mult(m, g))
+        c = 1 if self.packed else self.basering.one()
+        [q, r] = self.div_mod_schoolbook(self.normalise(f), self.normalise(g), c)
         return [self.element(q, self), self.element(r, self)]
 
+    def div_mod_schoolbook(self, f, g, c):
+        # division with remainder of values f, g, cancelling one leading coefficient per step; c is the inverse of lc(g)
+        d = len(g) - 1
+        r = list(f)
+        if len(r) <= d:
+            return [[], r]
+        q = [0] * (len(r) - d)
+        if self.packed:
+            m = self.c_mod
+            for e in range(len(r) - d - 1, -1, -1):
+                h = (r[e+d] % m) * c % m
+                q[e] = h
+                if h: # reduce only the coefficient needed in the next step
+                    for j in range(d):
+                        r[e+j] -= h * g[j]
+            return [self.strip(q), self.strip([x % m for x in r[:d]])]
+        for e in range(len(r) - d - 1, -1, -1):
+            h = r[e+d].mult(c)
+            q[e] = h
+            for j in range(d):
+                r[e+j] = r[e+j].sub(h.mult(g[j]))
+        return [self.normalise(q), self.normalise(r[:d])]
+
     def div(self, f, g):
         return self.div_mod(f,g)[0]
 
@@ -620,6 +1152,96 @@ class polynomialring(ring):
     def x(self):
         return self([0,1])
 
+    # Evaluation works on values: points a are values of the basering, and so are the results, except that for
+    # packed polynomials both are coefficients as in normalise_packed (plain integers 0..m-1).
+
+    def eval(self, f, a): # f(a), by Horner's rule
+        if self.packed:
+            m = self.c_mod
+            a = self.c_type(a)
+            r = 0
+            for c in reversed(f):
+                r = (r * a + c) % m
+            return self.c_type(r)
+        R = self.basering
+        r = R.zero().value
+        for c in reversed(f):
+            r = R.add(R.mult(r, a), c.value)
+        return r
+
+    def eval_many(self, f, points): # [f(a) for a in points]; with numpy, all points at once
+        if self.packed and np is not None and self.c_mod < 2**32:
+            return self.eval_words(f, np.array(points, dtype=np.uint64)).tolist()
+        return [self.eval(f, a) for a in points]
+
+    def eval_words(self, f, x): # f at all entries of the uint64 array x (with entries < m < 2^32), as a uint64 array
+        m = np.uint64(self.c_mod)
+        r = np.zeros(x.shape, dtype=np.uint64)
+        for c in reversed(f):
+            r = (r * x + np.uint64(c)) % m
+        return r
+
+
+class ntt_prime(metaclass=unique_parent):
+    """Number-theoretic transform modulo a prime q < 2^31 such that q-1 is divisible by a large power of 2.
+    The butterflies of each layer are computed at once with numpy (products are below 2^62, so int64 suffices)."""
+
+    def __init__(self, q):
+        self.q = q
+        self.max_log = gmpy2.bit_scan1(q-1) # transforms of length up to 2^max_log are possible
+        g = 2
+        while gmpy2.powmod(g, (q-1)//2, q) == 1: # find a quadratic non-residue
+            g += 1
+        self.root = int(gmpy2.powmod(g, (q-1) >> self.max_log, q)) # a primitive 2^max_log-th root of 1
+        self.tables = {}
+
+    def __reduce__(self): # pickle by the constructor arguments, see unique_parent
+        return (make_parent, (self.__class__,) + self.init_args)
+
+    def table(self, logn, inverse):
+        # powers w^j (j < 2^(logn-1)) of a primitive 2^logn-th root of unity w, and the bit reversal permutation
+        if (logn, inverse) not in self.tables:
+            q = self.q
+            n = 1 << logn
+            w = pow(self.root, 1 << (self.max_log - logn), q)
+            if inverse:
+                w = pow(w, q-2, q)
+            t = np.ones(1, dtype=np.int64)
+            while len(t) < n//2:
+                t = np.concatenate((t, t * pow(w, len(t), q) % q))
+            i = np.arange(n, dtype=np.int64)
+            rev = np.zeros(n, dtype=np.int64)
+            for k in range(logn):
+                rev |= ((i >> k) & 1) << (logn-1-k)
+            self.tables[(logn, inverse)] = (t, rev)
+        return self.tables[(logn, inverse)]
+
+    def transform(self, a, logn, inverse=False): # a is an int64 array of length 2^logn with entries in 0..q-1
+        q = self.q
+        n = 1 << logn
+        w, rev = self.table(logn, inverse)
+        a = a[rev]
+        m = 1
+        while m < n:
+            a = a.reshape(-1, 2*m)
+            u = a[:, :m]
+            v = a[:, m:] * w[::n//(2*m)] % q
+            a = np.hstack(((u + v) % q, (u - v) % q))
+            m *= 2
+        a = a.reshape(n)
+        if inverse:
+            a = a * pow(n, q-2, q) % q
+        return a
+
+    def convolution(self, a, b, logn):
+        # a, b are int64 arrays; returns their product modulo q as an int64 array of length 2^logn.
+        # If b is None, returns the square of a.
+        q = self.q
+        n = 1 << logn
+        fa = self.transform(np.pad((a % q).astype(np.int64), (0, n-len(a))), logn)
+        fb = fa if b is None else self.transform(np.pad((b % q).astype(np.int64), (0, n-len(b))), logn)
+        return self.transform(fa * fb % q, logn, True)
+
 
 class polynomialring_element(ring_element):
     # using generic methods mostly!
@@ -638,18 +1260,21 @@ class polynomialring_element(ring_element):
         return self.ring.coeff(self.value, n)
 
     def eval(self, x):
-        if self.ring.basering.__class__.__name__ != x.ring.__class__.__name__:
+        R = self.ring.basering
+        if not(isinstance(x, ring_element)) or x.ring is not R:
             print("Class polynomialring_element: To evaluate polynomial, value of variable must lie in coefficient ring")
             raise
-        if self.is_zero():
-            # return x.__class__.ring.zero()
-            return self.ring.basering.zero()
-        d = self.deg()
-        r = self.coeff(d)
-        while d>0:
-            d = d-1
-            r = r*x + self.coeff(d)
-        return r
+        return R.element(self.ring.eval(self.value, x.value), R)
+
+    def eval_many(self, points):
+        """Return the list of values of self at the given points (elements of the coefficient ring), see
+        polynomialring.eval_many and polynomialring_over_field.eval_many."""
+        R = self.ring.basering
+        for x in points:
+            if not(isinstance(x, ring_element)) or x.ring is not R:
+                print("Class polynomialring_element: To evaluate polynomial, value of variable must lie in coefficient ring")
+                raise
+        return [R.element(c, R) for c in self.ring.eval_many(self.value, [x.value for x in points])]
 
     def is_monic(self):
         return self.lc().is_one()
@@ -668,9 +1293,26 @@ class polynomialring_element(ring_element):
 
 class polynomialring_over_field(polynomialring):
 
+    # Bezout and inverse_mod use the half-GCD algorithm once both polynomials have more than this many coefficients.
+    hgcd_threshold = 128
+    # Over finite fields, division with remainder uses Newton iteration once quotient and divisor
+    # both have at least this degree. (Over Q the power series inverse has rapidly growing coefficients.)
+    newton_threshold = 256
+    # With a process pool, distinct_degree_factorisation computes the gcds of this many blocks at a time.
+    ddf_pool_blocks = 8
+    # eval_many uses a subproduct tree once both the degree and the number of points reach this (or the second value,
+    # if Horner's rule runs on numpy arrays); the leaves of the tree are the products over blocks of multipoint_leaf points.
+    multipoint_threshold = [128, 4096]
+    multipoint_leaf = 32
+    multipoint_horner = 256 # see remainder_tree
+    # eval_all over F_p (with numpy) uses Bluestein's transform for polynomials of at least this degree.
+    eval_all_threshold = 256
+
     def __init__(self, r, i='x', parentheses=['', '']):
         if isinstance(r,  field):
             super().__init__(r, i, parentheses)
+            self.inverse_cache = {} # divisor g (as a tuple) -> [n, inverse of reversed g modulo x^n], see reverse_inverse
+            self.frobenius_cache = {} # modulus f (as a tuple) -> frobenius_map of f, see frobenius
         else:
             print("Class polynomialring_over_field: Coefficients must lie in a field")
             raise
@@ -679,22 +1321,58 @@ class polynomialring_over_field(polynomialring):
         if self.is_zero(g):
             print("Class polynomialring_over_field: Cannot divide by zero polynomial")
             raise
-        d = self.deg(g)
-        c = self.lc(g)
-        r = self.normalise(f)
-        q = []
-        while self.deg(r) >= d:
-            e = self.deg(r) - d
-            m = []
-            for i in range(0, e, 1):
-                m.append(self.basering.zero())
-            m.append(self.lc(r).div(c))
-            # print("m = ", str(m))
-            # print("q = ", q)
-            q = self.add(q, m)
-            r = self.sub(r, self.mult(m, g))
+        f = self.normalise(f)
+        g = self.normalise(g)
+        d = len(g) - 1
+        if self.basering.char != 0 and min(len(f) - 1 - d, d) >= self.newton_threshold:
+            return self.div_mod_newton(f, g)
+        if self.packed:
+            c = self.c_type(gmpy2.invert(g[-1], self.c_mod))
+        else:
+            c = g[-1].inv()
+        return self.div_mod_schoolbook(f, g, c)
+
+    def div_mod_newton(self, f, g, y=None):
+        # Division with remainder via the reversed polynomials: if f = gq + r with deg f = n, deg g = d,
+        # then rev(q) = rev(f) / rev(g) modulo x^(n-d+1), which costs two multiplications once 1/rev(g) is known.
+        # y may be given as the inverse of rev(g) modulo x^k for some k >= n-d+1.
+        d = len(g) - 1
+        k = len(f) - d
+        z = 0 if self.packed else self.basering.zero()
+        if y is None:
+            y = self.reverse_inverse(g, k)
+        q = self.mult(self.normalise(f[::-1][:k]), self.normalise(y[:k]))[:k]
+        q = self.normalise((q + [z] * (k - len(q)))[::-1])
+        r = self.sub(self.normalise(f[:d]), self.normalise(self.mult(q, g)[:d]))
         return [q, r]
 
+    def reverse_inverse(self, g, n, cache=True):
+        # Inverse of the power series rev(g) = x^deg(g) g(1/x) modulo x^n, by Newton iteration y -> y - y(rev(g) y - 1)
+        # which doubles the precision in every step. The result is cached, since the same modulus is used over and over
+        # (unless cache is False, for divisors used only once).
+        key = tuple(g)
+        if cache and key in self.inverse_cache:
+            [k, y] = self.inverse_cache[key]
+            if k >= n:
+                return self.normalise(y[:n])
+        else:
+            if cache and len(self.inverse_cache) >= 32:
+                self.inverse_cache.clear()
+            if self.packed:
+                y = [self.c_type(gmpy2.invert(g[-1], self.c_mod))]
+            else:
+                y = [g[-1].inv()]
+            k = 1
+        h = g[::-1]
+        one = self.one().value
+        while k < n:
+            k = min(2*k, n)
+            e = self.sub(self.normalise(self.mult(self.normalise(h[:k]), y)[:k]), one)
+            y = self.sub(y, self.normalise(self.mult(y, e)[:k]))
+        if cache:
+            self.inverse_cache[key] = [k, y]
+        return y
+
     def div(self, f, g):
         return self.div_mod(f,g)[0]
 
@@ -709,26 +1387,489 @@ class polynomialring_over_field(polynomialring):
         elif self.is_zero(g):
             return [f, self.one().value, self.zero().value] # changed
 
-        [r0, r1] = [f, g]
-        [s0, s1] = [self.one().value, self.zero().value]
-        [t0, t1] = [self.zero().value, self.one().value]
-        [q,r] = self.div_mod(r0, r1)
-        while not(self.is_zero(r)):
-            [r0, r1, s0, s1, t0, t1] = [r1, self.sub(r0, self.mult(q, r1)),
-                                        s1, self.sub(s0, self.mult(q, s1)),
-                                        t1, self.sub(t0, self.mult(q, t1))]
+        f = self.normalise(f)
+        g = self.normalise(g)
+        if min(len(f), len(g)) > self.hgcd_threshold:
+            [r1, s1, t1] = self.Bezout_hgcd(f, g)
+        else:
+            [r0, r1] = [f, g]
+            [s0, s1] = [self.one().value, self.zero().value]
+            [t0, t1] = [self.zero().value, self.one().value]
+            [q,r] = self.div_mod(r0, r1)
+            while not(self.is_zero(r)):
+                [r0, r1, s0, s1, t0, t1] = [r1, r,
+                                            s1, self.sub(s0, self.mult(q, s1)),
+                                            t1, self.sub(t0, self.mult(q, t1))]
+                [q,r] = self.div_mod(r0, r1)
+        return [self.scale(r1, r1[-1]), self.scale(s1, r1[-1]), self.scale(t1, r1[-1])]
+
+    def scale(self, f, l): # divide all coefficients of f by the non-zero scalar l (a coefficient of a value)
+        if self.packed:
+            m = self.c_mod
+            l = self.c_type(gmpy2.invert(l, m))
+            return [x*l % m for x in f]
+        return list(map(lambda x: x.div(l), f))
+
+    def inverse_mod(self, f, g): # compute a with af = 1 mod g, that is, the cofactor a of f in Bezout(f, g).
+        # Only the cofactor of f is updated during the Euclidean algorithm. Returns None if gcd(f, g) != 1.
+        f = self.normalise(f)
+        g = self.normalise(g)
+        if f == []:
+            return None
+        if min(len(f), len(g)) > self.hgcd_threshold:
+            [r1, s1, t1] = self.Bezout_hgcd(f, g)
+        else:
+            [r0, r1] = [f, g]
+            [s0, s1] = [self.one().value, self.zero().value]
             [q,r] = self.div_mod(r0, r1)
-        l = r1[-1]
-        r1 = list(map(lambda x: x.div(l), r1))
-        s1 = list(map(lambda x: x.div(l), s1))
-        t1 = list(map(lambda x: x.div(l), t1))
-        return [r1, s1, t1]
+            while not(self.is_zero(r)):
+                [r0, r1, s0, s1] = [r1, r, s1, self.sub(s0, self.mult(q, s1))]
+                [q,r] = self.div_mod(r0, r1)
+        if len(r1) != 1:
+            return None
+        return self.scale(s1, r1[-1])
+
+    # The half-GCD algorithm (Knuth, Schoenhage; in the formulation of Thull and Yap) works on 2x2 matrices
+    # M = [[m00, m01], [m10, m11]] of values, acting on pairs (a, b) of values.
+
+    def mat_vec(self, M, a, b):
+        return [self.add(self.mult(M[0][0], a), self.mult(M[0][1], b)),
+                self.add(self.mult(M[1][0], a), self.mult(M[1][1], b))]
+
+    def mat_mult(self, M, N):
+        return [[self.add(self.mult(M[i][0], N[0][j]), self.mult(M[i][1], N[1][j])) for j in range(2)] for i in range(2)]
+
+    def mat_step(self, M, q): # the product [[0, 1], [1, -q]] M, describing one step a, b -> b, a - qb
+        return [M[1], [self.sub(M[0][0], self.mult(q, M[1][0])), self.sub(M[0][1], self.mult(q, M[1][1]))]]
+
+    def hgcd(self, a, b):
+        # For deg a > deg b, return M such that (c, d) = M (a, b) are consecutive remainders in the Euclidean
+        # algorithm for a and b with deg c >= m > deg d, where m = ceil(deg(a)/2). Only the upper halves of a and b
+        # determine M, which is computed from two recursive calls on polynomials of half the degree.
+        one = self.one().value
+        M = [[one, []], [[], one]]
+        m = len(a) // 2
+        if len(b) - 1 < m:
+            return M
+        if len(a) <= self.hgcd_threshold:
+            while len(b) - 1 >= m:
+                [q, r] = self.div_mod(a, b)
+                [a, b] = [b, r]
+                M = self.mat_step(M, q)
+            return M
+        R = self.hgcd(a[m:], b[m:])
+        [a, b] = self.mat_vec(R, a, b)
+        if len(b) - 1 < m:
+            return R
+        [q, r] = self.div_mod(a, b)
+        [a, b] = [b, r]
+        R = self.mat_step(R, q)
+        if len(b) - 1 < m:
+            return R
+        k = max(0, 2*m - (len(a) - 1))
+        return self.mat_mult(self.hgcd(a[k:], b[k:]), R)
+
+    def Bezout_hgcd(self, f, g): # returns [d, s, t] with sf + tg = d = gcd(f, g), with d not necessarily monic
+        one = self.one().value
+        M = [[one, []], [[], one]]
+        [a, b] = [f, g]
+        while b != []:
+            if len(a) > len(b) > self.hgcd_threshold:
+                R = self.hgcd(a, b)
+                [a, b] = self.mat_vec(R, a, b)
+                M = self.mat_mult(R, M)
+                if b == []:
+                    break
+            [q, r] = self.div_mod(a, b)
+            [a, b] = [b, r]
+            M = self.mat_step(M, q)
+        return [a, M[0][0], M[0][1]]
+
+    def powmod(self, a, e, f): # a^e modulo f, on values; square and multiply, reducing after every step
+        r = self.mod(self.one().value, f)
+        for i in mpz(e).digits(2):
+            r = self.mod(self.mult(r, r), f)
+            if i == '1':
+                r = self.mod(self.mult(r, a), f)
+        return r
+
+    def frobenius(self, f):
+        """Return the frobenius_map a -> a^q modulo the value f (of degree > 0), for coefficients in a finite field
+        with q elements. Maps are cached per modulus, like the inverses of reverse_inverse."""
+        key = tuple(f)
+        if key not in self.frobenius_cache:
+            if len(self.frobenius_cache) >= 32:
+                self.frobenius_cache.clear()
+            self.frobenius_cache[key] = frobenius_map(self, f)
+        return self.frobenius_cache[key]
+
+    def is_irreducible(self, f):
+    # uses Rabin irreducibility test
+    # https://en.wikipedia.org/wiki/Factorization_of_polynomials_over_finite_fields#Rabin.27s_test_of_irreducibility
+    # f must be a value (polynomial) with coefficients in a finite field F_q
+    # returns True if f is irreducible over F_q
+    # returns False otherwise
+    # The powers x^(q^k) mod f are computed by iterating the Frobenius map (see frobenius_map).
+
+        f = self.normalise(f)
+        n = len(f) - 1
+        if n < 1:
+            return False
+        F = self.frobenius(f)
+
+        # Step 1: The "other" checks: gcd(x^(q^(n/r)) - x, f) = 1 for all primes r dividing n.
+        # Most reducible polynomials have a factor of small degree k, dividing x^(q^k) - x: one gcd with the
+        # product of these for k <= K rejects them early.
+        h = [n // r for (r, e) in factorisation(n)]
+        K = min(n // 2, n.bit_length())
+        y = F.x
+        acc = self.one().value
+        for k in range(1, n + 1):
+            y = F.apply(y)
+            if k <= K:
+                acc = self.mod(self.mult(acc, self.sub(y, F.x)), f)
+                if k == K and len(self.gcd(acc, f)) != 1:
+                    return False
+            if k in h and len(self.gcd(self.sub(y, F.x), f)) != 1:
+                return False
+
+        # Step 2: check if f divides x^q^n - x. If not: reducible.
+        return self.is_zero(self.sub(y, F.x))
+
+    def gcd(self, f, g): # the monic gcd of the values f and g
+        return self.Bezout(f, g)[0]
+
+    def derivative(self, f):
+        if self.packed:
+            m = self.c_mod
+            return self.strip([i * c % m for (i, c) in enumerate(f)][1:])
+        F = self.basering
+        return self.normalise([c * F(i) for (i, c) in enumerate(f)][1:])
+
+    def pth_root(self, f): # the polynomial whose p-th power is f, if f is a polynomial in x^p (char p, finite basering)
+        p = self.basering.char
+        if self.packed: # coefficients in the prime field are their own p-th roots
+            return self.strip(f[::p])
+        k = self.basering.cardinality // p
+        return self.normalise([c**k for c in f[::p]])
+
+    def squarefree_factorisation(self, f):
+        """Return a list of pairs (g, e) of coprime monic squarefree values g with f = lc(f) prod g^e, for a value f
+        of degree > 0 over a finite field or over Q. In characteristic p, the part of f that is a polynomial in x^p
+        is handled by taking p-th roots."""
+        f = self.scale(f, f[-1])
+        one = self.one().value
+        r = []
+        c = self.gcd(f, self.derivative(f))
+        w = self.div(f, c)
+        i = 1
+        while w != one: # w is the product of the squarefree factors of multiplicity at least i
+            y = self.gcd(w, c)
+            z = self.div(w, y)
+            if z != one:
+                r.append((z, i))
+            w = y
+            c = self.div(c, y)
+            i += 1
+        if c != one: # c is a polynomial in x^p
+            p = self.basering.char
+            r += [(g, e * int(p)) for (g, e) in self.squarefree_factorisation(self.pth_root(c))]
+        return sorted(r, key=lambda t: t[1])
+
+    def distinct_degree_factorisation(self, f, pool=None):
+        """For a monic squarefree value f of degree > 0 over a finite field, return the list of pairs (g, d) where g is
+        the (non-trivial) product of all irreducible factors of f of degree d. See run_tasks for pool."""
+        # The powers x^(q^d) mod f come from iterating the frobenius_map of f. A factor of degree d divides
+        # x^(q^d) - x, so the differences for a block of consecutive d are multiplied together and one gcd with the
+        # remaining part of f finds all factors in the block. The gcds of the blocks in one round are independent
+        # (a round has one block, or ddf_pool_blocks if there is a pool); after each round, the search stops as
+        # soon as the rest of f must be irreducible.
+        n = len(f) - 1
+        F = self.frobenius(f)
+        B = max(1, int(gmpy2.isqrt(n // 2))) # block size
+        r = []
+        rest = f
+        h = F.x
+        d = 0
+        while 2 * (d + 1) <= len(rest) - 1:
+            blocks = [] # pairs (d0, [x^(q^d) - x mod f for d = d0, d0 + 1, ...])
+            for j in range(1 if pool is None else self.ddf_pool_blocks):
+                t = []
+                while len(t) < B and 2 * (d + 1) <= len(rest) - 1:
+                    d += 1
+                    h = F.apply(h)
+                    t.append(self.sub(h, F.x))
+                if t != []:
+                    blocks.append((d + 1 - len(t), t))
+            g = self.run_tasks(pool, 'gcd', [(rest, self.product_mod(t, rest)) for (d0, t) in blocks])
+            for ((d0, t), b) in zip(blocks, g):
+                if len(b) > 1: # b may contain factors already found in this round
+                    rest = self.refine_degrees(rest, self.gcd(rest, b), d0, t, r)
+        if len(rest) > 1:
+            r.append((rest, len(rest) - 1))
+        return r
+
+    def product_mod(self, t, f): # the product of the values t modulo f
+        acc = self.mod(t[0], f)
+        for u in t[1:]:
+            acc = self.mod(self.mult(acc, u), f)
+        return acc
+
+    def refine_degrees(self, rest, g, d0, t, r):
+        # g divides rest and is the product of all its irreducible factors of degrees d0, ..., d0 + len(t) - 1 (all
+        # factors of smaller degree have been removed from rest); t[i] = x^(q^(d0+i)) - x mod f. Append the pairs
+        # (g_d, d) to r and return rest without g.
+        if len(g) == 1:
+            return rest
+        rest = self.div(rest, g)
+        for (i, u) in enumerate(t):
+            if len(g) - 1 < d0 + i:
+                break
+            h = self.gcd(g, self.mod(u, g))
+            if len(h) > 1:
+                r.append((h, d0 + i))
+                g = self.div(g, h)
+        return rest
+
+    def equal_degree_factorisation(self, f, d):
+        """Split the monic value f, a product of distinct irreducible polynomials of degree d over a finite field, into
+        its irreducible factors (Cantor-Zassenhaus). Returns the sorted list of factors."""
+        n = len(f) - 1
+        if n == d:
+            return [f]
+        q = self.basering.cardinality
+        one = self.one().value
+        while True:
+            a = self.random_element(n).value
+            if len(a) < 2:
+                continue
+            if q % 2 == 1: # gcd(f, a^((q^d - 1)/2) - 1) contains each factor with probability about 1/2
+                if d > 1 and d * q.bit_length() > n + 2*d: # a^(1 + q + ... + q^(d-1)) via the frobenius_map of f
+                    F = self.frobenius(f)
+                    b = u = a
+                    for i in range(d - 1):
+                        u = F.apply(u)
+                        b = self.mod(self.mult(b, u), f)
+                    b = self.powmod(b, (q - 1) // 2, f)
+                else:
+                    b = self.powmod(a, (q**d - 1) // 2, f)
+                g = self.gcd(f, self.sub(b, one))
+            else: # q = 2^k: the trace a + a^2 + ... + a^(2^(kd-1)) lies in F_2 modulo each factor
+                b = u = a
+                for i in range(q.bit_length() * d - d - 1):
+                    u = self.mod(self.mult(u, u), f)
+                    b = self.add(b, u)
+                g = self.gcd(f, b)
+            if 0 < len(g) - 1 < n:
+                return sorted(self.equal_degree_factorisation(g, d) + self.equal_degree_factorisation(self.div(f, g), d),
+                              key=self.factor_key)
+
+    def factor(self, f, pool=None):
+        """Return the factorisation of the value f (of degree > 0) over a finite field, as a list of pairs (g, e) of
+        monic irreducible values g and multiplicities e with f = lc(f) prod g^e, sorted by degree. See run_tasks for pool."""
+        parts = []
+        for (g, e) in self.squarefree_factorisation(f):
+            parts += [(h, d, e) for (h, d) in self.distinct_degree_factorisation(g, pool)]
+        split = self.run_tasks(pool, 'equal_degree_factorisation', [(h, d) for (h, d, e) in parts])
+        return sorted([(g, e) for ((h, d, e), gs) in zip(parts, split) for g in gs], key=lambda t: self.factor_key(t[0]))
+
+    def factor_key(self, g): # sort factors by degree, and packed ones also by their coefficients
+        return (len(g), g[::-1] if self.packed else [])
+
+    def eval_many(self, f, points):
+        # Evaluation at n points by Horner's rule costs n deg(f) operations. For many points and large degree, f is
+        # reduced instead modulo the products of x - a over halves, quarters, ... of the points (a remainder tree on
+        # the subproduct tree), with O(n log^2 n) operations once multiplication is fast. Points are taken in chunks of
+        # about deg(f) + 1, since a larger tree above that would only carry f itself.
+        d = len(f) - 1
+        t = self.multipoint_threshold[1 if self.packed and np is not None and self.c_mod < 2**32 else 0]
+        if min(d + 1, len(points)) < t:
+            return super().eval_many(f, points)
+        if self.packed:
+            points = [self.c_type(a) for a in points]
+        k = max(d + 1, t)
+        r = []
+        for i in range(0, len(points), k):
+            a = points[i:i+k]
+            r.extend(self.remainder_tree(f, self.subproduct_tree(a), a))
+        return r
+
+    def from_roots(self, points): # the value prod (x - a) over the values a in points
+        if self.packed:
+            m = self.c_mod
+            r = [1]
+            for a in points:
+                r = [-a * r[0] % m] + [(r[i-1] - a * r[i]) % m for i in range(1, len(r))] + [1]
+            return r
+        R = self.basering
+        r = self.one().value
+        for a in points:
+            r = self.mult(r, self.normalise([R.element(R.sub(R.zero().value, a), R), R.one()]))
+        return r
+
+    def subproduct_tree(self, points):
+        # The levels of the subproduct tree of the values in points: T[0] holds the products of x - a over blocks of
+        # multipoint_leaf points, every further level the products of pairs of the level below (an odd one out moves
+        # up unchanged), and T[-1] = [prod (x - a)]. Node i of level L covers the points from i 2^L multipoint_leaf on.
+        b = self.multipoint_leaf
+        T = [[self.from_roots(points[i:i+b]) for i in range(0, len(points), b)]]
+        while len(T[-1]) > 1:
+            L = T[-1]
+            T.append([self.mult(L[i], L[i+1]) for i in range(0, len(L) - 1, 2)] + (L[-1:] if len(L) % 2 else []))
+        return T
+
+    def remainder_tree(self, f, T, points): # f at the values in points, given their subproduct tree T
+        # The remainders are taken down to the leaves, or with numpy to the first level with nodes of at least
+        # multipoint_horner points: Horner's rule on arrays is faster there than division with remainder.
+        b = self.multipoint_leaf
+        words = self.packed and np is not None and self.c_mod < 2**32
+        L0 = 0
+        while words and L0 < len(T) - 1 and (b << L0) < self.multipoint_horner:
+            L0 += 1
+        r = [self.mod_once(f, T[-1][0])]
+        for L in reversed(T[L0:-1]):
+            r = [self.mod_once(r[i // 2], g) for (i, g) in enumerate(L)]
+        b <<= L0
+        if words: # Horner on all the nodes at once
+            n = len(points)
+            R = np.zeros((len(r), b), dtype=np.uint64)
+            for i, g in enumerate(r):
+                R[i, :len(g)] = g
+            x = np.zeros(len(r) * b, dtype=np.uint64)
+            x[:n] = points
+            x = x.reshape(len(r), b)
+            m = np.uint64(self.c_mod)
+            v = np.zeros(x.shape, dtype=np.uint64)
+            for j in range(b - 1, -1, -1):
+                v = (v * x + R[:, j:j+1]) % m
+            return v.reshape(-1)[:n].tolist()
+        return [self.eval(r[i // b], a) for (i, a) in enumerate(points)]
+
+    def mod_once(self, f, g):
+        # f mod g for a divisor g that is used only once: for packed polynomials, Newton iteration pays off from
+        # smaller degrees than newton_threshold even if 1/rev(g) has to be computed (which is then not cached).
+        d = len(g) - 1
+        if self.packed and min(len(f) - 1 - d, d) >= 2 * self.multipoint_leaf:
+            return self.div_mod_newton(f, g, self.reverse_inverse(g, len(f) - d, False))[1]
+        return self.mod(f, g)
+
+    def interpolate_values(self, points, values):
+        # The value f of degree < n with f(a) = c for the n pairs of values (a, c) from points and values, by Lagrange's
+        # formula f = sum c / M'(a) M / (x - a) with M = prod (x - a). The M'(a) are computed with the remainder tree,
+        # and the sum on the subproduct tree, as r(node) = r(left) M(right) + r(right) M(left).
+        R = self.basering
+        if len(points) == 0:
+            return []
+        if self.packed:
+            points = [self.c_type(a) for a in points]
+        T = self.subproduct_tree(points)
+        w = self.remainder_tree(self.derivative(T[-1][0]), T, points)
+        if any(R.is_zero(c) for c in w):
+            print("Class polynomialring_over_field: Interpolation points must be distinct")
+            raise
+        w = [R.mult(c, e) for (c, e) in zip(values, R.inv_many(w))]
+        b = self.multipoint_leaf
+        r = [self.lagrange_sum(g, points[i*b:(i+1)*b], w[i*b:(i+1)*b]) for (i, g) in enumerate(T[0])]
+        for L in T[:-1]:
+            r = [self.add(self.mult(r[i], L[i+1]), self.mult(r[i+1], L[i])) for i in range(0, len(L) - 1, 2)] + (r[-1:] if len(L) % 2 else [])
+        return r[0]
+
+    def lagrange_sum(self, g, points, w): # sum c g / (x - a) over the pairs (a, c) from points and w, for g = prod (x - a)
+        if self.packed:
+            m = self.c_mod
+            r = [0] * (len(g) - 1)
+            for (a, c) in zip(points, w):
+                h = g[-1] # synthetic division: the coefficients of g / (x - a), from the top
+                for k in range(len(g) - 2, -1, -1):
+                    r[k] += c * h
+                    h = (g[k] + a * h) % m
+            return self.strip([self.c_type(c % m) for c in r])
+        R = self.basering
+        r = []
+        for (a, c) in zip(points, w):
+            q = self.div(g, self.normalise([R.element(R.sub(R.zero().value, a), R), R.one()]))
+            r = self.add(r, self.mult(self.normalise([R.element(c, R)]), q))
+        return r
+
+    def interpolate(self, points, values):
+        """Return the polynomial f of degree less than n with f(points[i]) = values[i], for n distinct points
+        (elements of the coefficient field) and n values. Inverse of polynomialring_element.eval_many."""
+        R = self.basering
+        for x in points + values:
+            if not(isinstance(x, ring_element)) or x.ring is not R:
+                print("Class polynomialring_over_field: Interpolation points and values must lie in coefficient field")
+                raise
+        return self.element(self.interpolate_values([x.value for x in points], [x.value for x in values]), self)
+
+    def eval_all(self, f):
+        # f at all elements of the finite coefficient field, in the order of iteration (see element_at).
+        # Over F_p with p < 2^32 and numpy, this works on arrays: by Horner's rule if deg(f) is small, and otherwise
+        # with Bluestein's transform, which needs one product of polynomials of degree about p (see eval_all_bluestein).
+        F = self.basering
+        if F.cardinality == float('inf'):
+            print("Method 'eval_all': only implemented for finite fields")
+            raise
+        if self.packed and np is not None and self.c_mod < 2**32:
+            p = int(self.c_mod)
+            if len(f) - 1 < self.eval_all_threshold or p < 5:
+                return self.eval_words(f, np.arange(p, dtype=np.uint64)).tolist()
+            return self.eval_all_bluestein(f).tolist()
+        return self.eval_many(f, [F.element_at(n).value for n in range(F.cardinality)])
+
+    def eval_all_bluestein(self, f):
+        # Since a^p = a on F_p, f is first reduced modulo x^p - x, then f(0) is its constant term, and with
+        # a^(p-1) = 1 for a != 0 it is a sum of N = p - 1 terms a_j x^j. At the powers x = w^i of a primitive element w,
+        # ij = T(i+j) - T(i) - T(j) for T(k) = k(k-1)/2 turns the transform into a correlation:
+        # f(w^i) = w^-T(i) sum_j (a_j w^-T(j)) w^T(i+j), the coefficients N-1 ... 2N-2 of one polynomial product.
+        p = int(self.c_mod)
+        N = p - 1
+        a = np.zeros(p, dtype=np.uint64)
+        i = np.arange(len(f), dtype=np.int64)
+        i[p:] = (i[p:] - 1) % N + 1
+        np.add.at(a, i, np.array(f, dtype=np.uint64))
+        a %= np.uint64(p)
+        f0 = int(a[0])
+        a[0] = (a[0] + a[N]) % np.uint64(p)
+        a = a[:N]
+        w = int(self.basering.primitive_element().value)
+        W = np.ones(1, dtype=np.uint64) # W[k] = w^k, by doubling
+        while len(W) < N:
+            W = np.concatenate((W, W * np.uint64(pow(w, len(W), p)) % np.uint64(p)))
+        W = W[:N]
+        k = np.arange(2*N - 1, dtype=np.uint64)
+        n = np.uint64(N)
+        even = (k % np.uint64(2)) == 0
+        T = np.where(even, (k // np.uint64(2)) % n * ((k + n - np.uint64(1)) % n), k % n * ((k // np.uint64(2)) % n)) % n
+        c = W[T] # w^T(k)
+        d = W[(n - T[:N]) % n] # w^-T(i)
+        b = (a * d % np.uint64(p))[::-1]
+        s = self.mult(self.strip(b.tolist()), c.tolist())
+        y = np.zeros(N, dtype=np.uint64)
+        s = s[N-1:2*N-1]
+        y[:len(s)] = s
+        r = np.zeros(p, dtype=np.uint64)
+        r[0] = f0
+        r[W] = y * d % np.uint64(p)
+        return r
+
+    def run_tasks(self, pool, method, args):
+        # [self.method(*a) for a in args], computed in pool if it is given: an object with a map method, such as a
+        # multiprocessing.Pool or a concurrent.futures.ProcessPoolExecutor. The ring is pickled by its constructor
+        # arguments (see unique_parent), so the workers compute in the unique copy of it; see polynomial_task.
+        if pool is None:
+            return [getattr(self, method)(*a) for a in args]
+        return list(pool.map(polynomial_task, [(self, method, a) for a in args]))
 
     def random_element(self, d):
         """Return a random element of degree less than d. Relies on basering having a random element function."""
         return self([self.basering.random_element() for i in range(d)])
 
 
+def polynomial_task(t): # run a method of a polynomial ring on values; see run_tasks
+    (P, method, args) = t
+    return getattr(P, method)(*args)
+
+
 class polynomialring_over_field_element(polynomialring_element):
     # using generic methods mostly!
     def div_mod(self, q):
@@ -754,45 +1895,226 @@ class polynomialring_over_field_element(polynomialring_element):
     def is_divisible_by(self, g):
         return self.ring.is_zero(self.mod(g))
 
-    def is_irreducible(self):
-    # uses Rabin irreducibility test
-    # https://en.wikipedia.org/wiki/Factorization_of_polynomials_over_finite_fields#Rabin.27s_test_of_irreducibility
-    # f must be an element of polynomialring_over_field_element, with finite coefficient field F_q
-    # returns True if f is irreducible over F_q
-    # returns False otherwise
+    def squarefree_factorisation(self):
+        """Return a list of pairs (g, e) of coprime monic squarefree polynomials g with self = lc * prod g^e."""
+        return [(self.__class__(g, self.ring), e) for (g, e) in self.ring.squarefree_factorisation(self.value)]
+
+    def factor(self, pool=None):
+        """Return the factorisation of self over a finite field as a sorted list of pairs (g, e) of monic irreducible
+        polynomials g and multiplicities e, with self = lc * prod g^e. Independent steps may be run in a process pool,
+        see polynomialring_over_field.run_tasks."""
+        return [(self.__class__(g, self.ring), e) for (g, e) in self.ring.factor(self.value, pool)]
+
+    def is_irreducible(self): # see polynomialring_over_field.is_irreducible
+        return self.ring.is_irreducible(self.value)
+
+    def eval_all(self):
+        """Return the list of values of self at all elements of the finite coefficient field, in the order of
+        iteration. See polynomialring_over_field.eval_all."""
+        R = self.ring.basering
+        return [R.element(c, R) for c in self.ring.eval_all(self.value)]
+
+
+class frobenius_map:
+    """The Frobenius map a -> a^q on F_q[x]/(f), for a polynomial f of degree n > 0 over a finite field with q elements.
+    The map is F_q-linear, so it is stored as the matrix whose row i is x^(iq) mod f; this costs one exponentiation and
+    n multiplications modulo f, after which every application is a vector-matrix product. For packed polynomials every
+    row is one integer with a slot of width bytes per coefficient (Kronecker substitution), so that a product is a sum
+    of multiples of rows. Obtain instances from polynomialring_over_field.frobenius."""
+
+    def __init__(self, P, f):
+        self.ring = P
+        self.modulus = P.normalise(f)
+        n = len(self.modulus) - 1
+        self.deg = n
+        self.x = P.mod(P.x().value, f)
+        self.xq = P.powmod(self.x, P.basering.cardinality, f)
+        q = P.basering.cardinality
+        z = 0 if P.packed else P.basering.zero()
+        rows = [P.one().value]
+        for i in range(1, n):
+            if q < n: # x^q is a monomial: shift, then reduce
+                rows.append(P.mod([z] * q + rows[-1], f))
+            else:
+                rows.append(P.mod(P.mult(rows[-1], self.xq), f))
+        self.dtype = None
+        if P.packed:
+            bits = (n * (P.c_mod - 1)**2).bit_length() # bound for a slot of a sum of n products
+            self.width = P.slot_width(n * (P.c_mod - 1)**2)
+            if np is not None and P.c_type is int and bits <= 64:
+                self.width = min(w for w in [1, 2, 4, 8] if 8*w >= bits)
+                self.dtype = np.dtype('<u' + str(self.width))
+            rows = [self.pack(r) for r in rows]
+        self.rows = rows
+
+    def pack(self, v): # the packed polynomial v of degree < n as an integer, one coefficient per slot
+        if self.dtype is not None:
+            return mpz(int.from_bytes(np.array(v, dtype=self.dtype).tobytes(), 'little'))
+        return self.ring.pack(v, self.width)
+
+    def unpack(self, s): # inverse of pack, reducing every slot modulo the characteristic
+        P = self.ring
+        if self.dtype is not None:
+            b = int(s).to_bytes(self.deg * self.width, 'little')
+            return P.strip((np.frombuffer(b, dtype=self.dtype) % self.dtype.type(P.c_mod)).tolist())
+        return P.strip(P.unpack(s, self.width, self.deg))
 
+    def apply(self, a):
+        """Return a^q mod f, for a value a of degree < n."""
         P = self.ring
-        F = P.basering
-        q = F.cardinality
-        n = self.deg()
-
-        def compute(e): # this computes x^e - x  mod self
-            r = P.one()
-            b = P.x()
-            for i in reversed(e.digits(2)):
-                if i == '1':
-                    r = r*b
-                b = b*b
-                if b.deg() > n:
-                    b = b % self
-            return r-P.x()
-        
-        # Step 1: The "other" checks
-        one = P.one()
-        x = P.x()
-        h = [int(n/d) for d in [*set(pf.primefac(n))]]
-        for nn in h:
-            p = compute(q**nn)
-            if self.gcd(p) != one:
-                return False
+        if P.packed:
+            s = mpz(0)
+            for (c, R) in zip(a, self.rows):
+                if c:
+                    s += c * R
+            return self.unpack(s)
+        r = P.zero().value
+        for (c, R) in zip(a, self.rows):
+            if not(c.is_zero()):
+                r = P.add(r, P.mult([c], R))
+        return r
 
-        # Step 2: check if f divides x^q^n - x. If not: reducible.
-        p = compute(q**n)
-        return p.mod(self).is_zero()
+    def iterate(self, a, k):
+        """Return a^(q^k) mod f, for a value a of degree < n."""
+        for i in range(k):
+            a = self.apply(a)
+        return a
+
+
+class binary_polynomial(int):
+    """A polynomial with coefficients in F_2, stored as the integer whose bit i is the coefficient of x^i.
+    Elements of Galois fields of characteristic 2 have values of this type; see Galoisfield. As a polynomial it behaves
+    like an element of polynomialring_over_field(primefield(2)): deg, lc, coeff, div, mod, +, -, *, %, ** and str refer
+    to the polynomial (products are not reduced), while int() and the bit operations give the bit mask. Plain integers
+    in +, -, *, % and div_mod are constants, taken modulo 2; only binary_polynomial values are read as bit masks.
+    The method polynomial converts it to an element of that polynomial ring."""
+
+    @property
+    def ring(self):
+        return polynomialring_over_field(primefield(2))
+
+    @property
+    def value(self): # the coefficient list, as for other polynomials over F_2
+        return [(self >> i) & 1 for i in range(self.bit_length())]
+
+    def polynomial(self):
+        return self.ring.element(self.value, self.ring)
+
+    def deg(self):
+        return self.bit_length() - 1
+
+    def lc(self):
+        return self.coeff(self.deg())
+
+    def coeff(self, n):
+        return primefield(2)((self >> n) & 1 if n >= 0 else 0)
+
+    def is_monic(self):
+        return self != 0
+
+    def is_zero(self):
+        return self == 0
+
+    def is_one(self):
+        return self == 1
+
+    def div_mod(self, g): # long division, as bit masks; g may also be a polynomial over F_2 or an integer constant
+        if isinstance(g, polynomialring_element):
+            g = sum(int(c) << i for (i, c) in enumerate(g.value))
+        elif not(isinstance(g, binary_polynomial)): # integers other than bit masks are constants, as for + and *
+            g = int(g) & 1
+        g = int(g)
+        if g == 0:
+            print("Class binary_polynomial: Cannot divide by 0")
+            raise ZeroDivisionError
+        q, r = 0, int(self)
+        d = g.bit_length()
+        while r.bit_length() >= d:
+            s = r.bit_length() - d
+            q ^= 1 << s
+            r ^= g << s
+        return [binary_polynomial(q), binary_polynomial(r)]
+
+    def div(self, g):
+        return self.div_mod(g)[0]
+
+    def mod(self, g):
+        return self.div_mod(g)[1]
+
+    def __mod__(self, g):
+        return self.mod(g) if isinstance(g, (int, polynomialring_element)) else NotImplemented
+
+    def __rmod__(self, b): # b % self for an integer constant b (rather than the integer remainder of int)
+        return binary_polynomial(b & 1).mod(self) if isinstance(b, int) else NotImplemented
+
+    def __add__(self, b): # integers b other than bit masks are constants, that is, taken modulo 2
+        if isinstance(b, binary_polynomial):
+            return binary_polynomial(int(self) ^ int(b))
+        if isinstance(b, int):
+            return binary_polynomial(int(self) ^ (b & 1))
+        if isinstance(b, polynomialring_element):
+            return self.polynomial() + b
+        return NotImplemented
+
+    __radd__ = __add__
+    __sub__ = __add__
+    __rsub__ = __add__
+
+    def __neg__(self):
+        return self
+
+    def __mul__(self, b):
+        if isinstance(b, binary_polynomial):
+            a, b = int(self), int(b)
+            r = 0
+            while b:
+                l = b & -b
+                r ^= a << (l.bit_length() - 1)
+                b ^= l
+            return binary_polynomial(r)
+        if isinstance(b, int):
+            return self if b & 1 else binary_polynomial(0)
+        if isinstance(b, polynomialring_element):
+            return self.polynomial() * b
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __pow__(self, k):
+        if k < 0:
+            print("Class binary_polynomial: Negative exponent")
+            raise ValueError
+        r, b = binary_polynomial(1), self
+        while k:
+            if k & 1:
+                r = r * b
+            k >>= 1
+            if k:
+                b = b * b
+        return r
+
+    def __str__(self):
+        return str(self.polynomial())
 
 
 class Galoisfield(field):
 
+    # Moduli with at least this many non-zero terms below the leading one are reduced by Newton division
+    # (if products of polynomials of degree deg can be computed by Kronecker substitution).
+    barrett_threshold = 16
+    # make_tables refuses to tabulate fields with more elements than this.
+    table_limit = 2**20
+    # In characteristic 2, carry-less products switch from shift-and-xor to a 4-bit comb at this many bits.
+    comb_threshold = 32
+    # sqr_bytes[k] is the square of the byte k (a polynomial of degree < 8 over F_2), as two bytes
+    sqr_bytes = [sum(((k >> i) & 1) << (2*i) for i in range(8)).to_bytes(2, 'little') for k in range(256)]
+
+    @classmethod
+    def cache_key(cls, p, print_modulus=True):
+        # one field per modulus: print_modulus only affects printing, and the field keeps the setting it was
+        # first constructed with (assign to its print_modulus attribute to change it)
+        return p
+
     def __init__(self, p, print_modulus = True): # p is a monic irreducible polynomial with prime field coefficients of degree > 0.
         # TODO: check deg(p) > 0, monic, irreducible, and so on.
         if not(isinstance(p,  polynomialring_over_field_element)):
@@ -809,6 +2131,27 @@ class Galoisfield(field):
         self.deg = p.deg()
         self.cardinality = self.char ** self.deg
         self.iterator = globals()['Galoisfield_iterator']
+        # Reduction context, used by reduce: the modulus is x^deg + (lower terms), up to the factor lc;
+        # only the non-zero lower terms are stored, so that sparse moduli (trinomials, pentanomials) reduce in
+        # O(deg) steps. Dense moduli reduce Barrett-style, by Newton division (two multiplications) with
+        # the inverse of the reversed modulus computed once here.
+        g = p.value
+        P = self.p_ring
+        self.m_lc_inv = P.c_type(gmpy2.invert(g[-1], self.char))
+        self.m_tail = [(k, c) for (k, c) in enumerate(g[:-1]) if c]
+        fast_mult = np is not None and P.c_type is int and self.deg * (self.char-1)**2 < 2**64 # see polynomialring.mult
+        self.m_barrett = len(self.m_tail) >= (self.barrett_threshold if fast_mult else P.newton_threshold)
+        if self.m_barrett:
+            self.m_rev_inv = P.reverse_inverse(g, self.deg - 1)
+        self.exp_table = None # see make_tables
+        self.log_table = None
+        # For GF(2^n), values are binary_polynomial bit masks rather than polynomials, and the arithmetic is
+        # done with xor and carry-less products. Sparse moduli are reduced a word at a time (reduce_bits).
+        self.binary = (self.char == 2)
+        if self.binary:
+            self.m_bits = self.encode(g)
+            self.m_low  = [k for (k, c) in self.m_tail]
+            self.m_sparse = len(self.m_low) <= 8 and max(self.m_low, default=0) <= self.deg // 2
         super().__init__()
 
     def __str__(self):
@@ -824,37 +2167,316 @@ class Galoisfield(field):
         return self.p_ring.latex() + '/ \\left(' + str(self.modulus) + '\\right)' 
     
     def normalise(self, v):  # v is an object of type self.p_ring, that is, a polynomial with coefficients in finite prime field
-        return v.mod(self.modulus)
+        if self.binary:
+            if not(isinstance(v, binary_polynomial)):
+                if v.ring is not self.p_ring:
+                    v = v.mod(self.modulus)
+                v = binary_polynomial(self.encode(v.value))
+            if v.bit_length() > self.deg:
+                v = binary_polynomial(self.reduce_bits(v))
+            return v
+        if v.ring is not self.p_ring:
+            return v.mod(self.modulus)
+        if len(v.value) <= self.deg: # already reduced
+            return v
+        return self.p_ring.element(self.reduce(v.value), self.p_ring)
+
+    def reduce(self, v): # reduce the packed polynomial v (a list) modulo the modulus; returns a list
+        d = self.deg
+        n = len(v) - 1 - d
+        if n < 0:
+            return v
+        P = self.p_ring
+        if self.m_barrett and n >= self.barrett_threshold:
+            return P.div_mod_newton(v, self.modulus.value, self.m_rev_inv if n < self.deg - 1 else None)[1]
+        m = P.c_mod
+        c = self.m_lc_inv
+        r = list(v)
+        for e in range(len(r) - 1, d - 1, -1): # replace x^e by x^(e-d) times (minus) the lower terms of the modulus
+            h = r[e] % m
+            if h:
+                if c != 1:
+                    h = h * c % m
+                for (k, t) in self.m_tail:
+                    r[e-d+k] -= h * t
+        return P.strip([x % m for x in r[:d]])
+
+    def reduce_bits(self, v): # reduce the bit mask v modulo the modulus
+        d = self.deg
+        if self.m_sparse: # x^d = (lower terms of the modulus): replace all of v above x^d at once
+            mask = (1 << d) - 1
+            while v >> d:
+                h = v >> d
+                v &= mask
+                for k in self.m_low:
+                    v ^= h << k
+            return v
+        m = self.m_bits
+        while True:
+            s = v.bit_length() - 1 - d
+            if s < 0:
+                return v
+            v ^= m << s
+
+    def mult_bits(self, a, b): # carry-less product of the bit masks a and b
+        a, b = int(a), int(b) # plain integers, since binary_polynomial arithmetic is polynomial arithmetic
+        if a.bit_length() < b.bit_length():
+            a, b = b, a
+        r = 0
+        if b.bit_length() < self.comb_threshold:
+            while b:
+                l = b & -b
+                r ^= a << (l.bit_length() - 1)
+                b ^= l
+            return r
+        t = [0, a] # t[k] is the product of a and the polynomial with bit mask k, for k < 16
+        for k in range(2, 16):
+            t.append(t[k-1] ^ a if k & 1 else t[k >> 1] << 1)
+        i = 0
+        while b:
+            r ^= t[b & 15] << i
+            b >>= 4
+            i += 4
+        return r
+
+    def sqr_bits(self, a): # squaring over F_2 spreads out the bits: (sum x^i)^2 = sum x^(2i)
+        n = (a.bit_length() + 7) // 8
+        return int.from_bytes(b''.join([self.sqr_bytes[c] for c in a.to_bytes(n, 'little')]), 'little')
+
+    def inv_bits(self, a): # inverse of the bit mask a modulo the modulus, or None; a binary extended Euclidean algorithm
+        u, v = a, self.m_bits
+        g1, g2 = 1, 0 # invariant: a g1 = u and a g2 = v modulo the modulus
+        while u > 1:
+            j = u.bit_length() - v.bit_length()
+            if j < 0:
+                u, v, g1, g2, j = v, u, g2, g1, -j
+            u ^= v << j
+            g1 ^= g2 << j
+        if u == 0:
+            return None
+        return self.reduce_bits(g1)
+
+    def encode(self, v): # the packed polynomial v (a list) as an integer: the number with base p digits v[0], v[1], ...
+        n = 0
+        for c in reversed(v):
+            n = n * self.char + c
+        return int(n)
+
+    def decode(self, n): # inverse of encode
+        v = []
+        p = int(self.char)
+        while n:
+            n, c = divmod(n, p)
+            v.append(c)
+        return v
+
+    def code(self, v): # a value as an integer, see encode
+        return int(v) if self.binary else self.encode(v.value)
+
+    def from_code(self, n): # inverse of code
+        if self.binary:
+            return binary_polynomial(n)
+        return self.p_ring.element(self.decode(n), self.p_ring)
+
+    def polynomial(self, v): # a value as an element of p_ring
+        if self.binary:
+            return self.p_ring.element(self.decode(v), self.p_ring)
+        return v
+
+    def make_tables(self):
+        """Switch multiplication, division and powers to table lookups: for a generator g of the multiplicative group,
+        exp_table[k] encodes g^k and log_table[code(x)] = k if x = g^k (and -1 for x = 0); see encode.
+        Both tables are numpy arrays. Only fields with at most table_limit elements are tabulated."""
+        if self.exp_table is not None:
+            return
+        q = int(self.cardinality)
+        if np is None:
+            print("Class Galoisfield: Tables need numpy")
+            raise
+        if q > self.table_limit:
+            print(f"Class Galoisfield: Field too large for tables (more than {self.table_limit} elements)")
+            raise
+        g = self.primitive_element().value
+        t = np.int32 if q < 2**31 else np.int64
+        exp_table = np.zeros(q - 1, dtype=t)
+        log_table = np.full(q, -1, dtype=t)
+        r = self.one().value
+        for k in range(q - 1):
+            n = self.code(r)
+            exp_table[k] = n
+            log_table[n] = k
+            r = self.mult(r, g)
+        self.log_table = log_table
+        self.exp_table = exp_table
 
     def zero(self):
+        if self.binary:
+            return self.element(binary_polynomial(0), self)
         return self.element(self.p_ring.zero(), self)
 
     def one(self):
+        if self.binary:
+            return self.element(binary_polynomial(1), self)
         return self.element(self.p_ring.one(), self)
 
     def add(self, a, b):
+        if self.binary:
+            return binary_polynomial(a ^ b)
         return a.add(b)
 
     def sub(self, a, b):
+        if self.binary:
+            return binary_polynomial(a ^ b)
         return a.sub(b)
 
     def mult(self, a, b):
-        return self.normalise(a.mult(b))
-
-    def div(self, a, b): # compute a/b
-        if b.is_zero():
+        if self.exp_table is not None:
+            if self.is_zero(a) or self.is_zero(b):
+                return self.zero().value
+            k = int(self.log_table[self.code(a)]) + int(self.log_table[self.code(b)])
+            return self.from_code(int(self.exp_table[k % len(self.exp_table)]))
+        if self.binary:
+            return binary_polynomial(self.reduce_bits(self.sqr_bits(a) if a is b else self.mult_bits(a, b)))
+        return self.p_ring.element(self.reduce(self.p_ring.mult(a.value, b.value)), self.p_ring)
+
+    def inv(self, b):
+        if self.is_zero(b):
             print("Class Galoisfield: Cannot divide by 0")
             raise
-        return a.mult(b.Bezout(self.modulus)[1])
+        if self.exp_table is not None:
+            k = -int(self.log_table[self.code(b)])
+            return self.from_code(int(self.exp_table[k % len(self.exp_table)]))
+        if self.binary:
+            c = self.inv_bits(b)
+            if c is None:
+                print("Class Galoisfield: Element not invertible (is the modulus irreducible?)")
+                raise
+            return binary_polynomial(c)
+        c = self.p_ring.inverse_mod(b.value, self.modulus.value)
+        if c is None:
+            print("Class Galoisfield: Element not invertible (is the modulus irreducible?)")
+            raise
+        return self.p_ring.element(self.reduce(c), self.p_ring)
+
+    def inv_many(self, v): # see field.inv_many; by table lookup, or on bit masks or packed lists
+        if v == []:
+            return []
+        if self.exp_table is not None:
+            n = np.array([self.code(x) for x in v])
+            if (n == 0).any():
+                print("batch_inv: Cannot invert 0")
+                raise
+            k = (-self.log_table[n]) % len(self.exp_table)
+            return [self.from_code(int(c)) for c in self.exp_table[k]]
+        if self.binary:
+            mult = lambda a, b: self.reduce_bits(self.mult_bits(a, b))
+            w = v
+        else:
+            P = self.p_ring
+            mult = lambda a, b: self.reduce(P.mult(a, b))
+            w = [x.value for x in v]
+        c = [w[0]]
+        for x in w[1:]:
+            c.append(mult(c[-1], x))
+        u = self.inv(binary_polynomial(c[-1]) if self.binary else P.element(c[-1], P))
+        u = u if self.binary else u.value
+        r = [None] * len(w)
+        for i in range(len(w) - 1, 0, -1):
+            r[i] = mult(u, c[i-1])
+            u = mult(u, w[i])
+        r[0] = u
+        if self.binary:
+            return [binary_polynomial(x) for x in r]
+        return [P.element(x, P) for x in r]
+
+    def div(self, a, b): # compute a/b
+        return self.mult(a, self.inv(b))
+
+    def norm(self, v): # the norm of v over the prime field, an integer mod p: the resultant of the modulus and v
+        p = self.char
+        P = self.p_ring
+        f, g = self.modulus.value, self.polynomial(v).value
+        r = pow(int(gmpy2.invert(f[-1], p)), len(g) - 1, p) # Res(f, g) = lc(f)^deg(g) N(g)
+        while g != []:
+            n, k = len(f) - 1, len(g) - 1
+            if k == 0:
+                return r * pow(int(g[0]), n, p) % p
+            # Res(f, g) = (-1)^(nk) Res(g, f) = (-1)^(nk) lc(g)^(n - deg h) Res(g, h) for h = f mod g
+            h = P.mod(f, g)
+            if n * k % 2 == 1:
+                r = -r
+            r = r * pow(int(g[-1]), n - len(h) + 1, p) % p
+            f, g = g, h
+        return 0
+
+    def is_square(self, v): # a is a square in F_q iff its norm is a square in F_p
+        if self.binary:
+            return True
+        return legendre(self.norm(v), self.char) != -1
+
+    def power(self, x, k): # square and multiply on packed polynomials, reducing after every step
+        e = mpz(k)
+        if e < 0:
+            x = self.inv(x)
+            e = -e
+        if e == 0:
+            return self.one().value
+        if self.is_zero(x):
+            return x
+        e = f_mod(e - 1, self.cardinality - 1) + 1 # x^(q-1) = 1 for x != 0
+        P = self.p_ring
+        if self.exp_table is not None:
+            k = int(self.log_table[self.code(x)]) * int(e)
+            return self.from_code(int(self.exp_table[k % len(self.exp_table)]))
+        if self.binary:
+            r = 1
+            b = int(x)
+            while True:
+                if e & 1:
+                    r = self.reduce_bits(self.mult_bits(r, b))
+                e >>= 1
+                if e == 0:
+                    break
+                b = self.reduce_bits(self.sqr_bits(b))
+            return binary_polynomial(r)
+        r = P.one().value
+        b = x.value
+        while True:
+            if e & 1:
+                r = self.reduce(P.mult(r, b))
+            e >>= 1
+            if e == 0:
+                break
+            b = self.reduce(P.mult(b, b))
+        return P.element(r, P)
 
     def is_zero(self, v):
+        if self.binary:
+            return v == 0
         return v.is_zero()
 
+    def frobenius(self, v, k=1): # v^(p^k); by squarings for p = 2, and by the frobenius_map of the modulus otherwise
+        k = k % self.deg
+        if self.binary:
+            for i in range(k):
+                v = self.reduce_bits(self.sqr_bits(v))
+            return binary_polynomial(v)
+        P = self.p_ring
+        return P.element(P.frobenius(self.modulus.value).iterate(v.value, k), P)
+
     def __iter__(self):
         return self.iterator(self)
 
+    def element_at(self, n): # the element with index n (0 <= n < cardinality) in the order of iteration
+        return self.element(self.from_code(n), self)
+
+    def first_primitive_candidate(self): # x is a generator if the modulus is primitive
+        return self.element(self.normalise(self.p_ring.x()), self)
+
     def random_element(self):
         """Return a random element."""
+        if self.binary:
+            return self.element(binary_polynomial(randbelow(2**self.deg)), self)
         return self([self.c_ring.random_element() for i in range(self.deg)])
 
 
@@ -862,30 +2484,29 @@ class Galoisfield_element(field_element):
     # using generic methods mostly!
     def __str__(self):
         if self.ring.print_modulus:
-            return str(self.value) + ' mod ' + str(self.ring.modulus)
+            return str(self.ring.polynomial(self.value)) + ' mod ' + str(self.ring.modulus)
         else:
-            return str(self.value)
+            return str(self.ring.polynomial(self.value))
 
     def __init__(self, v, G):
         if not(isinstance(G, Galoisfield)):
             print("Class Galoisfield_element: Specify a Galois field")
             raise
         w = v
-        if not(isinstance(v, polynomialring_over_field_element)):
+        if not(isinstance(v, (polynomialring_over_field_element, binary_polynomial))):
             w = polynomialring_over_field_element(v, G.p_ring)
         super().__init__(w, G)
 
     def is_in_primefield(self):
-        return self.value.deg() == 0
+        return self.ring.polynomial(self.value).deg() == 0
 
-    def is_generator(self):
-        if self.is_zero():
-            return False
-        q1  = self.ring.cardinality - 1
-        for e in [int(q1/d) for d in [*set(pf.primefac(q1))]]:
-            if (self**e).is_one():
-                return False
-        return True
+    def polynomial(self):
+        """Return the value as an element of the polynomial ring of the modulus, also in characteristic 2."""
+        return self.ring.polynomial(self.value)
+
+    def frobenius(self, k=1):
+        """Return self^(p^k), where p is the characteristic."""
+        return self.__class__(self.ring.frobenius(self.value, k), self.ring)
 
 
 class Galoisfield_iterator:
@@ -898,10 +2519,153 @@ class Galoisfield_iterator:
         n = self.current
         if n > self.max:
             raise StopIteration
-        nums = []
-        for i in range(self.field.deg):
-            n, r = divmod(n, self.field.char)
-            nums.append(str(r))
         self.current += 1
-        return self.field.element(self.field.p_ring.element(nums, self.field.p_ring), self.field)
+        return self.field.element_at(n)
+
+
+def irreducible_cache_default():
+    # The environment variable RINGS_AND_FIELDS_IRREDUCIBLE_CACHE if it is set (to the empty string: no file), and
+    # otherwise irreducible.json in the directory rings_and_fields of the user's cache directory.
+    f = os.environ.get('RINGS_AND_FIELDS_IRREDUCIBLE_CACHE')
+    if f is None:
+        cache = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        f = os.path.join(cache, 'rings_and_fields', 'irreducible.json')
+    return f or None
+
+# find_irreducible stores sparse and Conway polynomials in this JSON file (see irreducible_cache_default), if it is
+# not None; otherwise they are only kept in memory.
+irreducible_cache_file = irreducible_cache_default()
+irreducible_cache = None # "kind p n" -> coefficients, loaded from irreducible_cache_file when first needed
+
+def find_irreducible(p, n, kind='sparse', pool=None):
+    """Return a monic irreducible polynomial of degree n > 0 over primefield(p), for instance as a Galoisfield modulus.
+    kind is one of
+      'sparse': the first irreducible trinomial x^n + a x^k + b (by k, then a, b), or else the first pentanomial
+                x^n + a3 x^k3 + a2 x^k2 + a1 x^k1 + b (by k3, k2, k1, then a3, a2, a1, b), with non-zero coefficients
+                (all 1 for p = 2), or else a random irreducible polynomial; sparse moduli are cheap to reduce by
+                (see Galoisfield).
+      'random': a random irreducible polynomial.
+      'conway': the Conway polynomial (found by exhaustive search, so only for small p^n).
+    Candidates are tested in batches in pool, if it is given (see polynomialring_over_field.run_tasks). Sparse and Conway
+    polynomials are kept in irreducible_cache_file, so they are searched for only once."""
+    P = polynomialring_over_field(primefield(p))
+    key = f"{kind} {p} {n}"
+    if kind != 'random':
+        c = irreducible_cache_entries().get(key)
+        if c is not None:
+            return P(c)
+    if kind == 'sparse':
+        c = next(irreducibles(P, itertools.chain(sparse_candidates(p, n), random_candidates(p, n)), pool))
+    elif kind == 'random':
+        return P(next(irreducibles(P, random_candidates(p, n), pool)))
+    elif kind == 'conway':
+        c = conway_polynomial(P, n, pool)
+    else:
+        print("find_irreducible: kind must be 'sparse', 'random' or 'conway'")
+        raise
+    store_irreducible(key, c)
+    return P(c)
+
+def irreducibles(P, candidates, pool): # the irreducible ones among the candidates (values), in order
+    while True:
+        batch = list(itertools.islice(candidates, 1 if pool is None else 64))
+        if batch == []:
+            return
+        for (c, ok) in zip(batch, P.run_tasks(pool, 'is_irreducible', [(c,) for c in batch])):
+            if ok:
+                yield c
+
+def sparse_candidates(p, n): # trinomials, then pentanomials, of degree n over F_p; see find_irreducible
+    # The reciprocal of a trinomial x^n + a x^k + b is, up to a constant factor, a trinomial with n - k in place of k,
+    # so k <= n/2 suffices; over F_2 there are no irreducible trinomials of degree divisible by 8 (Swan's theorem).
+    if n == 1:
+        yield [0, 1]
+    for k in range(1, n // 2 + 1 if p != 2 or n % 8 != 0 else 1):
+        for (a, b) in unit_tuples(p, 2):
+            c = [0] * (n + 1)
+            c[0], c[k], c[n] = b, a, 1
+            yield c
+    for k3 in range(3, n):
+        for k2 in range(2, k3):
+            for k1 in range(1, k2):
+                for (a3, a2, a1, b) in unit_tuples(p, 4):
+                    c = [0] * (n + 1)
+                    c[0], c[k1], c[k2], c[k3], c[n] = b, a1, a2, a3, 1
+                    yield c
+
+def unit_tuples(p, r): # the r-tuples of non-zero residues modulo p in lexicographic order, one at a time (p may be large)
+    if r == 0:
+        yield ()
+        return
+    for a in range(1, p):
+        for t in unit_tuples(p, r - 1):
+            yield (a,) + t
+
+def random_candidates(p, n): # random monic polynomials of degree n over F_p, with non-zero constant term if n > 1
+    while True:
+        c = [randbelow(p) for i in range(n)] + [1]
+        if n == 1 or c[0] != 0:
+            yield c
+
+def conway_polynomial(P, n, pool):
+    # The Conway polynomial C_n is the least monic primitive polynomial x^n - c_1 x^(n-1) + c_2 x^(n-2) - ... of degree
+    # n, ordering by (c_1, ..., c_n), such that C_d(x^((p^n-1)/(p^d-1))) = 0 mod C_n for all divisors d < n of n.
+    # For d = 1 this fixes c_n (the norm of a root) to be the root of C_1, the least primitive root of p.
+    p = int(P.c_mod)
+    q1 = p**n - 1
+    sub = [(d, find_irreducible(p, d, 'conway', pool).value) for d in range(1, n) if n % d == 0]
+    def candidates():
+        last = [(-P.coeff(sub[0][1], 0)).value] if n > 1 else range(1, p)
+        for t in itertools.product(*([range(p)] * (n - 1) + [last])):
+            yield P.normalise([(-1)**(n - i) * t[n - i - 1] for i in range(n)] + [1])
+    x = P.x().value
+    for f in irreducibles(P, candidates(), pool):
+        if any(P.is_zero(P.sub(P.powmod(x, q1 // r, f), P.one().value)) for (r, e) in factorisation(q1)):
+            continue # not primitive
+        compatible = True
+        for (d, g) in sub:
+            y = P.powmod(x, q1 // (p**d - 1), f)
+            z = []
+            for c in reversed(g): # Horner: g(y) mod f
+                z = P.add(P.mod(P.mult(z, y), f), [c])
+            compatible = compatible and z == []
+        if compatible:
+            return f
+
+def irreducible_cache_entries():
+    global irreducible_cache
+    if irreducible_cache is None:
+        irreducible_cache = {}
+        if irreducible_cache_file is not None:
+            try:
+                with open(irreducible_cache_file) as h:
+                    irreducible_cache = json.load(h)
+            except (OSError, ValueError): # no cache yet, or an unreadable one: start afresh
+                pass
+    return irreducible_cache
+
+def store_irreducible(key, c):
+    # Add the entry to the cache file, keeping entries written by other processes in the meantime; the file is
+    # replaced atomically, so readers never see a partial file. If the file cannot be written, this is reported and
+    # the cache is kept in memory only from then on.
+    global irreducible_cache_file
+    irreducible_cache_entries()[key] = [int(a) for a in c]
+    if irreducible_cache_file is None:
+        return
+    try:
+        with open(irreducible_cache_file) as h:
+            irreducible_cache.update({k: v for (k, v) in json.load(h).items() if k not in irreducible_cache})
+    except (OSError, ValueError): # no cache yet, or an unreadable one: overwrite it
+        pass
+    try:
+        d = os.path.dirname(irreducible_cache_file)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        tmp = irreducible_cache_file + '.' + str(os.getpid())
+        with open(tmp, 'w') as h:
+            json.dump(irreducible_cache, h)
+        os.replace(tmp, irreducible_cache_file)
+    except OSError as e:
+        print("find_irreducible: Cannot write the cache file " + irreducible_cache_file + " (" + str(e) + "), keeping the cache in memory only")
+        irreducible_cache_file = None
 # Rings and fields:1 ends here
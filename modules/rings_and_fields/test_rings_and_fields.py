@@ -0,0 +1,816 @@
+# Tests for rings_and_fields. Fast paths (Karatsuba, NTT, Kronecker substitution, Newton division, half-GCD, ...) are
+# compared with the schoolbook or naive computation on both sides of their thresholds. Run with pytest.
+import itertools
+import json
+import os
+import pickle
+import random
+
+import gmpy2
+import pytest
+import rings_and_fields as rf
+from gmpy2 import mpz, mpq
+
+rf.irreducible_cache_file = None # find_irreducible keeps its polynomials in memory, not in the user's cache directory
+
+
+@pytest.fixture(autouse=True)
+def seed():
+    random.seed(2024)
+
+
+def rand_packed(m, n): # a random packed polynomial with exactly n coefficients (leading one non-zero)
+    return [random.randrange(m) for i in range(n - 1)] + [random.randrange(1, m)]
+
+
+# Equality and hashing (structural, cached)
+
+def test_equality_is_structural():
+    F = rf.primefield(101)
+    assert F(3) == F(104) and F(3) != F(4)
+    assert F(3) != rf.primefield(103)(3)
+    assert rf.zmod(101)(3) != F(3) # same value, different parent
+    P = rf.polynomialring_over_field(F)
+    assert P([1, 2, 3]) == P([F(1), F(2), F(3), F(0)])
+    assert P([1, 2]) != P([1, 2, 3])
+
+
+def test_hash_agrees_with_equality():
+    F = rf.primefield(13)
+    assert len({F(i) for i in range(100)}) == 13
+    P = rf.polynomialring_over_field(F)
+    assert hash(P([1, 2, 3])) == hash(P([14, 15, 16]))
+    G = rf.Galoisfield(P([2, 1, 1]) if P([2, 1, 1]).is_irreducible() else P([2, 0, 1]))
+    assert len(set(G)) == 169
+    Q = rf.Q()
+    assert len({Q(1), Q(1), Q(2)}) == 2
+
+
+# Unique parents
+
+def test_parents_are_interned():
+    assert rf.primefield(101) is rf.primefield(mpz(101))
+    assert rf.zmod(12) is rf.zmod(12)
+    F = rf.primefield(7)
+    assert rf.polynomialring_over_field(F) is rf.polynomialring_over_field(F, 'x')
+    assert rf.polynomialring_over_field(F, 't') is not rf.polynomialring_over_field(F)
+    P = rf.polynomialring_over_field(F)
+    assert rf.Galoisfield(P([3, 0, 1])) is rf.Galoisfield(P([3, 0, 1]))
+    G = rf.Galoisfield(P([3, 0, 1]), print_modulus=False) # a printing option, not a different field
+    assert G is rf.Galoisfield(P([3, 0, 1])) and G is rf.Galoisfield(P([3, 0, 1]), True)
+    assert G([1, 1]) * rf.Galoisfield(P([3, 0, 1]), print_modulus=True)([2, 1]) == G([6, 3])
+
+
+def test_pickled_parents_and_elements_are_interned():
+    F = rf.primefield(7)
+    P = rf.polynomialring_over_field(F)
+    G = rf.Galoisfield(P([3, 0, 1]))
+    for R in [F, P, G, rf.Z(), rf.Q(), rf.zmod(12), rf.polynomialring_over_field(G), rf.ntt_prime(998244353)]:
+        assert pickle.loads(pickle.dumps(R)) is R
+    a = G([1, 2])
+    b = pickle.loads(pickle.dumps(a))
+    assert b == a and b.ring is G and hash(b) == hash(a)
+
+
+# Packed polynomials over Z/m
+
+def naive_mult(a, b, m): # schoolbook product of coefficient lists modulo m, stripped
+    r = [0] * (len(a) + len(b) - 1) if a and b else []
+    for i, c in enumerate(a):
+        for j, d in enumerate(b):
+            r[i+j] = (r[i+j] + c * d) % m
+    while r and r[-1] == 0:
+        r.pop()
+    return r
+
+
+@pytest.mark.parametrize('m', [2, 60, 10007, 2**61 - 1, 2**64 + 13, 2**127 - 1])
+def test_packed_values(m):
+    R = rf.zmod(m) if m in [60, 2**64 + 13] else rf.primefield(m)
+    P = rf.polynomialring(R) if m in [60, 2**64 + 13] else rf.polynomialring_over_field(R)
+    assert P.packed
+    f = P([-1, R(5), 3 * m + 2, 0, 0])
+    assert f.value == naive_mult([m - 1, 5 % m, 2 % m], [1], m)
+    assert all(type(c) is P.c_type for c in f.value)
+    assert P.c_type is (int if m < 2**63 else type(mpz(0)))
+    a, b = P(rand_packed(m, 20)), P(rand_packed(m, 13))
+    assert (a * b).value == naive_mult(a.value, b.value, m)
+    assert (a + b).value == P([(x + y) % m for (x, y) in zip(a.value, b.value + [0] * 7)]).value
+    assert (a - a).value == []
+    assert str(P([1, 0, 2])) == str(P([R(1), R(0), R(2)]))
+
+
+# Karatsuba multiplication and squaring
+
+@pytest.mark.parametrize('na, nb', [(1, 1), (31, 31), (32, 33), (33, 33), (64, 64), (100, 37), (200, 40), (257, 129)])
+def test_karatsuba_packed(na, nb):
+    P = rf.polynomialring_over_field(rf.primefield(10007))
+    a, b = rand_packed(10007, na), rand_packed(10007, nb)
+    ref = P.mult_schoolbook(a, b, 0)
+    for t in [1, 2, 8, P.karatsuba_threshold]:
+        assert P.mult_karatsuba(a, b, 0, t) == ref
+        assert P.sqr_karatsuba(a, 0, t) == P.mult_schoolbook(a, a, 0)
+    assert P.mult(a, b) == naive_mult(a, b, 10007)
+    assert P.mult(a, a) == naive_mult(a, a, 10007)
+
+
+@pytest.mark.parametrize('n', [5, 16, 17, 40])
+def test_karatsuba_elements(n):
+    Q = rf.Q()
+    P = rf.polynomialring(Q)
+    a = P([Q(mpq(random.randrange(-99, 100), random.randrange(1, 50))) for i in range(n)])
+    b = P([Q(mpq(random.randrange(-99, 100), random.randrange(1, 50))) for i in range(n + 3)])
+    assert (a * b).value == P.normalise(P.mult_schoolbook(a.value, b.value, Q.zero()))
+    assert P.mult(a.value, a.value) == P.normalise(P.mult_schoolbook(a.value, a.value, Q.zero()))
+    F = rf.primefield(3)
+    G = rf.Galoisfield(rf.polynomialring_over_field(F)([2, 2, 1]))
+    R = rf.polynomialring_over_field(G)
+    a, b = R([G.random_element() for i in range(n)]), R([G.random_element() for i in range(n)])
+    assert (a * b).value == R.normalise(R.mult_schoolbook(a.value, b.value, G.zero()))
+
+
+# Kronecker substitution and number-theoretic transforms
+
+def reference_mult(P, a, b): # Karatsuba on plain integers (checked against schoolbook above), reduced at the end
+    return P.strip([c % P.c_mod for c in P.mult_karatsuba(a, b, 0, 32)])
+
+
+@pytest.mark.parametrize('m', [3, 7681, 10007, 998244353, 2**31 - 1, 2**61 - 1, 2**127 - 1, 60, 2**64 + 13])
+@pytest.mark.parametrize('na, nb', [(7, 7), (8, 9), (11, 11), (12, 13), (9, 40), (255, 255), (257, 256), (600, 300)])
+def test_mult_paths(m, na, nb):
+    R = rf.primefield(m) if m not in [60, 2**64 + 13] else rf.zmod(m)
+    P = rf.polynomialring(R)
+    a, b = rand_packed(m, na), rand_packed(m, nb)
+    assert P.mult(a, b) == reference_mult(P, a, b)
+    assert P.mult(a, a) == reference_mult(P, a, a)
+
+
+def spy_paths(P, monkeypatch): # records which multiplication method mult dispatches to
+    calls = []
+    for name in ['mult_schoolbook', 'sqr_schoolbook', 'mult_karatsuba', 'sqr_karatsuba', 'mult_kronecker',
+                 'mult_kronecker_wide', 'mult_ntt']:
+        def spy(*args, name=name, f=getattr(P, name)):
+            calls.append(name)
+            return f(*args)
+        monkeypatch.setattr(P, name, spy)
+    return calls
+
+
+@pytest.mark.parametrize('m, n, numpy, ntt, path', [
+    (10007, 11, True, None, 'mult_schoolbook'), (10007, 12, True, None, 'mult_kronecker'),
+    (2**61 - 1, 12, True, None, 'mult_kronecker_wide'), (998244353, 300, True, None, 'mult_kronecker_wide'),
+    (998244353, 300, True, 256, 'mult_ntt'), (998244353, 255, True, 256, 'mult_kronecker_wide'),
+    (10007, 12, False, None, 'mult_kronecker_wide'), (10007, 11, False, None, 'mult_schoolbook')])
+def test_mult_dispatch(m, n, numpy, ntt, path, monkeypatch):
+    # each path of mult is taken from its threshold on: min degree >= kronecker_threshold (11), ntt_threshold
+    # (off by default, 256 here)
+    if numpy and rf.np is None:
+        pytest.skip('needs numpy')
+    if not(numpy):
+        monkeypatch.setattr(rf, 'np', None)
+    P = rf.polynomialring_over_field(rf.primefield(m))
+    monkeypatch.setattr(P, 'ntt_threshold', ntt)
+    a, b = rand_packed(m, n), rand_packed(m, n + 5)
+    calls = spy_paths(P, monkeypatch)
+    assert P.mult(a, b) == reference_mult(P, a, b)
+    assert calls[0] == path
+    del calls[:]
+    assert P.mult(a, a) == reference_mult(P, a, a)
+    assert calls[0] == path.replace('mult_schoolbook', 'sqr_schoolbook')
+    Q = rf.polynomialring(rf.Q()) # coefficients that are ring elements: Karatsuba above karatsuba_threshold (15)
+    for n, path in [(15, 'mult_schoolbook'), (16, 'mult_karatsuba')]:
+        a = [rf.Q()(mpq(random.randrange(-9, 10), random.randrange(1, 9))) for i in range(n)]
+        calls = spy_paths(Q, monkeypatch)
+        Q.mult(a, a[:])
+        assert calls[:2] == ['mult_karatsuba', path]
+
+
+@pytest.mark.parametrize('q, n', [(7681, 100), (7681, 240), (65537, 1000), (998244353, 3000)])
+def test_ntt(q, n):
+    if rf.np is None:
+        pytest.skip('needs numpy')
+    P = rf.polynomialring_over_field(rf.primefield(q))
+    a, b = rand_packed(q, n), rand_packed(q, n + 17)
+    assert P.ntt_direct(2 * n + 16)
+    assert P.mult_ntt(a, b) == reference_mult(P, a, b)
+    assert P.mult_ntt(a, a) == reference_mult(P, a, a)
+    assert not(rf.polynomialring_over_field(rf.primefield(7681)).ntt_direct(1024)) # 7680 = 2^9 * 15
+
+
+@pytest.mark.parametrize('m', [10007, 2**61 - 1, 2**127 - 1])
+def test_mult_without_numpy(m, monkeypatch):
+    monkeypatch.setattr(rf, 'np', None)
+    P = rf.polynomialring_over_field(rf.primefield(m))
+    for (na, nb) in [(8, 8), (300, 290)]:
+        a, b = rand_packed(m, na), rand_packed(m, nb)
+        assert P.mult(a, b) == reference_mult(P, a, b)
+        assert P.strip(P.mult_kronecker_wide(a, b)) == reference_mult(P, a, b)
+
+
+# Division with remainder by Newton iteration
+
+def schoolbook_div_mod(P, f, g):
+    c = P.c_type(gmpy2.invert(g[-1], P.c_mod)) if P.packed else g[-1].inv()
+    return P.div_mod_schoolbook(f, g, c)
+
+
+@pytest.mark.parametrize('p', [2, 10007, 2**61 - 1])
+@pytest.mark.parametrize('nf, ng', [(300, 100), (511, 256), (513, 257), (700, 300), (1200, 300)])
+def test_newton_division(p, nf, ng):
+    P = rf.polynomialring_over_field(rf.primefield(p))
+    f, g = rand_packed(p, nf), rand_packed(p, ng)
+    q, r = P.div_mod(f, g)
+    assert [q, r] == schoolbook_div_mod(P, f, g)
+    assert P.div_mod_newton(f, g) == [q, r]
+    assert P.add(P.mult(q, g), r) == f and len(r) < len(g)
+    assert P.div_mod_newton(f, g, P.reverse_inverse(g, 2000)) == [q, r] # a longer cached inverse
+
+
+def test_newton_division_elements(monkeypatch):
+    G = rf.Galoisfield(rf.polynomialring_over_field(rf.primefield(3))([2, 2, 1]))
+    P = rf.polynomialring_over_field(G)
+    monkeypatch.setattr(P, 'newton_threshold', 4)
+    f = [G.random_element() for i in range(40)] + [G.one()]
+    g = [G.random_element() for i in range(15)] + [G([1, 1])]
+    f, g = P.normalise(f), P.normalise(g)
+    assert P.div_mod(f, g) == schoolbook_div_mod(P, f, g)
+
+
+# Reduction modulo Galois field moduli
+
+@pytest.mark.parametrize('p, n, sparse', [(10007, 40, False), (10007, 40, True), (3, 200, False), (2, 163, True),
+                                          (2**61 - 1, 30, False)])
+def test_galois_reduce(p, n, sparse): # reduce only needs a monic modulus, not an irreducible one
+    P = rf.polynomialring_over_field(rf.primefield(p))
+    f = P([1] + [0] * (n // 3 - 1) + [p - 1] + [0] * (n - n // 3 - 1) + [1] if sparse else rand_packed(p, n) + [1])
+    G = rf.Galoisfield(f)
+    assert G.m_barrett == (not(sparse) and p != 2**61 - 1)
+    for k in [n - 1, n, n + 1, n + 15, n + 16, 2 * n - 1, 3 * n]:
+        v = rand_packed(p, k)
+        assert G.reduce(v) == P.mod(v, f.value)
+    a, b = G.random_element(), G.random_element()
+    assert (a * b).polynomial() == (a.polynomial() * b.polynomial()) % f
+
+
+# Half-GCD
+
+@pytest.mark.parametrize('p', [2, 10007, 2**61 - 1])
+@pytest.mark.parametrize('nf, ng, nc', [(100, 90, 1), (129, 129, 1), (300, 200, 1), (400, 399, 30), (700, 350, 200)])
+def test_half_gcd(p, nf, ng, nc, monkeypatch):
+    P = rf.polynomialring_over_field(rf.primefield(p))
+    c = rand_packed(p, nc) # a common factor
+    f, g = P.mult(rand_packed(p, nf), c), P.mult(rand_packed(p, ng), c)
+    d, s, t = P.Bezout(f, g)
+    assert P.add(P.mult(s, f), P.mult(t, g)) == d and d[-1] == 1
+    inv = P.inverse_mod(f, g)
+    with monkeypatch.context() as mp: # the plain Euclidean algorithm
+        mp.setattr(P, 'hgcd_threshold', 10**9)
+        assert P.Bezout(f, g)[0] == d
+        assert P.inverse_mod(f, g) == inv
+    if len(d) == 1:
+        assert P.mod(P.mult(inv, f), g) == [1]
+    else:
+        assert inv is None
+    assert P.mod(f, d) == [] and P.mod(g, d) == [] and P.mod(d, c) == []
+
+
+# Log and antilog tables
+
+@pytest.mark.parametrize('p, n', [(3, 7), (2, 10), (13, 2)])
+def test_tables(p, n, monkeypatch):
+    if rf.np is None:
+        pytest.skip('needs numpy')
+    G = rf.Galoisfield(rf.find_irreducible(p, n))
+    xs = [G.random_element() for i in range(50)] + [G.zero(), G.one()]
+    ys = [G.random_element() for i in range(50)] + [G.one(), G.zero()]
+    ref = [(x * y, x**5, x**-3 if not(x.is_zero()) else None, x / y if not(y.is_zero()) else None) for (x, y) in zip(xs, ys)]
+    inv = G.inv_many([x.value for x in xs[:50] if not(x.is_zero())])
+    monkeypatch.setattr(G, 'exp_table', None) # restored by monkeypatch, so other tests see the field without tables
+    monkeypatch.setattr(G, 'log_table', None)
+    G.make_tables()
+    assert G.exp_table is not None
+    assert ref == [(x * y, x**5, x**-3 if not(x.is_zero()) else None, x / y if not(y.is_zero()) else None) for (x, y) in zip(xs, ys)]
+    assert G.inv_many([x.value for x in xs[:50] if not(x.is_zero())]) == inv
+
+
+# Binary fields
+
+@pytest.mark.parametrize('n, kind', [(8, 'sparse'), (64, 'sparse'), (163, 'sparse'), (40, 'random'), (233, 'random')])
+def test_binary_field(n, kind):
+    f = rf.find_irreducible(2, n, kind)
+    G = rf.Galoisfield(f)
+    assert G.binary
+    P = G.p_ring
+    for i in range(20):
+        a, b = G.random_element(), G.random_element()
+        pa, pb = a.polynomial(), b.polynomial()
+        assert (a * b).polynomial() == (pa * pb) % f
+        assert (a + b).polynomial() == pa + pb
+        assert (a * a).polynomial() == (pa * pa) % f
+        if not(a.is_zero()):
+            assert (a * a.inv()).is_one()
+            assert (a.inv()).polynomial() == rf.polynomialring_over_field_element(P.inverse_mod(pa.value, f.value), P)
+        assert a**(2**n) == a and a.frobenius(3) == a**8
+        assert a**12345 == a**12300 * a**45
+    assert G(f.ring.x()**n) == G(f - f.ring.x()**n)
+
+
+def test_binary_values_are_polynomials():
+    G = rf.Galoisfield(rf.find_irreducible(2, 8))
+    P = G.p_ring
+    a, b = G([1, 0, 1, 1, 0, 1]), G([0, 1, 1, 0, 0, 0, 1, 1])
+    pa, pb = a.polynomial(), b.polynomial()
+    assert a.value.deg() == 5 and a.value.coeff(3).is_one() and a.value.coeff(4).is_zero() and a.value.lc().is_one()
+    assert str(a.value) == str(pa)
+    assert P(a.value * b.value) == pa * pb and pb * a.value == pa * pb
+    assert P(a.value + b.value) == pa + pb and pb - a.value == pa + pb
+    assert P(a.value ** 3) == pa**3
+    assert P(a.value * b.value % G.modulus) == (a * b).polynomial()
+    q, r = (a.value * b.value).div_mod(a.value)
+    assert q == b.value and r == 0
+    assert G(a.value) == a and G(pa) == a
+
+
+def test_binary_values_with_integers():
+    # plain integers are constants modulo 2, as in polynomialring_over_field(primefield(2)); only bit masks are masks
+    G = rf.Galoisfield(rf.find_irreducible(2, 8))
+    P = G.p_ring
+    a = G([1, 0, 1, 1, 0, 1]).value
+    pa = a.polynomial()
+    for k in [1, 3, 7, 2**70 + 1]:
+        assert a % k == 0 and P(a % k) == pa % P([k])
+        assert k % a == 1 and P(k % a) == P([k]) % pa
+        assert a.div_mod(k) == [a, 0]
+    for k in [2, 4, 2**70]:
+        with pytest.raises(ZeroDivisionError):
+            a % k
+    assert P(a % rf.binary_polynomial(3)) == pa % P([1, 1]) # the bit mask 0b11 is x + 1
+    assert a % P([1, 1]) == a % rf.binary_polynomial(3)
+    assert a.value == [1, 0, 1, 1, 0, 1] and 45 % a == 1 and type(45 % a) is rf.binary_polynomial
+
+
+# Batch inversion
+
+def batch_fields():
+    return [rf.primefield(10007), rf.primefield(2**127 - 1), rf.Galoisfield(rf.find_irreducible(3, 7)),
+            rf.Galoisfield(rf.find_irreducible(10007, 5)), rf.Galoisfield(rf.find_irreducible(2, 163, 'sparse')),
+            rf.Galoisfield(rf.find_irreducible(2, 10))]
+
+
+@pytest.mark.parametrize('n', [0, 1, 2, 50])
+def test_batch_inv(n):
+    for F in batch_fields():
+        xs = [F.random_element() for i in range(n)]
+        xs = [x if not(x.is_zero()) else F.one() for x in xs]
+        assert F.batch_inv(xs) == [x.inv() for x in xs]
+        assert F.inv_many([x.value for x in xs]) == [x.inv().value for x in xs]
+    Q = rf.Q()
+    xs = [Q(mpq(random.randrange(1, 1000), random.randrange(-50, 50) or 1)) for i in range(n)]
+    assert Q.batch_inv(xs) == [x.inv() for x in xs]
+
+
+def test_batch_inv_of_zero():
+    for F in batch_fields():
+        with pytest.raises(RuntimeError):
+            F.batch_inv([F.one(), F.zero(), F.one()])
+
+
+# Square roots
+
+def sqrt_fields():
+    r = [rf.primefield(p) for p in [2, 3, 1019, 1013, 1009, 97, 257]] # p = 3 mod 4, 5 mod 8, 1 mod 8
+    for (p, f) in [(3, [2, 1, 0, 0, 1]), (5, [2, 3, 0, 1]), (7, [1, 0, 1]), (17, [3, 0, 1]), (2, [1, 1, 0, 1, 1, 0, 0, 0, 1])]:
+        P = rf.polynomialring_over_field(rf.primefield(p))
+        assert P(f).is_irreducible()
+        r.append(rf.Galoisfield(P(f)))
+    return r
+
+
+@pytest.mark.parametrize('F', sqrt_fields(), ids=str)
+def test_sqrt_matches_brute_force(F):
+    roots = {}
+    for y in F:
+        roots.setdefault(y * y, []).append(y)
+    for x in F:
+        v = x.value
+        assert F.is_square(v) == (x in roots)
+        if F.char != 2:
+            assert rf.field.is_square(F, v) == (x in roots) # Euler's criterion
+        for s in [F.sqrt(v), rf.field.sqrt(F, v)]:
+            if x in roots:
+                assert F.element(s, F) in roots[x]
+            else:
+                assert s is None
+        if x in roots:
+            assert x.sqrt() ** 2 == x and x.is_square()
+    if F.char != 2:
+        assert not(F.is_square(F.non_square()))
+
+
+# Multiplicative orders
+
+def test_imports_without_the_other_modules(): # rings_and_fields is installed on its own, see setup.py
+    import subprocess
+    import sys
+    code = ('import sys; sys.path[:0] = [sys.argv[1]]; import rings_and_fields as rf; '
+            'assert "abelian_groups" not in sys.modules; print(rf.primefield(7)(3).order())')
+    r = subprocess.run([sys.executable, '-c', code, os.path.dirname(rf.__file__)], capture_output=True, text=True, cwd='/')
+    assert r.returncode == 0 and r.stdout.strip() == '6', r.stderr
+
+
+def naive_order(x):
+    y, n = x, 1
+    while not(y.is_one()):
+        y, n = y * x, n + 1
+    return n
+
+
+@pytest.mark.parametrize('F', [rf.primefield(p) for p in [2, 3, 1009, 7681]] + sqrt_fields()[7:], ids=str)
+def test_multiplicative_order(F):
+    q = F.cardinality
+    xs = [x for x in F if not(x.is_zero())] if q < 2000 else [F.random_element() for i in range(30)]
+    for x in xs:
+        if x.is_zero():
+            continue
+        n = naive_order(x)
+        assert x.order() == n
+        assert F.multiplicative_order(x.value, rf.factorisation(n * 6)) == n
+        assert x.is_generator() == (n == q - 1)
+    g = F.primitive_element()
+    assert naive_order(g) == q - 1 and g.is_generator()
+
+
+@pytest.mark.parametrize('p', [2, 3, 7, 101])
+def test_primitive_element_of_degree_one_field(p): # modulus x: the first candidate x is 0
+    F = rf.primefield(p)
+    G = rf.Galoisfield(rf.polynomialring_over_field(F)([0, 1]))
+    g = G.primitive_element()
+    assert not(g.is_zero()) and g.is_generator() and naive_order(g) == p - 1
+    assert not(G.is_primitive(G.zero().value)) and not(F.is_primitive(F.zero().value))
+    assert not(G.zero().is_generator())
+
+
+# Irreducibility and the Frobenius map
+
+def monic_polynomials(P, n): # all monic values of degree n
+    F = P.basering
+    elements = list(F)
+    r = [[]]
+    for i in range(n):
+        r = [c + [a] for c in r for a in elements]
+    return [P.normalise(c + [F.one()]) for c in r]
+
+
+def brute_force_irreducible(P, f): # no monic factor of degree 1 <= d <= deg(f)/2
+    return all(not(P.is_zero(P.mod(f, g))) for d in range(1, (len(f) - 1) // 2 + 1) for g in monic_polynomials(P, d))
+
+
+def irreducible_fields():
+    F2 = rf.primefield(2)
+    return [F2, rf.primefield(3), rf.primefield(5), rf.Galoisfield(rf.polynomialring_over_field(F2)([1, 1, 1]))]
+
+
+@pytest.mark.parametrize('F', irreducible_fields(), ids=str)
+def test_is_irreducible_matches_brute_force(F):
+    P = rf.polynomialring_over_field(F)
+    q = F.cardinality
+    for n in range(1, 6 if q == 2 else 4 if q < 5 else 3):
+        fs = monic_polynomials(P, n)
+        irreducible = [f for f in fs if P.is_irreducible(f)]
+        assert irreducible == [f for f in fs if brute_force_irreducible(P, f)]
+        # the number of monic irreducibles of degree n is (1/n) sum over d | n of mu(d) q^(n/d)
+        mu = {1: 1, 2: -1, 3: -1, 4: 0, 5: -1}
+        assert len(irreducible) == sum(mu[d] * q**(n // d) for d in range(1, n + 1) if n % d == 0) // n
+    assert not(P.is_irreducible(P.one().value)) and not(P.is_irreducible(P.zero().value))
+
+
+@pytest.mark.parametrize('F', irreducible_fields() + [rf.primefield(10007)], ids=str)
+@pytest.mark.parametrize('n', [1, 2, 5, 30])
+def test_frobenius_map(F, n):
+    P = rf.polynomialring_over_field(F)
+    q = F.cardinality
+    f = P.normalise([F.random_element() for i in range(n)] + [F.one()])
+    M = P.frobenius(f)
+    assert P.frobenius(f) is M
+    for i in range(5):
+        a = P.mod(P.normalise([F.random_element() for i in range(n)]), f)
+        assert M.apply(a) == P.powmod(a, q, f)
+        assert M.iterate(a, 3) == P.powmod(a, q**3, f)
+    assert M.xq == P.powmod(P.x().value, q, f)
+
+
+# Factorisation
+
+def brute_force_factor(P, f): # trial division by all monic polynomials, by increasing degree
+    f = P.scale(f, f[-1])
+    r = []
+    d = 1
+    while 2 * d <= len(f) - 1:
+        for g in monic_polynomials(P, d):
+            e = 0
+            while len(f) > 1:
+                q, s = P.div_mod(f, g)
+                if not(P.is_zero(s)):
+                    break
+                f, e = q, e + 1
+            if e:
+                r.append((g, e))
+        d += 1
+    if len(f) > 1:
+        r.append((f, 1))
+    return canonical(P, r)
+
+
+def canonical(P, fs): # factors of the same degree come in random order over non-prime fields, see factor_key
+    return sorted(fs, key=lambda t: (len(t[0]), str(P(t[0]))))
+
+
+def check_factorisation(P, f, fs):
+    r = P([f[-1]])
+    for (g, e) in fs:
+        assert P.is_irreducible(g) and P([g[-1]]) == P.one()
+        r = r * P(g)**e
+    assert r == P(f)
+    assert len({tuple(g) for (g, e) in fs}) == len(fs)
+
+
+@pytest.mark.parametrize('F', irreducible_fields(), ids=str)
+def test_factor_matches_brute_force(F):
+    P = rf.polynomialring_over_field(F)
+    for n in [1, 2, 3, 5, 6]:
+        for i in range(10):
+            f = P.random_element(n + 1).value
+            if len(f) < 2:
+                continue
+            fs = P.factor(f)
+            check_factorisation(P, f, fs)
+            assert canonical(P, fs) == brute_force_factor(P, f)
+
+
+@pytest.mark.parametrize('F', irreducible_fields() + [rf.primefield(10007)], ids=str)
+def test_factor_products(F):
+    P = rf.polynomialring_over_field(F)
+    for i in range(3):
+        # factors of the same degree (for equal degree factorisation) and repeated ones (squarefree factorisation)
+        gs = [rf.find_irreducible(F.char, d) for d in [1, 1, 2, 3, 3, 8]] if F.char == F.cardinality else []
+        gs = [P(g.value) for g in gs] + [P.random_element(k) for k in [2, 4, 13, 30]]
+        gs = [g for g in gs if g.deg() > 0]
+        f = P.one()
+        for g in gs:
+            f = f * g**random.randrange(1, 4)
+        fs = P.factor(f.value)
+        check_factorisation(P, f.value, fs)
+        for (g, e) in P.squarefree_factorisation(f.value):
+            assert P.gcd(g, P.derivative(g)) == P.one().value
+            for (h, d) in P.distinct_degree_factorisation(g):
+                assert all(len(k) - 1 == d and e == 1 for (k, e) in P.factor(h))
+                assert canonical(P, [(k, 1) for k in P.equal_degree_factorisation(h, d)]) == canonical(P, P.factor(h))
+
+
+class serial_pool: # runs the tasks in this process, counting the calls
+    def __init__(self):
+        self.calls = 0
+
+    def map(self, f, jobs):
+        self.calls += 1
+        return list(map(f, jobs))
+
+
+def test_factor_with_pool():
+    import multiprocessing
+    for K in [rf.primefield(10007), rf.Galoisfield(rf.find_irreducible(3, 4))]:
+        P = rf.polynomialring_over_field(K)
+        f = P.random_element(31).value
+        fs = P.factor(f)
+        pool = serial_pool()
+        assert canonical(P, P.factor(f, pool)) == canonical(P, fs) and pool.calls > 0
+        check_factorisation(P, f, fs)
+    with multiprocessing.get_context('spawn').Pool(2) as pool:
+        assert canonical(P, P.factor(f, pool)) == canonical(P, fs)
+
+
+# Irreducible polynomials
+
+@pytest.fixture
+def fresh_cache(monkeypatch): # an empty in-memory cache of find_irreducible, not backed by a file
+    monkeypatch.setattr(rf, 'irreducible_cache', None)
+    monkeypatch.setattr(rf, 'irreducible_cache_file', None)
+
+
+@pytest.mark.parametrize('p, n, c', [(2, 4, [1, 1, 0, 0, 1]), (3, 2, [2, 2, 1]), (2, 8, [1, 0, 1, 1, 1, 0, 0, 0, 1]),
+                                     (5, 3, [3, 3, 0, 1]), (2, 6, [1, 1, 0, 1, 1, 0, 1]), (3, 4, [2, 0, 0, 2, 1]),
+                                     (7, 1, [4, 1])])
+def test_conway_polynomials(p, n, c, fresh_cache):
+    P = rf.polynomialring_over_field(rf.primefield(p))
+    assert rf.find_irreducible(p, n, 'conway') == P(c)
+    assert rf.find_irreducible(p, n, 'conway', serial_pool()) == P(c)
+
+
+@pytest.mark.parametrize('n', [1, 2, 7, 8, 16, 24, 64, 127])
+def test_sparse_irreducible(n, fresh_cache):
+    f = rf.find_irreducible(2, n, 'sparse')
+    P = f.ring
+    assert f.is_irreducible() and f.deg() == n
+    weight = sum(1 for c in f.value if c)
+    assert weight <= 5
+    # it is the first sparse candidate that is irreducible
+    for c in rf.sparse_candidates(2, n):
+        if c == [int(a) for a in f.value]:
+            break
+        assert not(P.is_irreducible(P.normalise(c)))
+    assert rf.find_irreducible(2, n, 'sparse', serial_pool()) == f
+
+
+@pytest.mark.parametrize('p, n', [(3, 5), (3, 8), (10007, 4), (10007, 6), (2**61 - 1, 3)])
+def test_irreducible_odd_characteristic(p, n, fresh_cache):
+    f = rf.find_irreducible(p, n)
+    P = f.ring
+    assert f.is_irreducible() and f.deg() == n and f.lc().is_one()
+    assert sum(1 for c in f.value if c) <= 5
+    # it is the first sparse candidate that is irreducible
+    for c in rf.sparse_candidates(p, n):
+        if c == [int(a) for a in f.value]:
+            break
+        assert not(P.is_irreducible(P.normalise(c)))
+    assert rf.find_irreducible(p, n) == f == rf.find_irreducible(p, n, 'sparse', serial_pool())
+    g = rf.find_irreducible(p, n, 'random', serial_pool())
+    assert g.is_irreducible() and g.deg() == n and g.lc().is_one()
+
+
+def test_sparse_candidates():
+    assert list(rf.unit_tuples(3, 2)) == [(1, 1), (1, 2), (2, 1), (2, 2)]
+    cs = list(itertools.islice(rf.sparse_candidates(3, 4), 9))
+    assert cs[:4] == [[1, 1, 0, 0, 1], [2, 1, 0, 0, 1], [1, 2, 0, 0, 1], [2, 2, 0, 0, 1]]
+    assert cs[4:] == [[1, 0, 1, 0, 1], [2, 0, 1, 0, 1], [1, 0, 2, 0, 1], [2, 0, 2, 0, 1], [1, 1, 1, 1, 1]]
+    assert len(list(rf.sparse_candidates(5, 6))) == 3 * 4**2 + 10 * 4**4
+    assert next(rf.sparse_candidates(2**127 - 1, 3)) == [1, 1, 0, 1]
+
+
+def test_irreducible_cache_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache' / 'irreducible.json')
+    monkeypatch.setattr(rf, 'irreducible_cache', None)
+    monkeypatch.setattr(rf, 'irreducible_cache_file', path)
+    f = rf.find_irreducible(2, 40)
+    g = rf.find_irreducible(3, 4, 'conway')
+    monkeypatch.setattr(rf, 'irreducible_cache', None) # as in a new process: read the file, search nothing
+    monkeypatch.setattr(rf, 'irreducibles', None)
+    assert rf.find_irreducible(2, 40) == f and rf.find_irreducible(3, 4, 'conway') == g
+    assert set(rf.irreducible_cache_entries()) == {'sparse 2 40', 'conway 3 4', 'conway 3 2', 'conway 3 1'}
+
+
+def test_irreducible_cache_relative_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(rf, 'irreducible_cache', None)
+    monkeypatch.setattr(rf, 'irreducible_cache_file', 'irreducible.json') # no directory part
+    f = rf.find_irreducible(3, 5)
+    assert rf.irreducible_cache_file == 'irreducible.json'
+    with open(tmp_path / 'irreducible.json') as h:
+        assert json.load(h) == {'sparse 3 5': [int(c) for c in f.value]}
+
+
+def test_irreducible_cache_write_failure(tmp_path, monkeypatch, capsys):
+    (tmp_path / 'file').write_text('')
+    monkeypatch.setattr(rf, 'irreducible_cache', None)
+    monkeypatch.setattr(rf, 'irreducible_cache_file', str(tmp_path / 'file' / 'irreducible.json'))
+    f = rf.find_irreducible(2, 40)
+    assert 'Cannot write the cache file' in capsys.readouterr().out
+    assert rf.irreducible_cache_file is None # reported once, then kept in memory only
+    assert rf.find_irreducible(2, 40) == f and capsys.readouterr().out == ''
+
+
+def test_irreducible_cache_default(tmp_path, monkeypatch):
+    monkeypatch.delenv('RINGS_AND_FIELDS_IRREDUCIBLE_CACHE', raising=False)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert rf.irreducible_cache_default() == os.path.join(str(tmp_path), 'rings_and_fields', 'irreducible.json')
+    monkeypatch.setenv('RINGS_AND_FIELDS_IRREDUCIBLE_CACHE', 'polynomials.json')
+    assert rf.irreducible_cache_default() == 'polynomials.json'
+    monkeypatch.setenv('RINGS_AND_FIELDS_IRREDUCIBLE_CACHE', '') # no file
+    assert rf.irreducible_cache_default() is None
+
+
+# Evaluation and interpolation
+
+def horner(f, a, p):
+    r = 0
+    for c in reversed(f):
+        r = (r * int(a) + int(c)) % p
+    return r
+
+
+@pytest.mark.parametrize('p', [10007, 2**61 - 1])
+@pytest.mark.parametrize('d, n', [(5, 300), (127, 127), (128, 128), (129, 500), (600, 130), (1000, 1000)])
+def test_eval_many(p, d, n):
+    P = rf.polynomialring_over_field(rf.primefield(p))
+    f = rand_packed(p, d + 1)
+    points = [random.randrange(p) for i in range(n)]
+    expected = [horner(f, a, p) for a in points]
+    assert [int(c) for c in P.eval_many(f, points)] == expected
+    assert [int(c) for c in rf.polynomialring.eval_many(P, f, points)] == expected
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_eval_many_word_threshold(use_numpy, monkeypatch):
+    # the subproduct tree against Horner's rule on arrays, on both sides of the second threshold (made smaller here)
+    p = 7681
+    P = rf.polynomialring_over_field(rf.primefield(p))
+    monkeypatch.setattr(P, 'multipoint_threshold', [128, 300])
+    if not(use_numpy):
+        monkeypatch.setattr(rf, 'np', None)
+    for (d, n) in [(299, 299), (300, 300), (301, 1000), (1000, 301)]:
+        f = rand_packed(p, d + 1)
+        points = [random.randrange(p) for i in range(n)]
+        assert [int(c) for c in P.eval_many(f, points)] == [horner(f, a, p) for a in points]
+
+
+def test_eval_many_elements(monkeypatch):
+    G = rf.Galoisfield(rf.find_irreducible(3, 5))
+    P = rf.polynomialring_over_field(G)
+    monkeypatch.setattr(P, 'multipoint_threshold', [20, 20])
+    for (d, n) in [(10, 30), (19, 19), (20, 20), (50, 70)]:
+        f = P.random_element(d + 1)
+        points = [G.random_element() for i in range(n)]
+        assert f.eval_many(points) == [f.eval(a) for a in points]
+
+
+@pytest.mark.parametrize('p', [10007, 2**61 - 1])
+@pytest.mark.parametrize('n', [1, 2, 31, 32, 33, 100, 300])
+def test_interpolate(p, n):
+    F = rf.primefield(p)
+    P = rf.polynomialring_over_field(F)
+    points = [F(a) for a in random.sample(range(p), n)]
+    values = [F.random_element() for i in range(n)]
+    f = P.interpolate(points, values)
+    assert f.deg() < n
+    assert f.eval_many(points) == values
+    g = P(rand_packed(p, n))
+    assert P.interpolate(points, g.eval_many(points)) == g
+    with pytest.raises(RuntimeError):
+        P.interpolate(points + points[:1], values + values[:1])
+
+
+def test_interpolate_elements():
+    G = rf.Galoisfield(rf.find_irreducible(5, 3))
+    P = rf.polynomialring_over_field(G)
+    points = random.sample(list(G), 70)
+    g = P.random_element(70)
+    assert P.interpolate(points, g.eval_many(points)) == g
+
+
+@pytest.mark.parametrize('p, d', [(p, d) for p in [2, 3, 5, 7681, 10007, 65537] for d in [0, 5, 255, 256, 257, 1000]] +
+                                 [(7681, 20000), (3, 1000)]) # degree >= p: reduced modulo x^p - x first
+def test_eval_all(p, d):
+    F = rf.primefield(p)
+    P = rf.polynomialring_over_field(F)
+    f = rand_packed(p, d + 1)
+    r = [int(c) for c in P.eval_all(f)]
+    assert len(r) == p
+    points = [F.element_at(n).value for n in range(p)]
+    if p * d < 10**7:
+        assert r == [horner(f, a, p) for a in points]
+    else:
+        assert r == [int(c) for c in P.eval_many(f, points)]
+    if rf.np is not None and p >= 5:
+        assert r == [int(c) for c in P.eval_all_bluestein(f)]
+        assert r == P.eval_words(f, rf.np.arange(p, dtype=rf.np.uint64)).tolist()
+
+
+def test_eval_all_elements():
+    G = rf.Galoisfield(rf.find_irreducible(3, 4))
+    P = rf.polynomialring_over_field(G)
+    f = P.random_element(30)
+    assert f.eval_all() == [f.eval(a) for a in G]
+
+
+# Powers, inverses and quotients modulo m (gmpy2)
+
+@pytest.mark.parametrize('R', [rf.zmod(m) for m in [2, 12, 1000, 2**64 + 13]] + [rf.primefield(p) for p in [2, 10007, 2**127 - 1]], ids=str)
+def test_zmod_power_inv_div(R):
+    m = int(R.modulus)
+    xs = [random.randrange(m) for i in range(50)] + [0, 1, m - 1]
+    units = [x for x in xs if gmpy2.gcd(x, m) == 1]
+    for k in [0, 1, 2, 5, 2**70 + 3, random.getrandbits(100)]:
+        assert [R.power(x, k) for x in xs] == [pow(x, k, m) for x in xs]
+        assert R.power_many(xs, k) == [pow(x, k, m) for x in xs]
+        assert R.batch_power([R(x) for x in xs], k) == [R(pow(x, k, m)) for x in xs]
+        assert R.power_many(units, -k) == [pow(x, -k, m) for x in units]
+        assert [R.power(x, -k) for x in units] == [pow(x, -k, m) for x in units]
+        assert [rf.ring.power(R, x, k) for x in xs] == [pow(x, k, m) for x in xs] # the generic loop
+    assert [R.inv(x) for x in units] == [pow(x, -1, m) for x in units]
+    assert [R.div(a, b) for (a, b) in zip(xs, units)] == [a * pow(b, -1, m) % m for (a, b) in zip(xs, units)]
+    assert R.power_many([], 5) == []
+
+
+@pytest.mark.parametrize('m', [12, 1000, 2**64 + 13, 10007])
+def test_zmod_non_units(m):
+    R = rf.zmod(m)
+    for x in [0] + [d for d in [2, 3, 5, 2**32 + 5] if m % d == 0]:
+        with pytest.raises(ZeroDivisionError):
+            R.power(x, -3)
+        with pytest.raises(ZeroDivisionError):
+            R.power_many([1, x], -1)
+        with pytest.raises(ZeroDivisionError):
+            R.inv(x)
+        with pytest.raises(ZeroDivisionError):
+            R.div(1, x)
+        with pytest.raises(ZeroDivisionError):
+            R(x)**-1